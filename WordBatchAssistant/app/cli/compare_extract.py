@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+from ..core.docx_extract import ENGINE_PYTHON_DOCX, ENGINE_XML, extract_text
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Compare python-docx and streaming XML extraction output")
+    parser.add_argument("--input_dir", required=True, help="Directory that contains .docx files")
+    parser.add_argument("--no_tables", action="store_true", help="Compare without table text")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    include_tables = not args.no_tables
+    files = sorted(p for p in Path(args.input_dir).rglob("*.docx") if p.is_file() and not p.name.startswith("~$"))
+
+    mismatches = 0
+    elapsed = {ENGINE_PYTHON_DOCX: 0.0, ENGINE_XML: 0.0}
+    for file_path in files:
+        outputs = {}
+        for engine in (ENGINE_PYTHON_DOCX, ENGINE_XML):
+            start = time.perf_counter()
+            try:
+                text, meta = extract_text(str(file_path), include_tables=include_tables, engine=engine)
+                outputs[engine] = (text, meta.as_json_dict())
+            except Exception as exc:  # noqa: BLE001
+                outputs[engine] = (f"<error: {exc}>", {})
+            elapsed[engine] += time.perf_counter() - start
+        if outputs[ENGINE_PYTHON_DOCX] != outputs[ENGINE_XML]:
+            mismatches += 1
+            print(f"MISMATCH {file_path}")
+            print(f"  python-docx meta: {outputs[ENGINE_PYTHON_DOCX][1]}")
+            print(f"  xml meta:         {outputs[ENGINE_XML][1]}")
+
+    print(
+        f"{len(files)} files, {mismatches} mismatches | "
+        f"python-docx {elapsed[ENGINE_PYTHON_DOCX]:.2f}s, xml {elapsed[ENGINE_XML]:.2f}s"
+    )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..core import config as config_module
+from ..core.results_index import ResultsIndex, prompt_hash
+from ..core.scanner import DocumentScanner
+from ..core.types import TASK_STATUS_FAILED
+
+RESULT_COLUMNS = ["run_id", "status", "elapsed_sec", "total_tokens", "filepath", "error_message"]
+RUN_COLUMNS = ["run_id", "started", "finished", "model", "prompt_hash", "total", "success", "failed", "output_dir"]
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Query the cross-run results index")
+    parser.add_argument("--index", help="Path to results_index.sqlite")
+    parser.add_argument("--output_dir", help="Output directory whose cache/results_index.sqlite to use")
+    parser.add_argument("--config_file", help="JSON config file (uses results_index_path / cache_dir)")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per line")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    runs = sub.add_parser("runs", help="List recent runs")
+    runs.add_argument("--limit", type=int, default=20)
+
+    failed = sub.add_parser("failed", help="Failed documents of a run (default: last run)")
+    failed.add_argument("--run", default="last", help="Run id or 'last'")
+
+    results = sub.add_parser("results", help="All results of a run")
+    results.add_argument("--run", default="last", help="Run id or 'last'")
+    results.add_argument("--status", action="append", default=[], help="Filter by status (repeatable)")
+
+    unprocessed = sub.add_parser("unprocessed", help="Documents never processed successfully with a prompt")
+    prompt_group = unprocessed.add_mutually_exclusive_group(required=True)
+    prompt_group.add_argument("--prompt_file", help="Prompt template file")
+    prompt_group.add_argument("--prompt_hash", help="Prompt hash as stored in the index")
+    unprocessed.add_argument("--model", help="Only count results produced by this model")
+    unprocessed.add_argument("--input_dir", help="Check every document under this folder, not only indexed ones")
+
+    history = sub.add_parser("history", help="All recorded results for one document")
+    history.add_argument("--file", required=True)
+    return parser
+
+
+def _resolve_index_path(args: argparse.Namespace) -> Optional[str]:
+    if args.index:
+        return args.index
+    app_config = config_module.load_config(args.config_file) if args.config_file else None
+    if app_config and app_config.results_index_path:
+        return app_config.results_index_path
+    if app_config and app_config.cache_dir:
+        return str(Path(app_config.cache_dir) / "results_index.sqlite")
+    if args.output_dir:
+        return str(Path(args.output_dir) / "cache" / "results_index.sqlite")
+    return None
+
+
+def _resolve_run(index: ResultsIndex, value: str, output_dir: Optional[str]) -> Optional[int]:
+    if value == "last":
+        return index.last_run_id(output_dir)
+    return int(value)
+
+
+def _print_rows(rows: List[Dict[str, Any]], columns: List[str], as_json: bool) -> None:
+    for row in rows:
+        if as_json:
+            print(json.dumps(row, ensure_ascii=False))
+        else:
+            print("\t".join("" if row.get(column) is None else str(row.get(column)) for column in columns))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    index_path = _resolve_index_path(args)
+    if not index_path:
+        parser.error("需要 --index、--output_dir 或 --config_file 之一来定位结果索引")
+    if not Path(index_path).exists():
+        print(f"结果索引不存在: {index_path}", file=sys.stderr)
+        return 1
+
+    index = ResultsIndex(index_path)
+    try:
+        if args.command == "runs":
+            _print_rows(index.runs(args.limit), RUN_COLUMNS, args.json)
+        elif args.command in ("failed", "results"):
+            run_id = _resolve_run(index, args.run, args.output_dir)
+            if run_id is None:
+                print("索引中还没有运行记录", file=sys.stderr)
+                return 1
+            statuses = [TASK_STATUS_FAILED] if args.command == "failed" else args.status
+            _print_rows(index.results(run_id, statuses), RESULT_COLUMNS, args.json)
+        elif args.command == "unprocessed":
+            digest = args.prompt_hash or prompt_hash(config_module.load_prompt(args.prompt_file))
+            if args.input_dir:
+                paths = DocumentScanner(args.input_dir, include=["*.docx"]).scan()
+                done = index.processed_paths(paths, digest, args.model)
+                pending = [path for path in paths if path not in done]
+            else:
+                pending = index.never_processed(digest, args.model)
+            _print_rows([{"filepath": path} for path in pending], ["filepath"], args.json)
+        elif args.command == "history":
+            _print_rows(index.history(args.file), RESULT_COLUMNS, args.json)
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import multiprocessing
 import os
 import sys
 from pathlib import Path
@@ -23,7 +24,11 @@ def build_arg_parser() -> argparse.ArgumentParser:
     parser.add_argument("--prompt_file", help="Prompt template file (optional, defaults to 内置模板)")
     parser.add_argument("--config_file", help="JSON config file (optional)")
     parser.add_argument("--api_key", help="API key (overrides env APP_API_KEY)")
-    parser.add_argument("--retry_failed", action="store_true", help="Only retry failed tasks")
+    parser.add_argument("--retry_failed", action="store_true", help="Only retry tasks that failed in the previous run")
+    parser.add_argument("--restart", action="store_true", help="Ignore journal.jsonl and process every document again")
+    parser.add_argument("--batch", action="store_true", help="Submit prompts through the Batch API (runner_engine=batch)")
+    parser.add_argument("--metrics_port", type=int, help="Serve OpenMetrics on http://metrics_host:PORT/metrics")
+    parser.add_argument("--metrics_file", help="Rewrite OpenMetrics text to this file every metrics_interval_sec")
     return parser
 
 
@@ -53,6 +58,12 @@ def main(argv: list[str] | None = None) -> int:
 
     api_key = args.api_key or os.getenv("APP_API_KEY")
     app_config = config_module.load_config(args.config_file, api_key=api_key)
+    if args.batch:
+        app_config.runner_engine = "batch"
+    if args.metrics_port is not None:
+        app_config.metrics_port = args.metrics_port
+    if args.metrics_file:
+        app_config.metrics_file = args.metrics_file
     prompt_template = (
         config_module.load_prompt(args.prompt_file)
         if args.prompt_file
@@ -76,10 +87,11 @@ def main(argv: list[str] | None = None) -> int:
         only_files=only_files,
     )
 
-    runner.scan()
+    runner.scan(resume=not args.restart)
     runner.run(retry_failed_only=args.retry_failed)
     return 0
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     raise SystemExit(main())
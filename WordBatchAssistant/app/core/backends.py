@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from .rate_limit import RateLimiter, shared_rate_limiter
+from .timing import percentile
+from .types import AppConfig
+
+
+HEALTH_WINDOW = 20
+EJECT_CONSECUTIVE_FAILURES = 3
+EJECT_ERROR_RATE = 0.5
+EJECT_MIN_SAMPLES = 10
+EJECT_BASE_SEC = 5.0
+EJECT_MAX_SEC = 120.0
+MAX_LATENCY_SAMPLES = 2000
+
+
+class Backend:
+    def __init__(
+        self,
+        name: str,
+        endpoint: str,
+        api_key: str,
+        model: str,
+        weight: float,
+        rate_limiter: Optional[RateLimiter],
+    ) -> None:
+        self.name = name
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.model = model
+        self.weight = max(weight, 0.0)
+        self.rate_limiter = rate_limiter
+        self.requests = 0
+        self.failures = 0
+        self.statuses: Dict[str, int] = {}
+        self.latencies: Deque[float] = deque(maxlen=MAX_LATENCY_SAMPLES)
+        self.recent: Deque[bool] = deque(maxlen=HEALTH_WINDOW)
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_sec = 0.0
+        self.ejected_until = 0.0
+        self.eject_streak = 0
+        self.current_weight = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class BackendPool:
+    # Requests are spread over the configured backends with smooth weighted
+    # round-robin. A backend that keeps answering 429/5xx (or timing out) is
+    # ejected for a cooldown that doubles on every ejection in a row and
+    # resets after its first success.
+
+    def __init__(self, config: AppConfig, on_eject: Optional[Callable[[Backend, float, str], None]] = None) -> None:
+        self.on_eject = on_eject
+        self.backends: List[Backend] = []
+        for idx, spec in enumerate(config.backends or [{}], start=1):
+            endpoint = spec.get("endpoint") or config.endpoint
+            model = spec.get("model") or config.model
+            api_key = spec.get("api_key") or config.api_key
+            rpm = int(spec.get("rate_limit_rpm", config.rate_limit_rpm))
+            tpm = int(spec.get("rate_limit_tpm", config.rate_limit_tpm))
+            # Keys of the same provider have separate quotas.
+            scope = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12] if api_key else ""
+            self.backends.append(
+                Backend(
+                    name=str(spec.get("name") or f"backend{idx}"),
+                    endpoint=endpoint,
+                    api_key=api_key,
+                    model=model,
+                    weight=float(spec.get("weight", 1.0)),
+                    rate_limiter=shared_rate_limiter(endpoint, model, rpm, tpm, scope=scope),
+                )
+            )
+        self._lock = threading.Lock()
+
+    def pick(self, tried: Optional[List[Backend]] = None) -> Backend:
+        tried = tried or []
+        with self._lock:
+            now = time.monotonic()
+            healthy = [backend for backend in self.backends if backend.healthy(now) and backend.weight > 0]
+            candidates = [backend for backend in healthy if backend not in tried] or healthy
+            if not candidates:
+                # Everything is ejected: probe the one that recovers first.
+                return min(self.backends, key=lambda backend: backend.ejected_until)
+            total = sum(backend.weight for backend in candidates)
+            for backend in candidates:
+                backend.current_weight += backend.weight
+            chosen = max(candidates, key=lambda backend: backend.current_weight)
+            chosen.current_weight -= total
+            return chosen
+
+    def has_alternative(self, tried: List[Backend]) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            return any(
+                backend.healthy(now) and backend.weight > 0 and backend not in tried for backend in self.backends
+            )
+
+    def observe(self, backend: Backend, status: str, latency_sec: float, failed: bool) -> None:
+        ejected_for = 0.0
+        with self._lock:
+            backend.requests += 1
+            backend.statuses[status] = backend.statuses.get(status, 0) + 1
+            backend.recent.append(failed)
+            if not failed:
+                backend.latencies.append(latency_sec)
+                backend.consecutive_failures = 0
+                backend.eject_streak = 0
+                return
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            error_rate = sum(backend.recent) / len(backend.recent)
+            if backend.consecutive_failures >= EJECT_CONSECUTIVE_FAILURES or (
+                len(backend.recent) >= EJECT_MIN_SAMPLES and error_rate >= EJECT_ERROR_RATE
+            ):
+                ejected_for = self._eject(backend, EJECT_BASE_SEC * 2**backend.eject_streak)
+        if ejected_for and self.on_eject:
+            self.on_eject(backend, ejected_for, status)
+
+    def disable(self, backend: Backend, status: str) -> None:
+        # Rejected credentials do not heal quickly; park the backend for the
+        # longest cooldown.
+        with self._lock:
+            ejected_for = self._eject(backend, EJECT_MAX_SEC)
+        if self.on_eject:
+            self.on_eject(backend, ejected_for, status)
+
+    def _eject(self, backend: Backend, seconds: float) -> float:
+        seconds = min(seconds, EJECT_MAX_SEC)
+        backend.ejected_until = time.monotonic() + seconds
+        backend.ejected_sec += seconds
+        backend.ejections += 1
+        backend.eject_streak += 1
+        backend.consecutive_failures = 0
+        backend.recent.clear()
+        return seconds
+
+    def report(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            now = time.monotonic()
+            rows = []
+            for backend in self.backends:
+                latencies = sorted(backend.latencies)
+                row: Dict[str, Any] = {
+                    "name": backend.name,
+                    "endpoint": backend.endpoint,
+                    "model": backend.model,
+                    "weight": backend.weight,
+                    "requests": backend.requests,
+                    "failures": backend.failures,
+                    "error_rate": round(backend.failures / backend.requests, 3) if backend.requests else 0.0,
+                    "statuses": dict(backend.statuses),
+                    "latency_p50_sec": round(percentile(latencies, 50), 3),
+                    "latency_p95_sec": round(percentile(latencies, 95), 3),
+                    "ejections": backend.ejections,
+                    "ejected_sec": round(backend.ejected_sec, 1),
+                    "healthy": backend.healthy(now),
+                }
+                if backend.rate_limiter:
+                    row["rate_limit"] = backend.rate_limiter.stats()
+                rows.append(row)
+            return rows
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+
+from .cache import DiskCache
+from .llm_client import LLMClient, REQUEST_ERROR, RequestStats
+from .types import AppConfig, LLMResponse, RenderedPrompt
+
+
+BATCH_STATUS_COMPLETED = "completed"
+# A batch in one of these states will not produce more output.
+BATCH_TERMINAL_STATUSES = {BATCH_STATUS_COMPLETED, "failed", "expired", "cancelled"}
+BATCH_DEFAULT_URL = "/v1/chat/completions"
+# Providers cap a batch input file (OpenAI: 50k requests / 200 MB).
+BATCH_MAX_FILE_BYTES = 190 * 1024 * 1024
+MAX_API_ATTEMPTS = 4
+# Requests that failed with 429/5xx, or that an expired job never reached,
+# are submitted again in a follow-up job of the same round.
+MAX_BATCH_SUBMISSIONS = 3
+
+BatchOutcome = Union[LLMResponse, Exception]
+
+
+class BatchCancelledError(RuntimeError):
+    pass
+
+
+class BatchRetryableError(RuntimeError):
+    def __init__(self, message: str, status: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def batch_api_base(config: AppConfig) -> str:
+    if config.batch_api_base:
+        return config.batch_api_base.rstrip("/")
+    endpoint = config.endpoint.rstrip("/")
+    suffix = "/chat/completions"
+    if endpoint.endswith(suffix):
+        return endpoint[: -len(suffix)]
+    return endpoint.rsplit("/", 1)[0]
+
+
+def batch_request_url(config: AppConfig) -> str:
+    path = urlparse(config.endpoint).path
+    return path if path.endswith("/chat/completions") else BATCH_DEFAULT_URL
+
+
+class BatchJobStore:
+    # jobs.json maps the digest of an uploaded input file to its batch id, so
+    # a run that is restarted while the provider is still working picks the
+    # job up again instead of paying for it twice.
+
+    def __init__(self, work_dir: Path) -> None:
+        self.work_dir = work_dir
+        self.path = work_dir / "jobs.json"
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                self._jobs = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._jobs = {}
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._jobs.get(digest)
+
+    def put(self, digest: str, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[digest] = job
+            self.work_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self._jobs, ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp_path.replace(self.path)
+
+
+class BatchLLMClient(LLMClient):
+    # Offline mode: a round of prompts is written as an OpenAI-style batch
+    # JSONL file, uploaded to /files, submitted to /batches and polled until
+    # the provider finishes (up to completion_window later). Payloads, cache
+    # keys and response parsing are shared with the online client.
+
+    def __init__(
+        self,
+        config: AppConfig,
+        work_dir: Path,
+        session: Optional[requests.Session] = None,
+        cache: Optional[DiskCache] = None,
+        request_stats: Optional[RequestStats] = None,
+    ):
+        super().__init__(config, session=session, cache=cache, request_stats=request_stats)
+        self.base_url = batch_api_base(config)
+        self.request_url = batch_request_url(config)
+        self.work_dir = work_dir
+        self.jobs = BatchJobStore(work_dir)
+
+    def run_round(
+        self,
+        prompts: Dict[str, RenderedPrompt],
+        should_stop: Callable[[], bool],
+        log: Callable[[str], None],
+        label: str = "",
+    ) -> Dict[str, BatchOutcome]:
+        outcomes: Dict[str, BatchOutcome] = {}
+        lines: List[Tuple[str, str]] = []
+        cache_keys: Dict[str, str] = {}
+        prompt_tokens: Dict[str, int] = {}
+        for custom_id, prompt in prompts.items():
+            payload = self._build_payload(prompt)
+            if self.cache:
+                cache_keys[custom_id] = self._cache_key(payload)
+                cached = self._load_cached(cache_keys[custom_id])
+                if cached is not None:
+                    outcomes[custom_id] = cached
+                    continue
+            prompt_tokens[custom_id] = self._prompt_tokens(payload)
+            request = {"custom_id": custom_id, "method": "POST", "url": self.request_url, "body": payload}
+            lines.append((custom_id, json.dumps(request, ensure_ascii=False, sort_keys=True)))
+        if not lines:
+            return outcomes
+        if outcomes:
+            log(f"批处理{label}: {len(outcomes)} 个请求命中本地缓存，其余 {len(lines)} 个提交")
+
+        for submission in range(1, MAX_BATCH_SUBMISSIONS + 1):
+            jobs = [self._submit(part, log, label) for part in self._split(lines)]
+            self._wait(jobs, should_stop, log)
+            for job in jobs:
+                for custom_id, outcome in self._collect(job).items():
+                    if isinstance(outcome, LLMResponse):
+                        outcome.prompt_tokens_est = prompt_tokens.get(custom_id, 0)
+                        if custom_id in cache_keys:
+                            self._store_cached(cache_keys[custom_id], outcome)
+                    outcomes[custom_id] = outcome
+            for custom_id, _ in lines:
+                if custom_id not in outcomes:
+                    outcomes[custom_id] = BatchRetryableError("Batch returned no result for this request", "missing")
+            retry = [(cid, line) for cid, line in lines if isinstance(outcomes[cid], BatchRetryableError)]
+            if not retry or submission == MAX_BATCH_SUBMISSIONS:
+                break
+            if self.request_stats:
+                for custom_id, _ in retry:
+                    self.request_stats.record_retry(outcomes[custom_id].status)  # type: ignore[union-attr]
+            log(f"批处理{label}: {len(retry)} 个请求临时失败，重新提交")
+            lines = retry
+        return outcomes
+
+    def _split(self, lines: List[Tuple[str, str]]) -> Iterable[List[Tuple[str, str]]]:
+        limit = max(1, self.config.batch_max_requests)
+        part: List[Tuple[str, str]] = []
+        part_bytes = 0
+        for custom_id, line in lines:
+            size = len(line.encode("utf-8")) + 1
+            if part and (len(part) >= limit or part_bytes + size > BATCH_MAX_FILE_BYTES):
+                yield part
+                part, part_bytes = [], 0
+            part.append((custom_id, line))
+            part_bytes += size
+        if part:
+            yield part
+
+    def _submit(self, lines: List[Tuple[str, str]], log: Callable[[str], None], label: str) -> Dict[str, Any]:
+        data = ("\n".join(line for _, line in lines) + "\n").encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        known = self.jobs.get(digest)
+        if known and known.get("status") not in ("failed", "expired", "cancelled"):
+            log(f"批处理{label}: 继续等待已提交的任务 {known['batch_id']}（{len(lines)} 个请求）")
+            return {**known, "digest": digest}
+
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        input_path = self.work_dir / f"input_{digest[:16]}.jsonl"
+        input_path.write_bytes(data)
+        uploaded = self._api(
+            "POST",
+            "/files",
+            data={"purpose": "batch"},
+            files={"file": (input_path.name, data, "application/jsonl")},
+        )
+        batch = self._api(
+            "POST",
+            "/batches",
+            json={
+                "input_file_id": uploaded["id"],
+                "endpoint": self.request_url,
+                "completion_window": self.config.batch_completion_window,
+                "metadata": {"source": "WordBatchAssistant", "input_sha256": digest},
+            },
+        )
+        job = {
+            "batch_id": batch["id"],
+            "input_file": str(input_path),
+            "input_file_id": uploaded["id"],
+            "requests": len(lines),
+            "status": batch.get("status", ""),
+            "submitted_at": time.time(),
+        }
+        self.jobs.put(digest, dict(job))
+        job["digest"] = digest
+        log(f"批处理{label}: 已提交 {batch['id']}（{len(lines)} 个请求，{len(data) / 1024:.0f} KB）")
+        return job
+
+    def _wait(self, jobs: List[Dict[str, Any]], should_stop: Callable[[], bool], log: Callable[[str], None]) -> None:
+        pending = {job["batch_id"]: job for job in jobs}
+        progress: Dict[str, Tuple[int, int]] = {}
+        interval = max(self.config.batch_poll_interval_sec, 0.05)
+        while True:
+            for batch_id, job in list(pending.items()):
+                batch = self._api("GET", f"/batches/{batch_id}")
+                job["status"] = batch.get("status", "")
+                job["output_file_id"] = batch.get("output_file_id")
+                job["error_file_id"] = batch.get("error_file_id")
+                counts = batch.get("request_counts") or {}
+                done = (counts.get("completed") or 0) + (counts.get("failed") or 0)
+                if progress.get(batch_id) != (done, counts.get("total") or 0):
+                    progress[batch_id] = (done, counts.get("total") or 0)
+                    log(f"批处理 {batch_id}: {job['status']} {done}/{counts.get('total') or job['requests']}")
+                if job["status"] in BATCH_TERMINAL_STATUSES:
+                    self._record_status(job)
+                    del pending[batch_id]
+            if not pending:
+                return
+            if should_stop():
+                for batch_id, job in pending.items():
+                    try:
+                        self._api("POST", f"/batches/{batch_id}/cancel")
+                    except RuntimeError as exc:
+                        log(f"无法取消批处理 {batch_id}: {exc}")
+                    job["status"] = "cancelled"
+                    self._record_status(job)
+                raise BatchCancelledError()
+            deadline = time.monotonic() + interval
+            while time.monotonic() < deadline and not should_stop():
+                time.sleep(min(0.5, interval))
+
+    def _record_status(self, job: Dict[str, Any]) -> None:
+        digest = job.get("digest")
+        if digest:
+            self.jobs.put(digest, {key: value for key, value in job.items() if key != "digest"})
+
+    def _collect(self, job: Dict[str, Any]) -> Dict[str, BatchOutcome]:
+        outcomes: Dict[str, BatchOutcome] = {}
+        for file_key in ("error_file_id", "output_file_id"):
+            file_id = job.get(file_key)
+            if not file_id:
+                continue
+            content = self._api_raw("GET", f"/files/{file_id}/content").content
+            (self.work_dir / f"{file_key.split('_')[0]}_{job['batch_id']}.jsonl").write_bytes(content)
+            for line in content.decode("utf-8").splitlines():
+                if line.strip():
+                    custom_id, outcome = self._parse_line(json.loads(line))
+                    outcomes[custom_id] = outcome
+        if job["status"] != BATCH_STATUS_COMPLETED:
+            # Expired or cancelled jobs still return what finished in time.
+            message = f"Batch {job['batch_id']} ended as {job['status']}"
+            job_error: Exception = RuntimeError(message)
+            if job["status"] == "expired":
+                job_error = BatchRetryableError(message, "expired")
+            for custom_id in self._input_ids(job):
+                outcomes.setdefault(custom_id, job_error)
+        return outcomes
+
+    @staticmethod
+    def _input_ids(job: Dict[str, Any]) -> List[str]:
+        path = Path(job["input_file"])
+        if not path.exists():
+            return []
+        with path.open("r", encoding="utf-8") as f:
+            return [json.loads(line)["custom_id"] for line in f if line.strip()]
+
+    def _parse_line(self, item: Dict[str, Any]) -> Tuple[str, BatchOutcome]:
+        custom_id = item["custom_id"]
+        response = item.get("response") or {}
+        status_code = response.get("status_code")
+        if self.request_stats:
+            self.request_stats.record(str(status_code) if status_code else REQUEST_ERROR)
+        if status_code == 200 and not item.get("error"):
+            try:
+                return custom_id, self._parse_success(response.get("body") or {})
+            except Exception as exc:  # noqa: BLE001
+                return custom_id, exc
+        error = item.get("error") or (response.get("body") or {}).get("error") or response.get("body")
+        message = f"Batch request failed: {status_code} {error}"
+        if status_code and (status_code == 429 or status_code >= 500):
+            return custom_id, BatchRetryableError(message, str(status_code))
+        return custom_id, RuntimeError(message)
+
+    def _api(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        return self._api_raw(method, path, **kwargs).json()
+
+    def _api_raw(self, method: str, path: str, **kwargs) -> requests.Response:
+        headers = {}
+        if self.config.api_key:
+            headers["Authorization"] = f"Bearer {self.config.api_key}"
+        backoff_seconds = 1.0
+        last_error: Optional[Exception] = None
+        for attempt in range(1, MAX_API_ATTEMPTS + 1):
+            try:
+                response = self.session.request(
+                    method, self.base_url + path, headers=headers, timeout=self.config.timeout_sec, **kwargs
+                )
+            except requests.RequestException as exc:
+                last_error = exc
+            else:
+                if response.status_code == 200:
+                    return response
+                if response.status_code != 429 and response.status_code < 500:
+                    raise RuntimeError(f"Batch API {method} {path} failed: {response.status_code} {response.text}")
+                last_error = RuntimeError(f"{response.status_code} {response.text}")
+            if attempt < MAX_API_ATTEMPTS:
+                time.sleep(backoff_seconds)
+                backoff_seconds *= 2
+        raise RuntimeError(f"Batch API {method} {path} failed after retries: {last_error}")
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .types import DocMeta
+
+
+class DiskCache:
+    EVICT_EVERY = 64
+
+    def __init__(self, path: str, max_bytes: int = 0, max_entries: int = 0, max_age_sec: float = 0.0):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_age_sec = max_age_sec
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+            conn.commit()
+            self._conn = conn
+
+    def get(self, key: str) -> Optional[str]:
+        self.open()
+        now = time.time()
+        with self._lock:
+            assert self._conn is not None
+            row = self._conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created = row
+            if self.max_age_sec > 0 and now - created > self.max_age_sec:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        self.open()
+        now = time.time()
+        with self._lock:
+            assert self._conn is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict_locked()
+
+    def evict(self) -> None:
+        self.open()
+        with self._lock:
+            self._evict_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        entries = 0
+        size = 0
+        if self._conn is not None:
+            with self._lock:
+                entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        with self._lock:
+            self._evict_locked()
+            self._conn.close()
+            self._conn = None
+
+    def _evict_locked(self) -> None:
+        conn = self._conn
+        if conn is None:
+            return
+        if self.max_age_sec > 0:
+            conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.max_age_sec,))
+        if self.max_entries > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes > 0:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                freed = 0
+                stale = []
+                for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+                    stale.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+        conn.commit()
+
+
+def file_digest(path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, store: DiskCache):
+        self.store = store
+
+    def key(self, path: str, include_tables: bool, engine: str = "", digest: Optional[str] = None) -> str:
+        resolved = os.path.abspath(path)
+        stat = os.stat(resolved)
+        digest = digest or file_digest(resolved)
+        material = f"{resolved}|{stat.st_size}|{stat.st_mtime_ns}|{digest}|{int(include_tables)}|{engine}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, DocMeta]]:
+        value = self.store.get(key)
+        if value is None:
+            return None
+        try:
+            data = json.loads(value)
+            return data["text"], DocMeta(**data["meta"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def put(self, key: str, text: str, meta: DocMeta) -> None:
+        self.store.set(key, json.dumps({"text": text, "meta": meta.as_json_dict()}, ensure_ascii=False))
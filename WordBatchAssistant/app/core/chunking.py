@@ -1,19 +1,24 @@
 from __future__ import annotations
 
-import math
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
+from .tokens import TokenEstimator, default_estimator
 from .types import DocMeta
 
+TRUNCATE_HEAD_RATIO = 0.7
+TRUNCATE_MARKER = "\n...\n"
 
-def estimate_tokens(text: str) -> int:
+
+def estimate_tokens(text: str, estimator: Optional[TokenEstimator] = None) -> int:
     if not text:
         return 0
-    return int(math.ceil(len(text) / 4))
+    return (estimator or default_estimator()).count(text)
 
 
-def truncate_text(text: str, meta: DocMeta, max_input_tokens: int) -> Tuple[str, DocMeta]:
-    token_est = meta.token_est or estimate_tokens(text)
+def truncate_text(
+    text: str, meta: DocMeta, max_input_tokens: int, estimator: Optional[TokenEstimator] = None
+) -> Tuple[str, DocMeta]:
+    token_est = meta.token_est or estimate_tokens(text, estimator)
     meta.token_est = token_est
     if token_est <= max_input_tokens or max_input_tokens <= 0:
         return text, meta
@@ -22,17 +27,23 @@ def truncate_text(text: str, meta: DocMeta, max_input_tokens: int) -> Tuple[str,
         meta.was_truncated = True
         return text, meta
 
-    head_len = int(len(text) * 0.7)
-    tail_len = len(text) - head_len
-    tail_start = max(len(text) - max(tail_len, 1), 0)
-    head = text[:head_len]
-    tail = text[tail_start:]
-    truncated = head.rstrip() + "\n...\n" + tail.lstrip()
+    # Keep the head and tail in a 7:3 split. The first cut assumes tokens are
+    # spread evenly over the text; re-measure and shrink until it fits.
+    keep_chars = int(len(text) * max_input_tokens / token_est)
+    truncated = text
+    for _ in range(4):
+        head_len = int(keep_chars * TRUNCATE_HEAD_RATIO)
+        tail_len = max(keep_chars - head_len, 1)
+        truncated = text[:head_len].rstrip() + TRUNCATE_MARKER + text[len(text) - tail_len :].lstrip()
+        truncated_tokens = estimate_tokens(truncated, estimator)
+        if truncated_tokens <= max_input_tokens:
+            break
+        keep_chars = int(keep_chars * max_input_tokens / truncated_tokens * 0.95)
     meta.was_truncated = True
     return truncated, meta
 
 
-def chunk_text(text: str, chunk_target_tokens: int) -> List[str]:
+def chunk_text(text: str, chunk_target_tokens: int, estimator: Optional[TokenEstimator] = None) -> List[str]:
     paragraphs = [p.strip() for p in text.split("\n")]
     paragraphs = [p for p in paragraphs if p]
     if not paragraphs:
@@ -43,7 +54,7 @@ def chunk_text(text: str, chunk_target_tokens: int) -> List[str]:
     current_tokens = 0
     target = max(chunk_target_tokens, 200)
     for paragraph in paragraphs:
-        paragraph_tokens = estimate_tokens(paragraph)
+        paragraph_tokens = estimate_tokens(paragraph, estimator)
         if current and current_tokens + paragraph_tokens > target:
             chunks.append("\n".join(current))
             current = [paragraph]
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_THROTTLED = "throttled"
+OUTCOME_NEUTRAL = "neutral"
+
+MAX_TIMELINE_POINTS = 2000
+
+
+class AdaptiveConcurrency:
+    # Additive-increase / multiplicative-decrease limit on in-flight requests.
+    # Starts in slow-start (+1 per success) until the first congestion signal,
+    # then grows by roughly one slot per window of successful requests.
+
+    def __init__(
+        self,
+        ceiling: int,
+        floor: int = 1,
+        initial: Optional[int] = None,
+        decrease_factor: float = 0.5,
+        latency_factor: float = 2.0,
+        decrease_cooldown_sec: float = 2.0,
+        adaptive: bool = True,
+    ) -> None:
+        self.ceiling = max(1, ceiling)
+        self.floor = max(1, min(floor, self.ceiling))
+        self.adaptive = adaptive
+        start = initial if initial is not None else (min(self.ceiling, 2) if adaptive else self.ceiling)
+        self.limit = float(max(self.floor, min(start, self.ceiling)))
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.decrease_cooldown_sec = decrease_cooldown_sec
+        self.in_flight = 0
+        self.peak_limit = int(self.limit)
+        self.peak_in_flight = 0
+        self.throttle_events = 0
+        self._slow_start = True
+        self._fast_latency: Optional[float] = None
+        self._slow_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._started = time.time()
+        self._timeline: List[Tuple[float, int]] = [(0.0, int(self.limit))]
+        self._cond = threading.Condition()
+        # Coroutines waiting for a slot, oldest first; release() hands slots
+        # to them directly instead of letting them poll.
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = deque()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait(timeout=0.5)
+            self._take_slot()
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self.in_flight < int(self.limit) and not self._async_waiters:
+                self._take_slot()
+                return
+            waiter: "asyncio.Future[None]" = loop.create_future()
+            self._async_waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._cond:
+                if (loop, waiter) in self._async_waiters:
+                    self._async_waiters.remove((loop, waiter))
+                elif not waiter.cancelled():
+                    # The slot was granted just before the cancel landed.
+                    self._free_slot()
+            raise
+
+    def release(self, outcome: str, latency_sec: float = 0.0) -> None:
+        with self._cond:
+            if self.adaptive:
+                self._adapt(outcome, latency_sec)
+            self._free_slot()
+
+    def _free_slot(self) -> None:
+        # Called with the lock held.
+        self.in_flight = max(0, self.in_flight - 1)
+        while self._async_waiters and self.in_flight < int(self.limit):
+            loop, waiter = self._async_waiters.popleft()
+            self._take_slot()
+            loop.call_soon_threadsafe(self._grant, waiter)
+        self._cond.notify_all()
+
+    def _grant(self, waiter: "asyncio.Future[None]") -> None:
+        # Runs on the waiter's loop; a waiter cancelled in the meantime gives
+        # its slot back.
+        if waiter.done():
+            with self._cond:
+                self._free_slot()
+        else:
+            waiter.set_result(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "adaptive": self.adaptive,
+                "ceiling": self.ceiling,
+                "current": int(self.limit),
+                "peak": self.peak_limit,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "throttle_events": self.throttle_events,
+                "timeline": [[round(offset, 3), limit] for offset, limit in self._timeline],
+            }
+
+    def _take_slot(self) -> None:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _adapt(self, outcome: str, latency_sec: float) -> None:
+        if outcome == OUTCOME_THROTTLED:
+            self._decrease()
+        elif outcome == OUTCOME_SUCCESS:
+            if self._latency_rising(latency_sec):
+                self._decrease()
+            else:
+                self._increase()
+
+    def _latency_rising(self, latency_sec: float) -> bool:
+        if latency_sec <= 0:
+            return False
+        if self._fast_latency is None or self._slow_latency is None:
+            self._fast_latency = self._slow_latency = latency_sec
+            return False
+        self._fast_latency = 0.3 * latency_sec + 0.7 * self._fast_latency
+        self._slow_latency = 0.05 * latency_sec + 0.95 * self._slow_latency
+        return self._fast_latency > self.latency_factor * self._slow_latency
+
+    def _increase(self) -> None:
+        if self._slow_start:
+            self._set_limit(self.limit + 1)
+        else:
+            self._set_limit(self.limit + 1.0 / max(self.limit, 1.0))
+
+    def _decrease(self) -> None:
+        self.throttle_events += 1
+        self._slow_start = False
+        now = time.time()
+        if now - self._last_decrease < self.decrease_cooldown_sec:
+            return
+        self._last_decrease = now
+        self._set_limit(self.limit * self.decrease_factor)
+
+    def _set_limit(self, value: float) -> None:
+        previous = int(self.limit)
+        self.limit = max(float(self.floor), min(float(self.ceiling), value))
+        current = int(self.limit)
+        if current != previous:
+            self.peak_limit = max(self.peak_limit, current)
+            if len(self._timeline) < MAX_TIMELINE_POINTS:
+                self._timeline.append((time.time() - self._started, current))
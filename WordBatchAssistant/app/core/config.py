@@ -30,10 +30,56 @@ DEFAULT_CONFIG: Dict[str, Any] = {
     "max_output_tokens": 8192,
     "timeout_sec": 120,
     "concurrency": 2,
+    "runner_engine": "thread",
+    "adaptive_concurrency": True,
+    "rate_limit_rpm": 20,
+    "rate_limit_tpm": 0,
+    "hedge_percentile": 0,
+    "hedge_max_in_flight": 2,
+    "backends": [],
+    "budget_tokens": 0,
+    "budget_cost": 0,
+    "model_prices": {},
+    "stream": False,
+    "stream_idle_timeout_sec": 60,
+    "extract_workers": 2,
+    "prefetch_limit": 8,
     "include_tables": True,
+    "extract_engine": "python-docx",
     "long_doc_mode": "truncate",
+    "prompt_layout": "system",
     "max_input_tokens": 20000,
     "chunk_target_tokens": 6000,
+    "pack_max_docs": 1,
+    "pack_max_tokens": 0,
+    "dedup_policy": "off",
+    "dedup_max_distance": 3,
+    "cache_enabled": True,
+    "cache_dir": "",
+    "cache_max_mb": 512,
+    "cache_max_age_days": 30,
+    "extract_cache_enabled": True,
+    "extract_cache_max_entries": 5000,
+    "journal_enabled": True,
+    "journal_fsync_every": 64,
+    "scan_include": ["*.docx", "*.doc"],
+    "scan_exclude": ["~$*", ".*"],
+    "scan_workers": 8,
+    "token_estimator": "script",
+    "token_vocab_path": "",
+    "token_estimate_scale": 1.0,
+    "summary_format": "csv",
+    "summary_flush_sec": 2.0,
+    "results_index_enabled": True,
+    "results_index_path": "",
+    "metrics_port": 0,
+    "metrics_host": "127.0.0.1",
+    "metrics_file": "",
+    "metrics_interval_sec": 5.0,
+    "batch_api_base": "",
+    "batch_completion_window": "24h",
+    "batch_poll_interval_sec": 30.0,
+    "batch_max_requests": 10000,
 }
 
 
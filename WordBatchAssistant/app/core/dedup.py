@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency, pure Python fallback below
+    np = None  # type: ignore
+
+from .types import TASK_STATUS_CANCELLED, TASK_STATUS_SUCCESS
+
+
+DEDUP_OFF = "off"
+DEDUP_REUSE = "reuse"
+DEDUP_LINK = "link"
+DEDUP_POLICIES = (DEDUP_OFF, DEDUP_REUSE, DEDUP_LINK)
+
+FINGERPRINT_BITS = 64
+SHINGLE_CHARS = 3
+# Shorter texts are only matched exactly; a handful of shingles makes SimHash
+# distances meaningless.
+MIN_NEAR_DUPLICATE_CHARS = 200
+
+_MASK = (1 << 64) - 1
+_K1, _K2, _K3 = 0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9
+_M1, _M2 = 0xBF58476D1CE4E5B9, 0x94D049BB133111EB
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _SPACE.sub("", text).lower()
+
+
+def _mix(value: int) -> int:
+    # splitmix64 finalizer
+    value ^= value >> 30
+    value = (value * _M1) & _MASK
+    value ^= value >> 27
+    value = (value * _M2) & _MASK
+    return value ^ (value >> 31)
+
+
+def _simhash_numpy(codes: "np.ndarray") -> int:
+    shingles = codes[:-2] * np.uint64(_K1) + codes[1:-1] * np.uint64(_K2) + codes[2:] * np.uint64(_K3)
+    shingles ^= shingles >> np.uint64(30)
+    shingles *= np.uint64(_M1)
+    shingles ^= shingles >> np.uint64(27)
+    shingles *= np.uint64(_M2)
+    shingles ^= shingles >> np.uint64(31)
+    bits = (shingles[:, None] >> np.arange(FINGERPRINT_BITS, dtype=np.uint64)) & np.uint64(1)
+    counts = bits.sum(axis=0, dtype=np.int64)
+    fingerprint = 0
+    for bit in np.nonzero(counts * 2 > len(shingles))[0]:
+        fingerprint |= 1 << int(bit)
+    return fingerprint
+
+
+def _simhash_python(codes: List[int]) -> int:
+    # Count byte values per byte position instead of testing 64 bits per
+    # shingle, then expand the 8 x 256 tables into bit counts.
+    total = len(codes) - 2
+    hashes = [_mix((codes[idx] * _K1 + codes[idx + 1] * _K2 + codes[idx + 2] * _K3) & _MASK) for idx in range(total)]
+    fingerprint = 0
+    for position in range(FINGERPRINT_BITS // 8):
+        shift = position * 8
+        byte_counts = Counter((value >> shift) & 0xFF for value in hashes)
+        for bit in range(8):
+            ones = sum(count for byte, count in byte_counts.items() if byte >> bit & 1)
+            if ones * 2 > total:
+                fingerprint |= 1 << (shift + bit)
+    return fingerprint
+
+
+def simhash(normalized: str) -> int:
+    # 64-bit SimHash over character 3-grams (works for CJK without word
+    # segmentation). With numpy the shingles of a document are hashed and
+    # counted as arrays; both paths give the same fingerprint.
+    if len(normalized) < SHINGLE_CHARS:
+        return 0
+    if np is not None:
+        codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            return _simhash_numpy(codes)
+    return _simhash_python([ord(char) for char in normalized])
+
+
+def hamming(left: int, right: int) -> int:
+    return bin(left ^ right).count("1")
+
+
+@dataclass
+class DuplicateMember:
+    filepath: str
+    filename: str
+    distance: int
+    payload: Any = None
+
+
+@dataclass
+class DuplicateCluster:
+    canonical: str
+    filename: str
+    fingerprint: int
+    chars: int
+    members: List[DuplicateMember] = field(default_factory=list)
+    done: bool = False
+    status: str = ""
+    output_path: Optional[str] = None
+    text: Optional[str] = None
+    error_message: str = ""
+    waiting: List[DuplicateMember] = field(default_factory=list)
+    # Earlier canonical documents that failed; they are not duplicates.
+    failed: List[str] = field(default_factory=list)
+
+
+class DuplicateIndex:
+    # Online clustering: the first document of a cluster is its canonical
+    # one and is processed normally; later exact (same normalized text) or
+    # near (SimHash Hamming distance <= max_distance) matches join it. Near
+    # matches are found through LSH bands: with max_distance + 1 bands, two
+    # fingerprints that close must agree on at least one whole band.
+
+    def __init__(self, max_distance: int = 3) -> None:
+        self.max_distance = max(0, min(max_distance, FINGERPRINT_BITS // 2 - 1))
+        self.band_count = self.max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.band_count
+        self._lock = threading.Lock()
+        self._exact: Dict[str, DuplicateCluster] = {}
+        self._bands: Dict[Tuple[int, int], List[DuplicateCluster]] = {}
+        self._clusters: List[DuplicateCluster] = []
+        self._by_canonical: Dict[str, DuplicateCluster] = {}
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        mask = (1 << self.band_bits) - 1
+        return [(band, (fingerprint >> (band * self.band_bits)) & mask) for band in range(self.band_count)]
+
+    def claim(
+        self, filepath: str, filename: str, text: str, payload: Any = None
+    ) -> Tuple[Optional[DuplicateCluster], Optional[DuplicateMember]]:
+        # Returns (None, None) when the document starts a new cluster. A
+        # duplicate gets its cluster and member; the member is queued on the
+        # cluster until the canonical document finishes.
+        normalized = normalize_text(text)
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        near = len(normalized) >= MIN_NEAR_DUPLICATE_CHARS
+        fingerprint = simhash(normalized) if near else 0
+        with self._lock:
+            if filepath in self._by_canonical:
+                # A copy handed the cluster by finish() coming back for its own run.
+                return None, None
+            cluster = self._exact.get(digest)
+            distance = 0
+            if cluster is None and near:
+                cluster, distance = self._nearest(fingerprint)
+            if cluster is None:
+                cluster = DuplicateCluster(filepath, filename, fingerprint, len(normalized))
+                self._exact[digest] = cluster
+                self._clusters.append(cluster)
+                self._by_canonical[filepath] = cluster
+                if near:
+                    for key in self._band_keys(fingerprint):
+                        self._bands.setdefault(key, []).append(cluster)
+                return None, None
+            if cluster.done and cluster.status != TASK_STATUS_SUCCESS:
+                # The canonical document failed; let this copy try instead.
+                self._hand_over(cluster, filepath, filename)
+                return None, None
+            member = DuplicateMember(filepath, filename, distance, payload)
+            cluster.members.append(member)
+            if not cluster.done:
+                cluster.waiting.append(member)
+            return cluster, member
+
+    def _nearest(self, fingerprint: int) -> Tuple[Optional[DuplicateCluster], int]:
+        best: Optional[DuplicateCluster] = None
+        best_distance = self.max_distance + 1
+        for key in self._band_keys(fingerprint):
+            for cluster in self._bands.get(key, ()):
+                distance = hamming(fingerprint, cluster.fingerprint)
+                if distance < best_distance:
+                    best, best_distance = cluster, distance
+        return best, best_distance
+
+    def _hand_over(self, cluster: DuplicateCluster, filepath: str, filename: str) -> None:
+        self._by_canonical.pop(cluster.canonical, None)
+        cluster.failed.append(cluster.canonical)
+        cluster.canonical, cluster.filename = filepath, filename
+        cluster.done, cluster.status, cluster.error_message = False, "", ""
+        self._by_canonical[filepath] = cluster
+
+    def finish(
+        self, filepath: str, status: str, output_path: Optional[str], text: Optional[str], error_message: str = ""
+    ) -> Tuple[Optional[DuplicateCluster], List[DuplicateMember], Optional[DuplicateMember]]:
+        # Returns the members to resolve now and, when the canonical document
+        # failed, the waiting copy that takes over the cluster and has to be
+        # processed itself; the other copies keep waiting on it.
+        with self._lock:
+            cluster = self._by_canonical.get(filepath)
+            if cluster is None or cluster.done:
+                return None, [], None
+            if status not in (TASK_STATUS_SUCCESS, TASK_STATUS_CANCELLED) and cluster.waiting:
+                successor = cluster.waiting.pop(0)
+                cluster.members.remove(successor)
+                self._hand_over(cluster, successor.filepath, successor.filename)
+                return cluster, [], successor
+            cluster.done = True
+            cluster.status = status
+            cluster.output_path = output_path
+            cluster.text = text
+            cluster.error_message = error_message
+            waiting, cluster.waiting = cluster.waiting, []
+            return cluster, waiting, None
+
+    def drain(self) -> List[Tuple[DuplicateCluster, DuplicateMember]]:
+        with self._lock:
+            pending = [(cluster, member) for cluster in self._clusters for member in cluster.waiting]
+            for cluster in self._clusters:
+                cluster.waiting = []
+            return pending
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            clusters = [
+                {
+                    "canonical": cluster.canonical,
+                    "status": cluster.status,
+                    "members": [
+                        {"filepath": member.filepath, "distance": member.distance} for member in cluster.members
+                    ],
+                    "failed": list(cluster.failed),
+                }
+                for cluster in self._clusters
+                if cluster.members
+            ]
+            documents = sum(1 + len(cluster.members) + len(cluster.failed) for cluster in self._clusters)
+        return {
+            "documents": documents,
+            "clusters": clusters,
+            "duplicates": sum(len(cluster["members"]) for cluster in clusters),
+            # Copies that got a successful answer without a request of their own.
+            "saved": sum(len(cluster["members"]) for cluster in clusters if cluster["status"] == TASK_STATUS_SUCCESS),
+            "max_distance": self.max_distance,
+            "vectorized": np is not None,
+        }
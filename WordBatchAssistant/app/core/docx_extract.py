@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import zipfile
+import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 try:
     from docx import Document  # type: ignore
@@ -15,6 +17,29 @@ from .chunking import estimate_tokens
 from .types import DocMeta
 
 
+ENGINE_PYTHON_DOCX = "python-docx"
+ENGINE_XML = "xml"
+EXTRACT_ENGINES = (ENGINE_PYTHON_DOCX, ENGINE_XML)
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_W_BODY = _W_NS + "body"
+_W_P = _W_NS + "p"
+_W_R = _W_NS + "r"
+_W_HYPERLINK = _W_NS + "hyperlink"
+_W_TBL = _W_NS + "tbl"
+_W_TR = _W_NS + "tr"
+_W_TC = _W_NS + "tc"
+_W_T = _W_NS + "t"
+_W_TAB = _W_NS + "tab"
+_W_PTAB = _W_NS + "ptab"
+_W_BR = _W_NS + "br"
+_W_CR = _W_NS + "cr"
+_W_NO_BREAK_HYPHEN = _W_NS + "noBreakHyphen"
+_W_VAL = _W_NS + "val"
+_W_TYPE = _W_NS + "type"
+
+
 class UnsupportedDocumentError(Exception):
     pass
 
@@ -55,35 +80,160 @@ def _extract_tables(document) -> List[str]:
     return rows
 
 
-def extract_text(path: str, include_tables: bool = True) -> Tuple[str, DocMeta]:
-    _ensure_docx_available()
+def extract_text(path: str, include_tables: bool = True, engine: str = ENGINE_PYTHON_DOCX) -> Tuple[str, DocMeta]:
+    if engine not in EXTRACT_ENGINES:
+        raise ValueError(f"Unknown extract engine: {engine}")
     filepath = Path(path)
+    if engine == ENGINE_PYTHON_DOCX:
+        _ensure_docx_available()
     if filepath.suffix.lower() != ".docx":
         raise UnsupportedDocumentError("Only .docx files are supported. Please convert the file before processing.")
 
+    if engine == ENGINE_XML:
+        lines, table_lines, paragraph_count, table_count = _extract_xml(filepath, include_tables)
+    else:
+        lines, table_lines, paragraph_count, table_count = _extract_python_docx(filepath, include_tables)
+
+    combined_lines = lines
+    if table_lines:
+        combined_lines = lines + [""] + table_lines
+
+    text = "\n".join(combined_lines).strip()
+    meta = DocMeta(
+        paragraph_count=paragraph_count,
+        table_count=table_count,
+        char_count=len(text),
+    )
+    meta.token_est = estimate_tokens(text)
+    return text, meta
+
+
+def _extract_python_docx(filepath: Path, include_tables: bool) -> Tuple[List[str], List[str], int, int]:
     try:
         document = Document(str(filepath))
     except Exception as exc:  # noqa: E722
         raise DocumentExtractionError(f"Failed to read document: {filepath}") from exc
 
     paragraphs = [p.text for p in document.paragraphs]
-    paragraph_count = len(paragraphs)
     lines = _clean_lines(paragraphs)
 
     table_lines: List[str] = []
     table_count = len(document.tables)
     if include_tables and table_count:
         table_lines = _extract_tables(document)
+    return lines, table_lines, len(paragraphs), table_count
 
-    combined_lines = lines
-    if table_lines:
-        combined_lines = lines + [""] + table_lines
 
-    text = "\n".join(combined_lines).strip()
-    meta = DocMeta(
-        paragraph_count=paragraph_count,
-        table_count=table_count,
-        char_count=len(text),
-    )
-    meta.token_est = estimate_tokens(text)
-    return text, meta
+# Streaming engine ---------------------------------------------------
+#
+# Reads only the main document part straight from the zip and mirrors the
+# text rules python-docx applies: top-level paragraphs and tables of the body,
+# runs directly under a paragraph or hyperlink, and merged cells repeated once
+# per spanned grid column.
+
+
+def _extract_xml(filepath: Path, include_tables: bool) -> Tuple[List[str], List[str], int, int]:
+    paragraphs: List[str] = []
+    table_lines: List[str] = []
+    table_count = 0
+    try:
+        with zipfile.ZipFile(filepath) as archive:
+            part_name = _main_document_part(archive)
+            with archive.open(part_name) as stream:
+                for block in _iter_body_blocks(stream):
+                    if block.tag == _W_P:
+                        paragraphs.append(_xml_paragraph_text(block))
+                    elif block.tag == _W_TBL:
+                        table_count += 1
+                        if include_tables:
+                            table_lines.extend(_xml_table_rows(block))
+                            table_lines.append("")
+    except (zipfile.BadZipFile, KeyError, ET.ParseError, OSError) as exc:
+        raise DocumentExtractionError(f"Failed to read document: {filepath}") from exc
+    return _clean_lines(paragraphs), table_lines, len(paragraphs), table_count
+
+
+def _main_document_part(archive: zipfile.ZipFile) -> str:
+    try:
+        rels = ET.fromstring(archive.read("_rels/.rels"))
+    except KeyError:
+        return "word/document.xml"
+    for rel in rels.iter(_REL_NS + "Relationship"):
+        if rel.get("Type", "").endswith("/officeDocument"):
+            return rel.get("Target", "word/document.xml").lstrip("/")
+    return "word/document.xml"
+
+
+def _iter_body_blocks(stream) -> Iterable[ET.Element]:
+    depth = 0
+    body: Optional[ET.Element] = None
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 2 and elem.tag == _W_BODY:
+                body = elem
+            continue
+        depth -= 1
+        if depth == 2 and body is not None:
+            yield elem
+            body.remove(elem)
+
+
+def _xml_run_text(run: ET.Element) -> str:
+    parts: List[str] = []
+    for child in run:
+        tag = child.tag
+        if tag == _W_T:
+            parts.append(child.text or "")
+        elif tag in (_W_TAB, _W_PTAB):
+            parts.append("\t")
+        elif tag == _W_BR:
+            if child.get(_W_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif tag == _W_CR:
+            parts.append("\n")
+        elif tag == _W_NO_BREAK_HYPHEN:
+            parts.append("-")
+    return "".join(parts)
+
+
+def _xml_paragraph_text(paragraph: ET.Element) -> str:
+    parts: List[str] = []
+    for child in paragraph:
+        if child.tag == _W_R:
+            parts.append(_xml_run_text(child))
+        elif child.tag == _W_HYPERLINK:
+            parts.extend(_xml_run_text(run) for run in child.findall(_W_R))
+    return "".join(parts)
+
+
+def _int_attr(parent: ET.Element, path: str, default: int) -> int:
+    node = parent.find(path)
+    if node is None:
+        return default
+    try:
+        return int(node.get(_W_VAL, default))
+    except ValueError:
+        return default
+
+
+def _xml_table_rows(table: ET.Element) -> List[str]:
+    rows: List[str] = []
+    above: Dict[int, str] = {}
+    for tr in table.findall(_W_TR):
+        offset = _int_attr(tr, f"{_W_NS}trPr/{_W_NS}gridBefore", 0)
+        current: Dict[int, str] = {}
+        cells: List[str] = []
+        for tc in tr.findall(_W_TC):
+            span = max(_int_attr(tc, f"{_W_NS}tcPr/{_W_NS}gridSpan", 1), 1)
+            v_merge = tc.find(f"{_W_NS}tcPr/{_W_NS}vMerge")
+            if v_merge is not None and v_merge.get(_W_VAL, "continue") == "continue" and offset in above:
+                text = above[offset]
+            else:
+                text = "\n".join(_xml_paragraph_text(p) for p in tc.findall(_W_P))
+            current[offset] = text
+            cells.extend([text.strip().replace("\n", " ")] * span)
+            offset += span
+        rows.append("| " + " | ".join(cells) + " |")
+        above = current
+    return rows
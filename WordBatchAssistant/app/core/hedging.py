@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from .timing import percentile
+
+
+HEDGE_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+
+class HedgePolicy:
+    # Decides when a slow request gets a duplicate: once its first attempt
+    # has been in flight longer than the given percentile of recent
+    # successful attempts of this run. At most max_in_flight duplicates run at
+    # a time; beyond that the request just keeps waiting.
+
+    def __init__(self, pct: float, max_in_flight: int) -> None:
+        self.pct = min(max(pct, 1.0), 99.9)
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+        self.issued = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.capped = 0
+        self._latencies: Deque[float] = deque(maxlen=HEDGE_WINDOW)
+        self._lock = threading.Lock()
+
+    def observe(self, latency_sec: float) -> None:
+        with self._lock:
+            self._latencies.append(latency_sec)
+
+    def delay(self) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            return percentile(sorted(self._latencies), self.pct)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.capped += 1
+                return False
+            self.in_flight += 1
+            self.issued += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def record_winner(self, hedge: bool) -> None:
+        with self._lock:
+            if hedge:
+                self.hedge_wins += 1
+            else:
+                self.primary_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ordered = sorted(self._latencies)
+            ready = len(ordered) >= HEDGE_MIN_SAMPLES
+            return {
+                "percentile": self.pct,
+                "max_in_flight": self.max_in_flight,
+                "delay_sec": round(percentile(ordered, self.pct), 3) if ready else None,
+                "issued": self.issued,
+                "hedge_wins": self.hedge_wins,
+                "primary_wins": self.primary_wins,
+                "capped": self.capped,
+                "in_flight": self.in_flight,
+            }
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .types import AppConfig, TaskItem
+
+# Settings that change what a result file contains. Anything else (concurrency,
+# caching, rate limits) can differ between runs without invalidating progress.
+FINGERPRINT_FIELDS = (
+    "model",
+    "temperature",
+    "max_output_tokens",
+    "include_tables",
+    "extract_engine",
+    "long_doc_mode",
+    "prompt_layout",
+    "max_input_tokens",
+    "chunk_target_tokens",
+    "pack_max_docs",
+    "pack_max_tokens",
+    "dedup_policy",
+    "dedup_max_distance",
+)
+
+COMPACT_MIN_LINES = 1000
+
+
+def run_fingerprint(config: AppConfig, prompt_template: str) -> str:
+    material = {name: getattr(config, name) for name in FINGERPRINT_FIELDS}
+    material["prompt"] = prompt_template
+    encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def file_signature(path: str) -> Dict[str, int]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {}
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class RunJournal:
+    # Append-only JSON lines: a "run" record carrying the settings fingerprint,
+    # followed by one "task" record per state transition. Each record is
+    # flushed to the OS immediately (survives a killed process); fsync is
+    # batched so power-loss durability costs one sync per fsync_every records.
+
+    def __init__(self, path: str, fingerprint: str, fsync_every: int = 64, fsync_interval_sec: float = 1.0):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval_sec = fsync_interval_sec
+        self._file = None
+        self._pending_sync = 0
+        self._last_sync = time.monotonic()
+        self._line_count = 0
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        state: Dict[str, Dict[str, Any]] = {}
+        self._line_count = 0
+        if not self.path.exists():
+            return state
+        current: Optional[str] = None
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                self._line_count += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash; everything before it is intact.
+                    continue
+                if record.get("type") == "run":
+                    current = record.get("fingerprint")
+                elif record.get("type") == "task" and current == self.fingerprint:
+                    state[record["filepath"]] = record
+        return state
+
+    def open(self, state: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        with self._lock:
+            if self._file is not None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if state is not None and self._line_count > max(COMPACT_MIN_LINES, 2 * len(state)):
+                self._compact(state)
+            self._file = self.path.open("a", encoding="utf-8")
+            self._write({"type": "run", "fingerprint": self.fingerprint, "time": time.time()})
+            self._sync()
+
+    def record(self, task: TaskItem, status: Optional[str] = None) -> None:
+        entry = {
+            "type": "task",
+            "filepath": os.path.abspath(task.filepath),
+            "status": status or task.status,
+            "output_path": task.output_path or "",
+            "error": task.error_message,
+            "file": file_signature(task.filepath),
+            "time": time.time(),
+        }
+        with self._lock:
+            if self._file is None:
+                return
+            self._write(entry)
+            self._pending_sync += 1
+            if (
+                self._pending_sync >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval_sec
+            ):
+                self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        assert self._file is not None
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _sync(self) -> None:
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+        self._pending_sync = 0
+        self._last_sync = time.monotonic()
+
+    def _compact(self, state: Dict[str, Dict[str, Any]]) -> None:
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "run", "fingerprint": self.fingerprint, "time": time.time()}) + "\n")
+            for record in state.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._line_count = len(state) + 1
@@ -1,85 +1,560 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import random
+import threading
 import time
-from typing import Any, Dict, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict
+from typing import Any, Callable, Dict, Iterable, List, NoReturn, Optional, Union
 
 import requests
 
-from .types import AppConfig, LLMResponse, LLMUsage
+try:
+    import aiohttp  # type: ignore
+except ImportError as exc:  # pragma: no cover - optional dependency for the asyncio engine
+    aiohttp = None  # type: ignore
+    _AIOHTTP_IMPORT_ERROR: Optional[ImportError] = exc
+else:
+    _AIOHTTP_IMPORT_ERROR = None
+
+from .backends import Backend, BackendPool
+from .cache import DiskCache
+from .tokens import MESSAGE_OVERHEAD_TOKENS, get_estimator
+from .concurrency import OUTCOME_NEUTRAL, OUTCOME_SUCCESS, OUTCOME_THROTTLED, AdaptiveConcurrency
+from .hedging import HedgePolicy
+from .rate_limit import RateLimiter
+from .types import AppConfig, LLMResponse, LLMUsage, RenderedPrompt, StreamSink
+
+
+MAX_ATTEMPTS = 6
+MAX_TIMEOUT_ATTEMPTS = 3
+MAX_BACKOFF_SEC = 32
+
+
+class _StreamAccumulator:
+    def __init__(self, sink: Optional[StreamSink], started: float):
+        self.sink = sink
+        self.started = started
+        self.parts: list[str] = []
+        self.usage: Optional[LLMUsage] = None
+        self.first_token_sec: Optional[float] = None
+        # Set by [DONE] or a finish_reason; a stream that just stops is truncated.
+        self.complete = False
+
+    def feed(self, line: str) -> bool:
+        line = line.strip()
+        if not line.startswith("data:"):
+            return False
+        data = line[5:].strip()
+        if data == "[DONE]":
+            self.complete = True
+            return True
+        chunk = json.loads(data)
+        if chunk.get("error"):
+            raise RuntimeError(f"LLM stream error: {chunk['error']}")
+        if chunk.get("usage"):
+            self.usage = LLMClient._parse_usage(chunk)
+        for choice in chunk.get("choices") or []:
+            if choice.get("finish_reason"):
+                self.complete = True
+            content = (choice.get("delta") or {}).get("content")
+            if not content:
+                continue
+            if self.first_token_sec is None:
+                self.first_token_sec = time.monotonic() - self.started
+            self.parts.append(content)
+            if self.sink:
+                self.sink.write(content)
+        return False
+
+    def response(self) -> LLMResponse:
+        return LLMResponse(
+            text="".join(self.parts),
+            usage=self.usage,
+            first_token_sec=self.first_token_sec,
+            elapsed_sec=time.monotonic() - self.started,
+        )
+
+
+class _AttemptClock:
+    # Splits one generate() call into time spent waiting for the rate limiter
+    # and a concurrency slot, each HTTP attempt, and backoff sleeps.
+
+    def __init__(self) -> None:
+        self.attempt_sec: List[float] = []
+        self.wait_sec = 0.0
+        self.backoff_sec = 0.0
+        self._mark = time.monotonic()
+
+    def start_attempt(self) -> float:
+        now = time.monotonic()
+        self.wait_sec += now - self._mark
+        return now
+
+    def end_attempt(self, started: float) -> None:
+        self._mark = time.monotonic()
+        self.attempt_sec.append(self._mark - started)
+
+    def slept(self, seconds: float) -> None:
+        self.backoff_sec += seconds
+        self._mark = time.monotonic()
+
+    def stamp(self, response: LLMResponse) -> LLMResponse:
+        response.attempt_sec = self.attempt_sec
+        response.wait_sec = self.wait_sec
+        response.backoff_sec = self.backoff_sec
+        return response
+
+
+REQUEST_TIMEOUT = "timeout"
+REQUEST_ERROR = "error"
+REQUEST_CANCELLED = "cancelled"
+
+
+class _HedgeCancelled(RuntimeError):
+    pass
+
+
+class _Leg:
+    # One copy of a hedged request; sent fires once it holds a concurrency
+    # slot (or gave up before getting one), cancelled stops the loser.
+
+    def __init__(self, sent: Any, hedge: bool = False) -> None:
+        self.sent = sent
+        self.sent_at: Optional[float] = None
+        self.hedge = hedge
+        self.cancelled = False
+
+    def mark_sent(self) -> None:
+        if self.sent_at is None:
+            self.sent_at = time.monotonic()
+            self.sent.set()
+
+
+class _Route:
+    # Where one attempt goes: the configured endpoint, or a backend of the pool.
+
+    def __init__(
+        self,
+        endpoint: str,
+        payload: Dict[str, Any],
+        headers: Dict[str, str],
+        rate_limiter: Optional[RateLimiter],
+        backend: Optional[Backend] = None,
+    ) -> None:
+        self.endpoint = endpoint
+        self.payload = payload
+        self.headers = headers
+        self.rate_limiter = rate_limiter
+        self.backend = backend
+
+
+class RequestStats:
+    # Attempts by HTTP status (or timeout/error) and the retries they caused,
+    # shared by the thread and asyncio clients of a run.
+
+    def __init__(self) -> None:
+        self.requests: Dict[str, int] = {}
+        self.retries: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, status: str) -> None:
+        with self._lock:
+            self.requests[status] = self.requests.get(status, 0) + 1
+
+    def record_retry(self, status: str) -> None:
+        with self._lock:
+            self.retries[status] = self.retries.get(status, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {"requests": dict(self.requests), "retries": dict(self.retries)}
 
 
 class LLMClient:
-    def __init__(self, config: AppConfig, session: Optional[requests.Session] = None):
+    def __init__(
+        self,
+        config: AppConfig,
+        session: Optional[requests.Session] = None,
+        cache: Optional[DiskCache] = None,
+        limiter: Optional[AdaptiveConcurrency] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        request_stats: Optional[RequestStats] = None,
+        backends: Optional[BackendPool] = None,
+        hedging: Optional[HedgePolicy] = None,
+        on_discarded: Optional[Callable[[LLMResponse], None]] = None,
+    ):
         self.config = config
         self.session = session or requests.Session()
+        self.cache = cache
+        self.limiter = limiter
+        self.rate_limiter = rate_limiter
+        self.request_stats = request_stats
+        self.backends = backends
+        self.hedging = hedging
+        self.on_discarded = on_discarded
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_pool_lock = threading.Lock()
+        self.estimator = get_estimator(config.token_estimator, config.token_vocab_path, config.token_estimate_scale)
 
-    def generate(self, prompt: str) -> LLMResponse:
-        payload = {
+    def generate(self, prompt: Union[str, RenderedPrompt], stream_sink: Optional[StreamSink] = None) -> LLMResponse:
+        payload = self._build_payload(prompt)
+        cache_key = self._cache_key(payload) if self.cache else None
+        if cache_key:
+            cached = self._load_cached(cache_key, stream_sink)
+            if cached is not None:
+                return cached
+
+        response = self._post_hedged(payload, stream_sink)
+        response.prompt_tokens_est = self._prompt_tokens(payload)
+        if cache_key:
+            self._store_cached(cache_key, response)
+        return response
+
+    def _build_payload(self, prompt: Union[str, RenderedPrompt]) -> Dict[str, Any]:
+        if isinstance(prompt, str):
+            prompt = RenderedPrompt(user=prompt)
+        messages = []
+        if prompt.system:
+            messages.append({"role": "system", "content": prompt.system})
+        messages.append({"role": "user", "content": prompt.user})
+        return {
             "model": self.config.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": messages,
             "temperature": self.config.temperature,
             "max_tokens": self.config.max_output_tokens,
         }
+
+    def _streaming(self) -> bool:
+        return bool(self.config.stream)
+
+    def _stream_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {**payload, "stream": True, "stream_options": {"include_usage": True}}
+
+    def _headers(self, api_key: Optional[str] = None) -> Dict[str, str]:
         headers = {
             "Content-Type": "application/json",
         }
-        if self.config.api_key:
-            headers["Authorization"] = f"Bearer {self.config.api_key}"
+        api_key = self.config.api_key if api_key is None else api_key
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        return headers
+
+    def _route(self, payload: Dict[str, Any], tried: List[Backend]) -> _Route:
+        if self.backends is None:
+            return _Route(self.config.endpoint, payload, self._headers(), self.rate_limiter)
+        backend = self.backends.pick(tried)
+        tried.append(backend)
+        return _Route(
+            backend.endpoint,
+            {**payload, "model": backend.model},
+            self._headers(backend.api_key),
+            backend.rate_limiter,
+            backend,
+        )
+
+    def _failover(self, route: _Route, tried: List[Backend], reason: str) -> bool:
+        # With another healthy backend in the pool the retry goes there right
+        # away instead of backing off.
+        if route.backend is None or self.backends is None or not self.backends.has_alternative(tried):
+            return False
+        if self.request_stats:
+            self.request_stats.record_retry(reason)
+        return True
+
+    def _failover_fatal(self, route: _Route, tried: List[Backend], status_code: int) -> bool:
+        # A rejected key only disqualifies its own backend.
+        if route.backend is None or self.backends is None or status_code not in {401, 403}:
+            return False
+        self.backends.disable(route.backend, str(status_code))
+        return self._failover(route, tried, str(status_code))
+
+    def _prompt_tokens(self, payload: Dict[str, Any]) -> int:
+        return sum(
+            self.estimator.count(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+            for message in payload["messages"]
+        )
+
+    def _request_cost(self, payload: Dict[str, Any]) -> int:
+        return self._prompt_tokens(payload) + self.config.max_output_tokens
+
+    def close(self) -> None:
+        with self._hedge_pool_lock:
+            pool, self._hedge_pool = self._hedge_pool, None
+        if pool is not None:
+            # Lets dropped hedge legs finish their last attempt.
+            pool.shutdown(wait=True)
+
+    def _hedge_delay(self) -> Optional[float]:
+        # Streamed replies are already being written out, so they are never raced.
+        if self.hedging is None or self._streaming():
+            return None
+        return self.hedging.delay()
+
+    def _observe_latency(self, response: LLMResponse) -> None:
+        if self.hedging is not None and response.attempt_sec:
+            self.hedging.observe(response.attempt_sec[-1])
+
+    def _post_hedged(self, payload: Dict[str, Any], stream_sink: Optional[StreamSink] = None) -> LLMResponse:
+        delay = self._hedge_delay()
+        if delay is None:
+            response = self._post_with_retries(payload, stream_sink)
+        else:
+            response = self._race(payload, delay)
+        self._observe_latency(response)
+        return response
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        assert self.hedging is not None
+        with self._hedge_pool_lock:
+            if self._hedge_pool is None:
+                # Primaries come from the LLM workers and the chunk fan-out pool.
+                workers = max(1, self.config.concurrency) * 2 + self.hedging.max_in_flight
+                self._hedge_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-hedge")
+            return self._hedge_pool
+
+    def _discard(self, payload: Dict[str, Any], response: Optional[LLMResponse]) -> None:
+        # A hedge loser that reached the API is billed all the same; one cut
+        # off before its answer arrived counts as an estimated request.
+        if self.on_discarded is None:
+            return
+        if response is None:
+            response = LLMResponse(text="", model=str(payload.get("model") or ""))
+        response.prompt_tokens_est = self._prompt_tokens(payload)
+        self.on_discarded(response)
 
+    def _run_leg(self, payload: Dict[str, Any], leg: _Leg) -> LLMResponse:
+        try:
+            return self._post_with_retries(payload, None, leg)
+        finally:
+            leg.sent.set()
+
+    def _race(self, payload: Dict[str, Any], delay: float) -> LLMResponse:
+        # The loser cannot be interrupted mid-request; it is dropped and stops
+        # before its next attempt.
+        hedging = self.hedging
+        assert hedging is not None
+        executor = self._hedge_executor()
+        primary = _Leg(threading.Event())
+        legs: Dict[Future, _Leg] = {executor.submit(self._run_leg, payload, primary): primary}
+        winner: Optional[Future] = None
+        try:
+            primary.sent.wait()
+            if primary.sent_at is not None:
+                done, _ = wait(legs, timeout=max(0.0, primary.sent_at + delay - time.monotonic()))
+                if not done and hedging.try_acquire():
+                    hedge = _Leg(threading.Event(), hedge=True)
+                    future = executor.submit(self._run_leg, payload, hedge)
+                    future.add_done_callback(lambda _: hedging.release())
+                    legs[future] = hedge
+            pending = set(legs)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    exc = future.exception()
+                    if exc is None:
+                        if len(legs) > 1:
+                            hedging.record_winner(legs[future].hedge)
+                        winner = future
+                        return future.result()
+                    error = error or exc
+            assert error is not None
+            raise error
+        finally:
+            for future, leg in legs.items():
+                leg.cancelled = True
+                if future is not winner:
+                    # The loser finishes its current attempt in the background.
+                    future.add_done_callback(
+                        lambda done: self._discard(payload, done.result()) if done.exception() is None else None
+                    )
+
+    def _post_with_retries(
+        self, payload: Dict[str, Any], stream_sink: Optional[StreamSink] = None, leg: Optional[_Leg] = None
+    ) -> LLMResponse:
+        cost = self._request_cost(payload)
+        streaming = self._streaming()
+        if streaming:
+            payload = self._stream_payload(payload)
+            timeout: Any = (self.config.timeout_sec, self.config.stream_idle_timeout_sec)
+        else:
+            timeout = self.config.timeout_sec
         attempt = 0
         last_error: Optional[Exception] = None
         backoff_seconds = 1.0
-        while attempt < 6:
+        clock = _AttemptClock()
+        tried: List[Backend] = []
+        while attempt < MAX_ATTEMPTS:
             attempt += 1
+            if leg is not None and leg.cancelled:
+                raise _HedgeCancelled("hedged request lost the race")
+            route = self._route(payload, tried)
+            if route.rate_limiter:
+                route.rate_limiter.acquire(cost)
+            if self.limiter:
+                self.limiter.acquire()
+            self._send_leg(leg)
+            started = clock.start_attempt()
+            streamed: Optional[LLMResponse] = None
             try:
                 response = self.session.post(
-                    self.config.endpoint,
-                    json=payload,
-                    headers=headers,
-                    timeout=self.config.timeout_sec,
+                    route.endpoint,
+                    json=route.payload,
+                    headers=route.headers,
+                    timeout=timeout,
+                    stream=streaming,
                 )
+                if streaming and response.status_code == 200:
+                    if stream_sink:
+                        stream_sink.reset()
+                    lines = (raw_line.decode("utf-8") for raw_line in response.iter_lines())
+                    streamed = self._read_stream(lines, stream_sink, started)
             except requests.Timeout as exc:
+                clock.end_attempt(started)
+                self._release_slot(OUTCOME_THROTTLED, status=REQUEST_TIMEOUT, route=route)
                 last_error = exc
-                if attempt >= 3:
+                if attempt >= MAX_TIMEOUT_ATTEMPTS:
                     break
-                self._sleep(backoff_seconds)
-                backoff_seconds *= 2
+                if not self._failover(route, tried, REQUEST_TIMEOUT):
+                    clock.slept(self._sleep(backoff_seconds, REQUEST_TIMEOUT))
+                    backoff_seconds *= 2
                 continue
             except requests.RequestException as exc:
+                clock.end_attempt(started)
+                self._release_slot(OUTCOME_NEUTRAL, status=REQUEST_ERROR, route=route)
                 last_error = exc
-                self._sleep(backoff_seconds)
-                backoff_seconds *= 2
+                if not self._failover(route, tried, REQUEST_ERROR):
+                    clock.slept(self._sleep(backoff_seconds, REQUEST_ERROR))
+                    backoff_seconds *= 2
                 continue
+            except Exception:
+                self._release_slot(OUTCOME_NEUTRAL, status=REQUEST_ERROR, route=route)
+                raise
+            clock.end_attempt(started)
+            self._release_slot(
+                self._status_outcome(response.status_code),
+                time.monotonic() - started,
+                str(response.status_code),
+                route,
+            )
 
             if response.status_code == 200:
-                data = response.json()
-                text = self._extract_text(data)
-                usage = self._parse_usage(data)
-                return LLMResponse(text=text, usage=usage, raw=data)
+                if streamed is not None:
+                    return clock.stamp(self._served(route, streamed))
+                parsed = self._parse_success(response.json(), time.monotonic() - started)
+                return clock.stamp(self._served(route, parsed))
 
-            if response.status_code in {400, 401, 403}:
-                raise RuntimeError(f"LLM request failed: {response.status_code} {response.text}")
-
-            if response.status_code == 429:
-                self._sleep(backoff_seconds)
-                backoff_seconds = min(backoff_seconds * 2, 32)
+            if self._failover_fatal(route, tried, response.status_code):
                 continue
-
-            if response.status_code >= 500:
-                self._sleep(backoff_seconds)
-                backoff_seconds = min(backoff_seconds * 2, 32)
+            self._raise_for_fatal_status(response.status_code, response.text)
+            if self._failover(route, tried, str(response.status_code)):
                 continue
+            clock.slept(self._sleep(backoff_seconds, str(response.status_code)))
+            backoff_seconds = min(backoff_seconds * 2, MAX_BACKOFF_SEC)
+
+        self._raise_exhausted(last_error)
+
+    @staticmethod
+    def _read_stream(lines: Iterable[str], stream_sink: Optional[StreamSink], started: float) -> LLMResponse:
+        accumulator = _StreamAccumulator(stream_sink, started)
+        for line in lines:
+            if line and accumulator.feed(line):
+                break
+        if not accumulator.complete:
+            raise requests.exceptions.ChunkedEncodingError("stream ended before [DONE]")
+        return accumulator.response()
+
+    def _parse_success(self, data: Dict[str, Any], elapsed_sec: float = 0.0) -> LLMResponse:
+        text = self._extract_text(data)
+        usage = self._parse_usage(data)
+        return LLMResponse(text=text, usage=usage, raw=data, elapsed_sec=elapsed_sec)
+
+    @staticmethod
+    def _served(route: _Route, response: LLMResponse) -> LLMResponse:
+        response.model = str(route.payload.get("model") or "")
+        return response
+
+    def _send_leg(self, leg: Optional[_Leg]) -> None:
+        # Called with a concurrency slot held.
+        if leg is None:
+            return
+        if leg.cancelled:
+            self._release_slot(OUTCOME_NEUTRAL)
+            raise _HedgeCancelled("hedged request lost the race")
+        leg.mark_sent()
+
+    def _release_slot(
+        self, outcome: str, latency_sec: float = 0.0, status: str = "", route: Optional[_Route] = None
+    ) -> None:
+        if self.request_stats and status:
+            self.request_stats.record(status)
+        if route is not None and route.backend is not None and self.backends is not None:
+            failed = outcome == OUTCOME_THROTTLED or status == REQUEST_ERROR
+            self.backends.observe(route.backend, status, latency_sec, failed)
+        if self.limiter:
+            self.limiter.release(outcome, latency_sec)
+
+    @staticmethod
+    def _status_outcome(status_code: int) -> str:
+        if status_code == 200:
+            return OUTCOME_SUCCESS
+        if status_code == 429 or status_code >= 500:
+            return OUTCOME_THROTTLED
+        return OUTCOME_NEUTRAL
 
-            raise RuntimeError(f"Unexpected LLM status {response.status_code}: {response.text}")
+    @staticmethod
+    def _raise_for_fatal_status(status_code: int, body: str) -> None:
+        if status_code in {400, 401, 403}:
+            raise RuntimeError(f"LLM request failed: {status_code} {body}")
+        if status_code != 429 and status_code < 500:
+            raise RuntimeError(f"Unexpected LLM status {status_code}: {body}")
 
+    @staticmethod
+    def _raise_exhausted(last_error: Optional[Exception]) -> NoReturn:
         if last_error:
             raise RuntimeError(f"LLM request failed after retries: {last_error}") from last_error
         raise RuntimeError("LLM request failed after retries")
 
-    def _sleep(self, seconds: float) -> None:
+    def _cache_key(self, payload: Dict[str, Any]) -> str:
+        material = {"endpoint": self.config.endpoint, **payload}
+        encoded = json.dumps(material, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _load_cached(self, key: str, stream_sink: Optional[StreamSink] = None) -> Optional[LLMResponse]:
+        assert self.cache is not None
+        value = self.cache.get(key)
+        if value is None:
+            return None
+        try:
+            data = json.loads(value)
+        except ValueError:
+            return None
+        usage = LLMUsage(**data["usage"]) if data.get("usage") else None
+        if stream_sink:
+            stream_sink.reset()
+            stream_sink.write(data["text"])
+        return LLMResponse(text=data["text"], usage=usage, cached=True, model=self.config.model)
+
+    def _store_cached(self, key: str, response: LLMResponse) -> None:
+        assert self.cache is not None
+        data = {"text": response.text, "usage": asdict(response.usage) if response.usage else None}
+        self.cache.set(key, json.dumps(data, ensure_ascii=False))
+
+    def _sleep(self, seconds: float, reason: str) -> float:
+        if self.request_stats:
+            self.request_stats.record_retry(reason)
+        delay = self._jittered(seconds)
+        time.sleep(delay)
+        return delay
+
+    @staticmethod
+    def _jittered(seconds: float) -> float:
         jitter = random.random() * 0.25
-        time.sleep(max(seconds + jitter, 0.5))
+        return max(seconds + jitter, 0.5)
 
     @staticmethod
     def _extract_text(data: Dict[str, Any]) -> str:
@@ -102,9 +577,245 @@ class LLMClient:
         usage = data.get("usage")
         if not usage:
             return None
+        # Prefix-cache hits: OpenAI-style prompt_tokens_details, DeepSeek's
+        # prompt_cache_hit_tokens, Anthropic-style cache_read_input_tokens.
+        details = usage.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") if isinstance(details, dict) else None
+        if cached is None:
+            cached = usage.get("prompt_cache_hit_tokens", usage.get("cache_read_input_tokens"))
+        reasoning = usage.get("reasoning_tokens")
+        if reasoning is None:
+            completion_details = usage.get("completion_tokens_details") or {}
+            if isinstance(completion_details, dict):
+                reasoning = completion_details.get("reasoning_tokens")
         return LLMUsage(
             prompt_tokens=usage.get("prompt_tokens"),
             completion_tokens=usage.get("completion_tokens"),
-            reasoning_tokens=usage.get("reasoning_tokens"),
+            reasoning_tokens=reasoning,
             total_tokens=usage.get("total_tokens"),
+            cached_prompt_tokens=cached,
+        )
+
+
+class AsyncLLMClient(LLMClient):
+    def __init__(
+        self,
+        config: AppConfig,
+        cache: Optional[DiskCache] = None,
+        limiter: Optional[AdaptiveConcurrency] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_connections: int = 0,
+        request_stats: Optional[RequestStats] = None,
+        backends: Optional[BackendPool] = None,
+        hedging: Optional[HedgePolicy] = None,
+        on_discarded: Optional[Callable[[LLMResponse], None]] = None,
+    ):
+        super().__init__(
+            config,
+            cache=cache,
+            limiter=limiter,
+            rate_limiter=rate_limiter,
+            request_stats=request_stats,
+            backends=backends,
+            hedging=hedging,
+            on_discarded=on_discarded,
         )
+        self.max_connections = max_connections or max(1, config.concurrency)
+        self._async_session = None
+
+    async def agenerate(
+        self, prompt: Union[str, RenderedPrompt], stream_sink: Optional[StreamSink] = None
+    ) -> LLMResponse:
+        payload = self._build_payload(prompt)
+        cache_key = self._cache_key(payload) if self.cache else None
+        if cache_key:
+            cached = self._load_cached(cache_key, stream_sink)
+            if cached is not None:
+                return cached
+
+        response = await self._apost_hedged(payload, stream_sink)
+        response.prompt_tokens_est = self._prompt_tokens(payload)
+        if cache_key:
+            self._store_cached(cache_key, response)
+        return response
+
+    async def _asleep(self, seconds: float, reason: str) -> float:
+        if self.request_stats:
+            self.request_stats.record_retry(reason)
+        delay = self._jittered(seconds)
+        await asyncio.sleep(delay)
+        return delay
+
+    async def aclose(self) -> None:
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+
+    def _ensure_async_session(self):
+        if aiohttp is None:
+            raise RuntimeError(
+                "aiohttp is required for the asyncio engine"
+                + (f": {_AIOHTTP_IMPORT_ERROR}" if _AIOHTTP_IMPORT_ERROR else "")
+            )
+        if self._async_session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self._async_session = aiohttp.ClientSession(connector=connector)
+        return self._async_session
+
+    async def _apost_hedged(
+        self, payload: Dict[str, Any], stream_sink: Optional[StreamSink] = None
+    ) -> LLMResponse:
+        delay = self._hedge_delay()
+        if delay is None:
+            response = await self._apost_with_retries(payload, stream_sink)
+        else:
+            response = await self._arace(payload, delay)
+        self._observe_latency(response)
+        return response
+
+    async def _arun_leg(self, payload: Dict[str, Any], leg: _Leg) -> LLMResponse:
+        try:
+            return await self._apost_with_retries(payload, None, leg)
+        finally:
+            leg.sent.set()
+
+    async def _arace(self, payload: Dict[str, Any], delay: float) -> LLMResponse:
+        hedging = self.hedging
+        assert hedging is not None
+        primary = _Leg(asyncio.Event())
+        legs: Dict["asyncio.Future[LLMResponse]", _Leg] = {
+            asyncio.ensure_future(self._arun_leg(payload, primary)): primary
+        }
+        winner: Optional["asyncio.Future[LLMResponse]"] = None
+        try:
+            await primary.sent.wait()
+            if primary.sent_at is not None:
+                done, _ = await asyncio.wait(legs, timeout=max(0.0, primary.sent_at + delay - time.monotonic()))
+                if not done and hedging.try_acquire():
+                    hedge = _Leg(asyncio.Event(), hedge=True)
+                    task = asyncio.ensure_future(self._arun_leg(payload, hedge))
+                    task.add_done_callback(lambda _: hedging.release())
+                    legs[task] = hedge
+            pending = set(legs)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        if len(legs) > 1:
+                            hedging.record_winner(legs[task].hedge)
+                        winner = task
+                        return task.result()
+                    error = error or exc
+            assert error is not None
+            raise error
+        finally:
+            for task, leg in legs.items():
+                leg.cancelled = True
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                    if leg.sent_at is not None:
+                        self._discard(payload, None)
+                elif not task.cancelled() and task.exception() is None:
+                    self._discard(payload, task.result())
+
+    async def _apost_with_retries(
+        self, payload: Dict[str, Any], stream_sink: Optional[StreamSink] = None, leg: Optional[_Leg] = None
+    ) -> LLMResponse:
+        session = self._ensure_async_session()
+        streaming = self._streaming()
+        if streaming:
+            payload = self._stream_payload(payload)
+            timeout = aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=self.config.timeout_sec,
+                sock_read=self.config.stream_idle_timeout_sec,
+            )
+        else:
+            timeout = aiohttp.ClientTimeout(total=self.config.timeout_sec)
+        cost = self._request_cost(payload)
+        attempt = 0
+        last_error: Optional[Exception] = None
+        backoff_seconds = 1.0
+        clock = _AttemptClock()
+        tried: List[Backend] = []
+        while attempt < MAX_ATTEMPTS:
+            attempt += 1
+            if leg is not None and leg.cancelled:
+                raise _HedgeCancelled("hedged request lost the race")
+            route = self._route(payload, tried)
+            if route.rate_limiter:
+                await route.rate_limiter.aacquire(cost)
+            if self.limiter:
+                await self.limiter.aacquire()
+            self._send_leg(leg)
+            started = clock.start_attempt()
+            streamed: Optional[LLMResponse] = None
+            body = ""
+            try:
+                async with session.post(
+                    route.endpoint,
+                    json=route.payload,
+                    headers=route.headers,
+                    timeout=timeout,
+                ) as response:
+                    status_code = response.status
+                    if streaming and status_code == 200:
+                        if stream_sink:
+                            stream_sink.reset()
+                        accumulator = _StreamAccumulator(stream_sink, started)
+                        async for raw_line in response.content:
+                            if accumulator.feed(raw_line.decode("utf-8")):
+                                break
+                        if not accumulator.complete:
+                            raise aiohttp.ClientPayloadError("stream ended before [DONE]")
+                        streamed = accumulator.response()
+                    else:
+                        body = await response.text()
+            except asyncio.CancelledError:
+                self._release_slot(OUTCOME_NEUTRAL, status=REQUEST_CANCELLED)
+                raise
+            except asyncio.TimeoutError as exc:
+                clock.end_attempt(started)
+                self._release_slot(OUTCOME_THROTTLED, status=REQUEST_TIMEOUT, route=route)
+                last_error = exc
+                if attempt >= MAX_TIMEOUT_ATTEMPTS:
+                    break
+                if not self._failover(route, tried, REQUEST_TIMEOUT):
+                    clock.slept(await self._asleep(backoff_seconds, REQUEST_TIMEOUT))
+                    backoff_seconds *= 2
+                continue
+            except aiohttp.ClientError as exc:
+                clock.end_attempt(started)
+                self._release_slot(OUTCOME_NEUTRAL, status=REQUEST_ERROR, route=route)
+                last_error = exc
+                if not self._failover(route, tried, REQUEST_ERROR):
+                    clock.slept(await self._asleep(backoff_seconds, REQUEST_ERROR))
+                    backoff_seconds *= 2
+                continue
+            except Exception:
+                self._release_slot(OUTCOME_NEUTRAL, status=REQUEST_ERROR, route=route)
+                raise
+            clock.end_attempt(started)
+            self._release_slot(
+                self._status_outcome(status_code), time.monotonic() - started, str(status_code), route
+            )
+
+            if status_code == 200:
+                if streamed is not None:
+                    return clock.stamp(self._served(route, streamed))
+                parsed = self._parse_success(json.loads(body), time.monotonic() - started)
+                return clock.stamp(self._served(route, parsed))
+
+            if self._failover_fatal(route, tried, status_code):
+                continue
+            self._raise_for_fatal_status(status_code, body)
+            if self._failover(route, tried, str(status_code)):
+                continue
+            clock.slept(await self._asleep(backoff_seconds, str(status_code)))
+            backoff_seconds = min(backoff_seconds * 2, MAX_BACKOFF_SEC)
+
+        self._raise_exhausted(last_error)
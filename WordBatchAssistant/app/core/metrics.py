@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .types import LLMUsage, RunnerHooks, RunnerSummary, TaskItem, TaskResult, safe_hook
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+METRIC_PREFIX = "wordbatch"
+
+# A metric family is (name, type, help, samples); each sample is
+# (suffix, labels, value). Counters use the "_total" suffix.
+Sample = Tuple[str, Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+Collector = Callable[[], Iterable[Family]]
+
+
+def gauge(name: str, help_text: str, value: float, labels: Optional[Dict[str, str]] = None) -> Family:
+    return (name, "gauge", help_text, [("", labels or {}, value)])
+
+
+def counter(name: str, help_text: str, values: Dict[str, float], label: str = "") -> Family:
+    if not label:
+        return (name, "counter", help_text, [("_total", {}, values.get("", 0.0))])
+    return (name, "counter", help_text, [("_total", {label: key}, value) for key, value in sorted(values.items())])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_openmetrics(families: Iterable[Family]) -> str:
+    lines: List[str] = []
+    for name, kind, help_text, samples in families:
+        full_name = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# TYPE {full_name} {kind}")
+        lines.append(f"# HELP {full_name} {_escape(help_text)}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+            label_part = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{full_name}{suffix}{label_part} {_format_value(value)}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class RunMetrics:
+    # Task-level metrics fed through RunnerHooks; runner internals (limiter,
+    # caches, queues) are added as collectors that are read at scrape time.
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._task_status: Dict[str, str] = {}
+        self._tokens: Dict[str, float] = {"input": 0.0, "cached_input": 0.0, "output": 0.0}
+        self._summary: Optional[RunnerSummary] = None
+        self._collectors: List[Collector] = [self._collect_tasks]
+
+    def wrap_hooks(self, hooks: RunnerHooks) -> RunnerHooks:
+        def on_task_update(task: TaskItem) -> None:
+            self.observe_task(task)
+            safe_hook(hooks.on_task_update, task)
+
+        def on_task_result(task: TaskItem, result: TaskResult) -> None:
+            self.observe_result(result)
+            safe_hook(hooks.on_task_result, task, result)
+
+        return RunnerHooks(
+            on_task_update=on_task_update,
+            on_progress=hooks.on_progress,
+            on_log=hooks.on_log,
+            on_finished=hooks.on_finished,
+            on_task_output=hooks.on_task_output,
+            on_task_output_reset=hooks.on_task_output_reset,
+            on_task_result=on_task_result,
+        )
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def begin_run(self, summary: RunnerSummary, tasks: Iterable[TaskItem]) -> None:
+        with self._lock:
+            self._summary = summary
+            self._task_status = {task.filepath: task.status for task in tasks}
+
+    def observe_task(self, task: TaskItem) -> None:
+        with self._lock:
+            self._task_status[task.filepath] = task.status
+
+    def observe_result(self, result: TaskResult) -> None:
+        usage: Optional[LLMUsage] = result.usage
+        if usage is None:
+            return
+        with self._lock:
+            self._tokens["input"] += usage.prompt_tokens or 0
+            self._tokens["cached_input"] += usage.cached_prompt_tokens or 0
+            self._tokens["output"] += usage.completion_tokens or 0
+
+    def collect(self) -> List[Family]:
+        families: List[Family] = []
+        for collector in list(self._collectors):
+            families.extend(collector())
+        return families
+
+    def render(self) -> str:
+        return render_openmetrics(self.collect())
+
+    def _collect_tasks(self) -> List[Family]:
+        with self._lock:
+            by_status: Dict[str, float] = {}
+            for status in self._task_status.values():
+                by_status[status] = by_status.get(status, 0) + 1
+            tokens = dict(self._tokens)
+            summary = self._summary.to_dict() if self._summary else None
+        task_samples: List[Sample] = [("", {"status": status}, count) for status, count in sorted(by_status.items())]
+        families: List[Family] = [
+            ("tasks", "gauge", "Tasks of the current run by status", task_samples),
+            counter("llm_tokens", "Tokens reported by the API", tokens, "direction"),
+        ]
+        if summary:
+            finished = {key: summary[key] for key in ("success", "failed", "skipped", "cancelled")}
+            families.append(gauge("run_tasks", "Tasks selected for the current run", summary["total"]))
+            families.append(counter("tasks_finished", "Tasks finished in the current run", finished, "status"))
+            families.append(gauge("run_start_time_seconds", "Start time of the current run", summary["start_time"]))
+        return families
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics: RunMetrics
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0].rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        data = self.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MetricsExporter:
+    # Serves /metrics over HTTP and/or rewrites a text file every interval
+    # (atomic replace, so node_exporter's textfile collector can read it).
+
+    def __init__(
+        self,
+        metrics: RunMetrics,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        file_path: str = "",
+        interval_sec: float = 5.0,
+    ) -> None:
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.file_path = Path(file_path) if file_path else None
+        self.interval_sec = max(interval_sec, 0.5)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            return ""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> None:
+        if self.port:
+            handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": self.metrics})
+            self._server = ThreadingHTTPServer((self.host, self.port), handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        if self.file_path is not None:
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = threading.Thread(target=self._write_loop, name="metrics-file", daemon=True)
+            self._writer.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self.file_path is not None:
+            self.write_file()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def write_file(self) -> None:
+        assert self.file_path is not None
+        tmp_path = self.file_path.with_name(f".{self.file_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.metrics.render(), encoding="utf-8")
+        os.replace(tmp_path, self.file_path)
+
+    def _write_loop(self) -> None:
+        next_write = time.monotonic()
+        while not self._stop.is_set():
+            self.write_file()
+            next_write += self.interval_sec
+            self._stop.wait(max(next_write - time.monotonic(), 0.0))
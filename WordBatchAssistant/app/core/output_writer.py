@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-import csv
 import json
-import threading
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
+
+from .summary_sink import SUMMARY_CSV, SummarySink, create_summary_sink, summary_filename
+from .timing import STAGES, stage_column
+from .types import StreamSink
 
 
 SUMMARY_FIELDS = [
@@ -15,41 +17,116 @@ SUMMARY_FIELDS = [
     "input_chars",
     "input_tokens_est",
     "mode",
+    "ttft_sec",
+    "tokens_per_sec",
+    "prompt_tokens",
+    "completion_tokens",
+    "reasoning_tokens",
+    "cost_est",
+    *[stage_column(stage) for stage in STAGES],
+    "llm_attempts",
+    "duplicate_of",
     "output_path",
     "error_message",
 ]
 
 
+class ResultStream(StreamSink):
+    # Deltas go to a sibling .partial file; the result path is only replaced
+    # on success, so a rerun that fails mid-stream keeps the previous result.
+
+    def __init__(
+        self,
+        path: Path,
+        on_delta: Optional[Callable[[str], None]] = None,
+        on_reset: Optional[Callable[[], None]] = None,
+    ):
+        self.path = path
+        self.partial_path = path.with_name(path.name + ".partial")
+        self.on_delta = on_delta
+        self.on_reset = on_reset
+        self._file = None
+
+    def reset(self) -> None:
+        # A retry or failover starts the answer over.
+        self._truncate()
+        if self.on_reset is not None:
+            self.on_reset()
+
+    def write(self, delta: str) -> None:
+        if self._file is None:
+            self._file = self.partial_path.open("w", encoding="utf-8")
+        self._file.write(delta)
+        self._file.flush()
+        if self.on_delta is not None:
+            self.on_delta(delta)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def commit(self, content: str) -> str:
+        # The final text may differ from what was streamed (cache hit, chunked
+        # mode), so the partial file is rewritten before it replaces the result.
+        if self._file is None:
+            self._file = self.partial_path.open("w", encoding="utf-8")
+        self._truncate()
+        self._file.write(content)
+        self.close()
+        self.partial_path.replace(self.path)
+        return str(self.path)
+
+    def discard(self) -> None:
+        self.close()
+        self.partial_path.unlink(missing_ok=True)
+
+    def _truncate(self) -> None:
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+
+
 class OutputWriter:
-    def __init__(self, base_dir: str):
+    def __init__(self, base_dir: str, summary_format: str = SUMMARY_CSV, summary_flush_sec: float = 2.0):
         self.base_dir = Path(base_dir)
         self.results_dir = self.base_dir / "results"
         self.logs_dir = self.base_dir / "logs"
-        self.summary_path = self.base_dir / "summary.csv"
+        self.cache_dir = self.base_dir / "cache"
+        self.batch_dir = self.base_dir / "batch"
+        self.summary_path = self.base_dir / summary_filename(summary_format)
         self.run_json_path = self.base_dir / "run.json"
-        self._summary_initialized = False
-        self._summary_lock = threading.Lock()
+        self.journal_path = self.base_dir / "journal.jsonl"
+        self.summary: SummarySink = create_summary_sink(
+            summary_format, self.base_dir, SUMMARY_FIELDS, flush_interval_sec=summary_flush_sec
+        )
 
     def prepare(self) -> None:
         self.results_dir.mkdir(parents=True, exist_ok=True)
         self.logs_dir.mkdir(parents=True, exist_ok=True)
 
     def write_result(self, filename: str, content: str) -> str:
-        sanitized_name = Path(filename).with_suffix(".md").name
-        path = self.results_dir / sanitized_name
+        path = self._result_path(filename)
         path.write_text(content, encoding="utf-8")
         return str(path)
 
-    def append_summary(self, row: Dict[str, Optional[str]]) -> None:
-        with self._summary_lock:
-            self.summary_path.parent.mkdir(parents=True, exist_ok=True)
-            write_header = not self.summary_path.exists() or not self._summary_initialized
-            with self.summary_path.open("a", encoding="utf-8", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
-                if write_header:
-                    writer.writeheader()
-                    self._summary_initialized = True
-                writer.writerow({field: row.get(field, "") for field in SUMMARY_FIELDS})
+    def open_result_stream(
+        self,
+        filename: str,
+        on_delta: Optional[Callable[[str], None]] = None,
+        on_reset: Optional[Callable[[], None]] = None,
+    ) -> ResultStream:
+        return ResultStream(self._result_path(filename), on_delta, on_reset)
+
+    def _result_path(self, filename: str) -> Path:
+        sanitized_name = Path(filename).with_suffix(".md").name
+        return self.results_dir / sanitized_name
+
+    def record_summary(self, row: Dict[str, Optional[str]], overwrite: bool = True) -> None:
+        self.summary.upsert(row, overwrite=overwrite)
+
+    def close_summary(self) -> None:
+        self.summary.close()
 
     def write_run_metadata(self, payload: Dict[str, Optional[str]]) -> None:
         self.run_json_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import re
+from typing import List, Optional, Sequence
+
+from .types import LLMUsage, RenderedPrompt
+
+
+PACK_OPEN = "<<<DOC {index}>>>"
+PACK_CLOSE = "<<<END {index}>>>"
+
+PACK_INSTRUCTIONS = (
+    "以上共 {count} 篇相互独立的文档，每篇位于单独一行的 <<<DOC 序号>>> 与 <<<END 序号>>> 之间。"
+    "请对每篇文档分别、独立地完成要求，不要互相比较或引用。"
+    "输出格式：每篇结果以单独一行 <<<DOC 序号>>> 开头、单独一行 <<<END 序号>>> 结束，序号与输入一致，"
+    "按 1 到 {count} 的顺序输出全部 {count} 篇，标记之外不要输出任何内容。"
+)
+
+_SECTION = re.compile(r"<<<\s*DOC\s*(\d+)\s*>>>[ \t]*\n?(.*?)\s*<<<\s*END\s*\1\s*>>>", re.S)
+
+
+def pack_prompts(prompts: Sequence[RenderedPrompt]) -> RenderedPrompt:
+    # Members share the compiled system prefix; only the user parts are
+    # wrapped, and the format instructions go last so the prefix stays cacheable.
+    sections = [
+        f"{PACK_OPEN.format(index=idx)}\n{prompt.user.strip()}\n{PACK_CLOSE.format(index=idx)}"
+        for idx, prompt in enumerate(prompts, start=1)
+    ]
+    sections.append(PACK_INSTRUCTIONS.format(count=len(prompts)))
+    return RenderedPrompt(user="\n\n".join(sections), system=prompts[0].system if prompts else "")
+
+
+def split_packed_response(text: str, count: int) -> List[Optional[str]]:
+    sections: List[Optional[str]] = [None] * count
+    for match in _SECTION.finditer(text):
+        idx = int(match.group(1)) - 1
+        body = match.group(2).strip()
+        if 0 <= idx < count and sections[idx] is None and body:
+            sections[idx] = body
+    return sections
+
+
+def _shares(total: Optional[int], weights: Sequence[float]) -> List[Optional[int]]:
+    # Largest remainder, so the shares add up to the total exactly; without
+    # any weight the total is split evenly.
+    if total is None:
+        return [None] * len(weights)
+    if not weights:
+        return []
+    if sum(weights) <= 0:
+        weights = [1.0] * len(weights)
+    weight_sum = float(sum(weights))
+    exact = [total * weight / weight_sum for weight in weights]
+    shares = [int(value) for value in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda idx: exact[idx] - shares[idx], reverse=True)
+    for idx in by_remainder[: total - sum(shares)]:
+        shares[idx] += 1
+    return shares
+
+
+def split_usage(
+    usage: Optional[LLMUsage], input_weights: Sequence[float], output_weights: Sequence[float]
+) -> List[Optional[LLMUsage]]:
+    # Per-document shares of a packed request: input tokens by prompt size,
+    # output tokens by answer size (by prompt size when no answer came back).
+    # Every document gets a share and the shares add up to the request.
+    if usage is None:
+        return [None] * len(input_weights)
+    if sum(output_weights) <= 0:
+        output_weights = input_weights
+    prompt = _shares(usage.prompt_tokens, input_weights)
+    cached = _shares(usage.cached_prompt_tokens, input_weights)
+    completion = _shares(usage.completion_tokens, output_weights)
+    reasoning = _shares(usage.reasoning_tokens, output_weights)
+    own = [(p or 0) + (c or 0) for p, c in zip(prompt, completion)]
+    totals = _shares(usage.total_tokens, own)
+    return [
+        LLMUsage(
+            prompt_tokens=prompt[idx],
+            completion_tokens=completion[idx],
+            reasoning_tokens=reasoning[idx],
+            total_tokens=totals[idx],
+            cached_prompt_tokens=cached[idx],
+        )
+        for idx in range(len(input_weights))
+    ]
@@ -2,11 +2,19 @@ from __future__ import annotations
 
 import json
 import string
-from typing import Any, Dict, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .types import RenderedPrompt
 
 
 ALLOWED_VARIABLES = {"filename", "filepath", "content", "meta"}
 
+PROMPT_LAYOUT_SYSTEM = "system"
+PROMPT_LAYOUT_SINGLE = "single"
+PROMPT_LAYOUTS = (PROMPT_LAYOUT_SYSTEM, PROMPT_LAYOUT_SINGLE)
+
+_FORMATTER = string.Formatter()
+
 
 class PromptTemplateError(ValueError):
     pass
@@ -24,23 +32,78 @@ def validate_template(template: str) -> Set[str]:
     return used
 
 
+# (literal, field_name, conversion, format_spec); field_name is None for a
+# trailing literal.
+_Segment = Tuple[str, Optional[str], Optional[str], str]
+
+
+class CompiledPrompt:
+    # The template is parsed and validated once per run. With the "system"
+    # layout the static instructions in front of the first variable become a
+    # system message that is byte-identical for every document, so providers
+    # with automatic prefix caching can reuse it; the rest goes to the user
+    # message.
+
+    def __init__(self, template: str, layout: str = PROMPT_LAYOUT_SYSTEM, append_meta: bool = True):
+        if layout not in PROMPT_LAYOUTS:
+            raise PromptTemplateError(f"Unknown prompt layout: {layout}")
+        used_variables = validate_template(template)
+        source = template
+        if "content" not in used_variables:
+            source = source.rstrip() + "\n\n【正文内容】\n{content}\n"
+            used_variables.add("content")
+        if "meta" not in used_variables and append_meta:
+            source = source.rstrip() + "\n\n【元信息】\n{meta}\n"
+            used_variables.add("meta")
+        self.template = template
+        self.layout = layout
+        self.variables = used_variables
+        self.segments: List[_Segment] = []
+        for literal, field_name, format_spec, conversion in _FORMATTER.parse(source):
+            if format_spec and "{" in format_spec:
+                raise PromptTemplateError(f"Nested format fields are not supported: {field_name}")
+            self.segments.append((literal, field_name, conversion, format_spec or ""))
+        self.system = ""
+        if layout == PROMPT_LAYOUT_SYSTEM:
+            self._split_system_prefix()
+
+    def _split_system_prefix(self) -> None:
+        # Cut the leading literal at its last paragraph break so headings such
+        # as 【正文内容】 stay next to the content they introduce.
+        leading, field_name, conversion, format_spec = self.segments[0]
+        if field_name is None:
+            return
+        cut = leading.rfind("\n\n")
+        system = leading[:cut] if cut >= 0 else leading
+        if not system.strip():
+            return
+        self.system = system.strip()
+        rest = leading[len(system) :].lstrip("\n")
+        self.segments[0] = (rest, field_name, conversion, format_spec)
+
+    def render(self, variables: Dict[str, Any]) -> RenderedPrompt:
+        missing = [key for key in self.variables if key not in variables]
+        if missing:
+            raise PromptTemplateError(f"Missing template variables: {', '.join(sorted(missing))}")
+        values = dict(variables)
+        if "meta" in values and not isinstance(values["meta"], str):
+            values["meta"] = json.dumps(values["meta"], ensure_ascii=False)
+        parts: List[str] = []
+        for literal, field_name, conversion, format_spec in self.segments:
+            parts.append(literal)
+            if field_name is None:
+                continue
+            value = values[field_name]
+            if conversion:
+                value = _FORMATTER.convert_field(value, conversion)
+            parts.append(format(value, format_spec))
+        return RenderedPrompt(user="".join(parts), system=self.system)
+
+
+def compile_prompt(template: str, layout: str = PROMPT_LAYOUT_SYSTEM, append_meta: bool = True) -> CompiledPrompt:
+    return CompiledPrompt(template, layout=layout, append_meta=append_meta)
+
+
 def render_prompt(template: str, variables: Dict[str, Any]) -> str:
-    used_variables = validate_template(template)
-    template_to_use = template
-    if "content" not in used_variables:
-        template_to_use = template_to_use.rstrip() + "\n\n【正文内容】\n{content}\n"
-        used_variables.add("content")
-    if "meta" not in used_variables and "meta" in variables:
-        template_to_use = template_to_use.rstrip() + "\n\n【元信息】\n{meta}\n"
-        used_variables.add("meta")
-
-    missing = [key for key in used_variables if key not in variables]
-    if missing:
-        raise PromptTemplateError(f"Missing template variables: {', '.join(missing)}")
-    normalized_vars = {**variables}
-    if "meta" in normalized_vars and not isinstance(normalized_vars["meta"], str):
-        normalized_vars["meta"] = json.dumps(normalized_vars["meta"], ensure_ascii=False)
-    try:
-        return template_to_use.format(**normalized_vars)
-    except KeyError as exc:
-        raise PromptTemplateError(f"Missing template variable: {exc}") from exc
+    compiled = compile_prompt(template, layout=PROMPT_LAYOUT_SINGLE, append_meta="meta" in variables)
+    return compiled.render(variables).user
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RateLimiter:
+    # Requests reserve capacity up front; the bucket may go negative and the
+    # caller sleeps until its reservation is covered, which keeps waiters in
+    # arrival order without a queue.
+
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.waits = 0
+        self.wait_sec = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def acquire(self, cost_tokens: int) -> None:
+        delay = self._reserve(cost_tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, cost_tokens: int) -> None:
+        delay = self._reserve(cost_tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rpm": self.requests.capacity if self.requests else 0,
+                "tpm": self.tokens.capacity if self.tokens else 0,
+                "waits": self.waits,
+                "wait_sec": round(self.wait_sec, 3),
+            }
+
+    def _reserve(self, cost_tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            delay = 0.0
+            if self.requests is not None:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens is not None:
+                delay = max(delay, self.tokens.reserve(cost_tokens, now))
+            if delay > 0:
+                self.waits += 1
+                self.wait_sec += delay
+            return delay
+
+
+_SHARED: Dict[Tuple[str, str, int, int, str], RateLimiter] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_rate_limiter(endpoint: str, model: str, rpm: int, tpm: int, scope: str = "") -> Optional[RateLimiter]:
+    if rpm <= 0 and tpm <= 0:
+        return None
+    key = (endpoint, model, rpm, tpm, scope)
+    with _SHARED_LOCK:
+        limiter = _SHARED.get(key)
+        if limiter is None:
+            limiter = RateLimiter(rpm=rpm, tpm=tpm)
+            _SHARED[key] = limiter
+        return limiter
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .cache import file_digest
+from .types import RunnerSummary, TaskItem, TaskResult, TASK_STATUS_SUCCESS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    finished REAL,
+    input_dir TEXT,
+    output_dir TEXT,
+    prompt_hash TEXT,
+    model TEXT,
+    total INTEGER,
+    success INTEGER,
+    failed INTEGER,
+    skipped INTEGER,
+    cancelled INTEGER
+);
+CREATE TABLE IF NOT EXISTS prompts (
+    prompt_hash TEXT PRIMARY KEY,
+    template TEXT NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    finished REAL NOT NULL,
+    filepath TEXT NOT NULL,
+    filename TEXT,
+    doc_hash TEXT,
+    prompt_hash TEXT,
+    model TEXT,
+    status TEXT NOT NULL,
+    elapsed_sec REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER,
+    output_path TEXT,
+    error_message TEXT
+);
+CREATE INDEX IF NOT EXISTS results_run_status ON results(run_id, status);
+CREATE INDEX IF NOT EXISTS results_filepath ON results(filepath, prompt_hash, status);
+CREATE INDEX IF NOT EXISTS results_doc_prompt ON results(doc_hash, prompt_hash, status);
+"""
+
+RESULT_COLUMNS = (
+    "run_id",
+    "finished",
+    "filepath",
+    "filename",
+    "doc_hash",
+    "prompt_hash",
+    "model",
+    "status",
+    "elapsed_sec",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "output_path",
+    "error_message",
+)
+
+
+def prompt_hash(template: str) -> str:
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+class ResultsIndex:
+    # One database shared by every run that points at it. Result rows are
+    # buffered and written in batches; queries only touch indexed columns.
+
+    FLUSH_ROWS = 200
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def open(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._conn is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_SCHEMA)
+                conn.commit()
+                self._conn = conn
+            return self._conn
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # Recording ----------------------------------------------------------
+
+    def begin_run(self, input_dir: str, output_dir: str, template: str, model: str) -> int:
+        conn = self.open()
+        digest = prompt_hash(template)
+        now = time.time()
+        with self._lock, conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO prompts (prompt_hash, template, first_seen) VALUES (?, ?, ?)",
+                (digest, template, now),
+            )
+            cursor = conn.execute(
+                "INSERT INTO runs (started, input_dir, output_dir, prompt_hash, model) VALUES (?, ?, ?, ?, ?)",
+                (now, os.path.abspath(input_dir), os.path.abspath(output_dir), digest, model),
+            )
+            return int(cursor.lastrowid)
+
+    def record(
+        self, run_id: int, task: TaskItem, result: TaskResult, template_hash: str, model: str
+    ) -> None:
+        usage = result.usage
+        row = (
+            run_id,
+            time.time(),
+            os.path.abspath(task.filepath),
+            task.filename,
+            task.content_hash,
+            template_hash,
+            model,
+            result.status,
+            round(result.elapsed_sec, 3),
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None,
+            usage.total_tokens if usage else None,
+            result.output_path,
+            result.error_message or task.error_message,
+        )
+        with self._lock:
+            self._pending.append(row)
+            due = len(self._pending) >= self.FLUSH_ROWS
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending or self._conn is None:
+                return
+            rows, self._pending = self._pending, []
+            placeholders = ", ".join("?" for _ in RESULT_COLUMNS)
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO results ({', '.join(RESULT_COLUMNS)}) VALUES ({placeholders})", rows
+                )
+
+    def finish_run(self, run_id: int, summary: RunnerSummary) -> None:
+        self.flush()
+        conn = self.open()
+        with self._lock, conn:
+            conn.execute(
+                "UPDATE runs SET finished = ?, total = ?, success = ?, failed = ?, skipped = ?, cancelled = ? "
+                "WHERE run_id = ?",
+                (
+                    time.time(),
+                    summary.total,
+                    summary.success,
+                    summary.failed,
+                    summary.skipped,
+                    summary.cancelled,
+                    run_id,
+                ),
+            )
+
+    # Queries --------------------------------------------------------------
+
+    def runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return self._query("SELECT * FROM runs ORDER BY run_id DESC LIMIT ?", (limit,))
+
+    def last_run_id(self, output_dir: Optional[str] = None) -> Optional[int]:
+        if output_dir:
+            rows = self._query(
+                "SELECT run_id FROM runs WHERE output_dir = ? ORDER BY run_id DESC LIMIT 1",
+                (os.path.abspath(output_dir),),
+            )
+        else:
+            rows = self._query("SELECT run_id FROM runs ORDER BY run_id DESC LIMIT 1")
+        return rows[0]["run_id"] if rows else None
+
+    def results(self, run_id: int, statuses: Sequence[str] = ()) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM results WHERE run_id = ?"
+        params: List[Any] = [run_id]
+        if statuses:
+            sql += f" AND status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        return self._query(sql + " ORDER BY id", params)
+
+    def history(self, filepath: str) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT * FROM results WHERE filepath = ? ORDER BY id DESC", (os.path.abspath(filepath),)
+        )
+
+    def never_processed(self, template_hash: str, model: Optional[str] = None) -> List[str]:
+        # Indexed documents with no successful result for the prompt, matched
+        # by content hash so moved or copied files count as processed.
+        match = "s.prompt_hash = ? AND s.status = ?" + (" AND s.model = ?" if model else "")
+        params: List[Any] = [template_hash, TASK_STATUS_SUCCESS] + ([model] if model else [])
+        rows = self._query(
+            "SELECT r.filepath FROM results r WHERE r.id IN (SELECT MAX(id) FROM results GROUP BY filepath) "
+            f"AND NOT EXISTS (SELECT 1 FROM results s WHERE {match} AND ("
+            "(r.doc_hash IS NOT NULL AND s.doc_hash = r.doc_hash) "
+            "OR (r.doc_hash IS NULL AND s.filepath = r.filepath))) ORDER BY r.filepath",
+            params,
+        )
+        return [row["filepath"] for row in rows]
+
+    def processed_paths(self, paths: Iterable[str], template_hash: str, model: Optional[str] = None) -> set:
+        # Same identity as never_processed: the content hash, falling back to
+        # the path for rows (or files) without one.
+        conn = self.open()
+        sql = (
+            "SELECT 1 FROM results WHERE prompt_hash = ? AND status = ?"
+            + (" AND model = ?" if model else "")
+            + " AND (doc_hash = ? OR ((doc_hash IS NULL OR ? IS NULL) AND filepath = ?))"
+        )
+        done = set()
+        for path in paths:
+            try:
+                digest: Optional[str] = file_digest(path)
+            except OSError:
+                digest = None
+            params: List[Any] = [template_hash, TASK_STATUS_SUCCESS] + ([model] if model else [])
+            params.extend([digest, digest, os.path.abspath(path)])
+            with self._lock:
+                if conn.execute(sql + " LIMIT 1", params).fetchone():
+                    done.add(path)
+        return done
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        conn = self.open()
+        with self._lock:
+            return [dict(row) for row in conn.execute(sql, tuple(params))]
@@ -1,20 +1,56 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import os
+import queue
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Any, Callable, Deque, Dict, Generator, List, Optional, Tuple, Union
 
-from .chunking import chunk_text, truncate_text
-from .docx_extract import DocumentExtractionError, UnsupportedDocumentError, extract_text
-from .llm_client import LLMClient
-from .output_writer import OutputWriter
-from .prompt_render import PromptTemplateError, render_prompt
+from .backends import Backend, BackendPool
+from .batch_api import BatchCancelledError, BatchLLMClient
+from .cache import DiskCache, ExtractionCache, file_digest
+from .chunking import chunk_text, estimate_tokens, truncate_text
+from .concurrency import AdaptiveConcurrency
+from .dedup import DEDUP_OFF, DEDUP_POLICIES, DEDUP_REUSE, DuplicateCluster, DuplicateIndex, DuplicateMember
+from .docx_extract import UnsupportedDocumentError, extract_text
+from .hedging import HedgePolicy
+from .journal import RunJournal, file_signature, run_fingerprint
+from .llm_client import AsyncLLMClient, LLMClient, RequestStats
+from .metrics import Family, MetricsExporter, RunMetrics, counter, gauge
+from .output_writer import OutputWriter, ResultStream
+from .packing import pack_prompts, split_packed_response, split_usage
+from .rate_limit import RateLimiter, shared_rate_limiter
+from .results_index import ResultsIndex, prompt_hash
+from .scanner import DocumentScanner
+from .timing import (
+    STAGE_EXTRACT,
+    STAGE_LLM,
+    STAGE_LLM_BACKOFF,
+    STAGE_LLM_WAIT,
+    STAGE_PREPARE,
+    STAGE_QUEUE_WAIT,
+    STAGE_RENDER,
+    STAGE_WRITE,
+    STAGES,
+    SERIES_LLM_ATTEMPT,
+    StageStats,
+    StageTimer,
+    stage_column,
+)
+from .tokens import PromptCacheStats, TokenCalibration, TokenEstimator
+from .prompt_render import PROMPT_LAYOUT_SYSTEM, compile_prompt
 from .types import (
     AppConfig,
     DocMeta,
+    LLMResponse,
     LLMUsage,
+    RenderedPrompt,
     RunnerHooks,
     RunnerSummary,
     TaskItem,
@@ -27,12 +63,86 @@ from .types import (
     TASK_STATUS_SUCCESS,
     safe_hook,
 )
+from .usage import BudgetExhaustedError, BudgetGovernor, PriceTable, UsageTotals, add_usage, usage_tokens
+
+
+ENGINE_THREAD = "thread"
+ENGINE_ASYNCIO = "asyncio"
+ENGINE_BATCH = "batch"
+
+
+@dataclass
+class _Batch:
+    prompts: List[RenderedPrompt]
+    final: bool = False
+
+
+_Plan = Generator[_Batch, List[LLMResponse], Tuple[LLMResponse, str]]
 
 
 class CancelledError(Exception):
     pass
 
 
+_NO_ITEM = object()
+
+
+def _group_for_reduce(
+    parts: List[str], budget: int, estimator: Optional[TokenEstimator] = None
+) -> List[List[str]]:
+    if budget <= 0 or len(parts) <= 1:
+        return [parts]
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for part in parts:
+        part_tokens = estimate_tokens(part, estimator)
+        if current and current_tokens + part_tokens > budget:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(part)
+        current_tokens += part_tokens
+    if current:
+        groups.append(current)
+    if len(groups) == len(parts) and len(parts) > 1:
+        groups = [parts[i : i + 2] for i in range(0, len(parts), 2)]
+    return groups
+
+
+@dataclass
+class _Extraction:
+    task: TaskItem
+    result: Optional[Tuple[str, DocMeta]] = None
+    future: Optional[Future] = None
+    cache_key: Optional[str] = None
+    error: Optional[BaseException] = None
+    # Hashing and cache lookups happen on the feeder before the task is queued.
+    extract_sec: float = 0.0
+    queued_at: float = 0.0
+
+
+@dataclass
+class _PackMember:
+    # An extracted short document waiting to share a request with others.
+    task: TaskItem
+    start: float
+    timer: StageTimer
+    text: str
+    meta: DocMeta
+
+
+@dataclass
+class _PlanState:
+    # A task waiting for the next round of the batch engine.
+    task: TaskItem
+    start: float
+    timer: StageTimer
+    meta: DocMeta
+    plan: _Plan
+    batch: _Batch
+
+
 class BatchRunner:
     def __init__(
         self,
@@ -46,37 +156,118 @@ class BatchRunner:
     ) -> None:
         self.config = config
         self.prompt_template = prompt_template
+        self.prompt = compile_prompt(prompt_template, layout=config.prompt_layout)
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.hooks = hooks or RunnerHooks()
+        self.metrics: Optional[RunMetrics] = None
+        if config.metrics_port or config.metrics_file:
+            self.metrics = RunMetrics()
+            self.metrics.add_collector(self._collect_metrics)
+            self.hooks = self.metrics.wrap_hooks(self.hooks)
+        self._metrics_exporter: Optional[MetricsExporter] = None
+        self._ready_queue: Optional[Union[queue.Queue, asyncio.Queue]] = None
         self.cancel_event = threading.Event()
         self.logger = logger
-        self.llm_client = LLMClient(config)
-        self.output_writer = OutputWriter(str(self.output_dir))
+        self.output_writer = OutputWriter(
+            str(self.output_dir), summary_format=config.summary_format, summary_flush_sec=config.summary_flush_sec
+        )
         self.output_writer.prepare()
+        self.response_cache = self._build_response_cache()
+        self.extract_cache = self._build_extract_cache()
+        self.concurrency_limiter = AdaptiveConcurrency(
+            ceiling=max(1, config.concurrency), adaptive=config.adaptive_concurrency
+        )
+        self._fanout_pool: Optional[ThreadPoolExecutor] = None
+        self.backends: Optional[BackendPool] = None
+        self.rate_limiter: Optional[RateLimiter] = None
+        if config.backends:
+            if not all(isinstance(spec, dict) for spec in config.backends):
+                raise ValueError("backends must be a list of objects")
+            # Each backend has its own rate limiter inside the pool.
+            self.backends = BackendPool(config, on_eject=self._on_backend_ejected)
+        else:
+            self.rate_limiter = shared_rate_limiter(
+                config.endpoint, config.model, config.rate_limit_rpm, config.rate_limit_tpm
+            )
+        self._rate_limit_baseline: Dict[str, float] = {}
+        self.request_stats = RequestStats()
+        self.prices = PriceTable(config.model_prices)
+        self.usage_totals = UsageTotals(self.prices)
+        self.budget: Optional[BudgetGovernor] = None
+        if config.budget_cost > 0:
+            # Without a price the spend stays at 0 and the cost budget would never trigger.
+            models = {backend.model for backend in self.backends.backends} if self.backends else {config.model}
+            unpriced = sorted(model for model in models if self.prices.lookup(model) is None)
+            if unpriced:
+                raise ValueError(f"budget_cost needs a price for {', '.join(unpriced)}; add it to model_prices")
+        if config.budget_tokens > 0 or config.budget_cost > 0:
+            self.budget = BudgetGovernor(config.budget_tokens, config.budget_cost)
+        self.hedging: Optional[HedgePolicy] = None
+        if config.hedge_percentile > 0:
+            self.hedging = HedgePolicy(config.hedge_percentile, config.hedge_max_in_flight)
+        self.llm_client = LLMClient(
+            config,
+            cache=self.response_cache,
+            limiter=self.concurrency_limiter,
+            rate_limiter=self.rate_limiter,
+            request_stats=self.request_stats,
+            backends=self.backends,
+            hedging=self.hedging,
+            on_discarded=self._observe_usage,
+        )
+        self.token_estimator = self.llm_client.estimator
+        self.token_calibration = TokenCalibration(self.token_estimator)
+        self.prompt_cache_stats = PromptCacheStats(estimate_tokens(self.prompt.system, self.token_estimator))
+        self.stage_stats = StageStats()
+        if config.dedup_policy not in DEDUP_POLICIES:
+            raise ValueError(f"Unknown dedup_policy: {config.dedup_policy}")
+        self.dedup: Optional[DuplicateIndex] = None
+        if config.dedup_policy != DEDUP_OFF:
+            self.dedup = DuplicateIndex(config.dedup_max_distance)
+        # Copies that took over a cluster whose canonical document failed.
+        self._requeued: Deque[_Extraction] = deque()
+        self._emit_result: Optional[Callable[[Optional[TaskResult]], None]] = None
+        self.journal: Optional[RunJournal] = None
+        if config.journal_enabled:
+            self.journal = RunJournal(
+                str(self.output_writer.journal_path),
+                run_fingerprint(config, prompt_template),
+                fsync_every=config.journal_fsync_every,
+            )
+        self._journal_state: Dict[str, Dict[str, Any]] = {}
+        self.results_index = self._build_results_index()
+        self._prompt_hash = prompt_hash(prompt_template)
+        self._index_run_id: Optional[int] = None
         self.tasks: List[TaskItem] = []
-        self.only_files = {str(Path(p).resolve()) for p in only_files} if only_files else set()
+        self.only_files = list(only_files) if only_files else []
 
-    def scan(self, previous_status: Optional[Dict[str, str]] = None) -> List[TaskItem]:
-        files = [p for p in self.input_dir.rglob("*") if p.is_file()]
+    def scan(self, previous_status: Optional[Dict[str, str]] = None, resume: bool = True) -> List[TaskItem]:
+        scanner = self._build_scanner()
+        files = scanner.filter_files(self.only_files) if self.only_files else scanner.scan()
+        for path, error in scanner.errors:
+            safe_hook(self.hooks.on_log, f"无法读取: {path} -> {error}")
         tasks: List[TaskItem] = []
         skipped_docs = 0
-        for file_path in sorted(files):
-            suffix = file_path.suffix.lower()
-            resolved = str(file_path.resolve())
-            if self.only_files and resolved not in self.only_files:
-                continue
+        self._journal_state = self.journal.load() if self.journal and resume else {}
+        restored = 0
+        for file_path in files:
+            filename = os.path.basename(file_path)
+            suffix = os.path.splitext(filename)[1].lower()
             if suffix == ".docx":
-                status = TASK_STATUS_PENDING
-                if previous_status and str(file_path) in previous_status:
-                    status = previous_status[str(file_path)]
-                tasks.append(TaskItem(filepath=str(file_path), filename=file_path.name, status=status))
+                task = TaskItem(filepath=file_path, filename=filename)
+                entry = self._journal_state.get(file_path)
+                if entry and self._restore_from_journal(task, entry):
+                    restored += 1
+                if previous_status and file_path in previous_status:
+                    task.status = previous_status[file_path]
+                tasks.append(task)
             elif suffix == ".doc":
                 skipped_docs += 1
                 tasks.append(
                     TaskItem(
-                        filepath=str(file_path),
-                        filename=file_path.name,
+                        filepath=file_path,
+                        filename=filename,
                         status=TASK_STATUS_SKIPPED,
                         error_message="仅支持 .docx，请在 Word 中另存为 docx",
                     )
@@ -85,6 +276,8 @@ class BatchRunner:
             safe_hook(self.hooks.on_log, "未找到选中的文件，请确认扩展名为 .docx")
         self.tasks = tasks
         safe_hook(self.hooks.on_log, f"发现 {len(tasks)} 个任务，其中 {skipped_docs} 个 .doc 将被跳过")
+        if restored:
+            safe_hook(self.hooks.on_log, f"从 {self.output_writer.journal_path.name} 恢复 {restored} 个任务的上次状态")
         return tasks
 
     def run(self, retry_failed_only: bool = False) -> RunnerSummary:
@@ -92,21 +285,30 @@ class BatchRunner:
             self.scan()
         tasks = self.tasks
         if retry_failed_only:
-            tasks = [task for task in tasks if task.status == TASK_STATUS_FAILED]
+            tasks = [
+                task
+                for task in tasks
+                if task.status == TASK_STATUS_FAILED
+                or (task.status == TASK_STATUS_PENDING and self._deferred_by_budget(task))
+            ]
+            for task in tasks:
+                task.status = TASK_STATUS_PENDING
+                task.error_message = ""
 
         total = len(tasks)
         summary = RunnerSummary(start_time=time.time(), total=total)
+        self._rate_limit_baseline = self.rate_limiter.stats() if self.rate_limiter else {}
+        self._start_metrics(summary, tasks)
+        if self.journal:
+            self.journal.open(self._journal_state)
+        if self.results_index:
+            self._index_run_id = self.results_index.begin_run(
+                str(self.input_dir), str(self.output_dir), self.prompt_template, self.config.model
+            )
         if total == 0:
             safe_hook(self.hooks.on_log, "未发现可处理的 .docx 文件")
-            payload = {
-                **summary.to_dict(),
-                "end_time": time.time(),
-                "duration_sec": 0.0,
-                "config": self.config.sanitized_dict(),
-            }
-            self.output_writer.write_run_metadata(payload)
-            safe_hook(self.hooks.on_finished, summary)
-            return summary
+            return self._finish_run(summary)
+        self._log_prompt_layout()
         safe_hook(self.hooks.on_progress, 0, max(total, 1))
 
         completed = 0
@@ -122,7 +324,8 @@ class BatchRunner:
                 error_message=task.error_message,
                 mode=self.config.long_doc_mode,
             )
-            self.output_writer.append_summary(self._summary_row(task, result))
+            # Keep the row from the run that actually processed the document.
+            self.output_writer.record_summary(self._summary_row(task, result), overwrite=False)
             self._record_result(result, summary)
             completed += 1
             safe_hook(self.hooks.on_task_update, task)
@@ -131,166 +334,1398 @@ class BatchRunner:
             safe_hook(self.hooks.on_progress, completed, max(total, 1))
 
         if not pending_tasks:
-            duration = time.time() - summary.start_time
-            payload = {
-                **summary.to_dict(),
-                "end_time": time.time(),
-                "duration_sec": duration,
-                "config": self.config.sanitized_dict(),
-            }
-            self.output_writer.write_run_metadata(payload)
-            safe_hook(self.hooks.on_finished, summary)
-            return summary
-
-        with ThreadPoolExecutor(max_workers=max(1, self.config.concurrency)) as executor:
-            future_map = {executor.submit(self._process_task, task): task for task in pending_tasks}
-            for future in as_completed(future_map):
-                result = future.result()
+            return self._finish_run(summary)
+
+        progress_lock = threading.Lock()
+
+        def on_result(result: Optional[TaskResult]) -> None:
+            nonlocal completed
+            if result is None:
+                # A duplicate; its result arrives with its canonical document.
+                return
+            with progress_lock:
                 self._record_result(result, summary)
                 completed += 1
                 safe_hook(self.hooks.on_progress, completed, max(total, 1))
 
-        duration = time.time() - summary.start_time
+        self._emit_result = on_result
+        self._run_pipeline(pending_tasks, on_result)
+        self._flush_duplicates()
+        return self._finish_run(summary)
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    # Internal helpers -------------------------------------------------
+
+    def _build_scanner(self) -> DocumentScanner:
+        # The output directory defaults to the input directory; never walk
+        # back into our own results, logs or cache.
+        prune_dirs = [
+            self.output_writer.results_dir,
+            self.output_writer.logs_dir,
+            self.output_writer.cache_dir,
+            self.output_writer.batch_dir,
+            self._cache_root(),
+        ]
+        return DocumentScanner(
+            str(self.input_dir),
+            include=self.config.scan_include,
+            exclude=self.config.scan_exclude,
+            prune_dirs=[str(path) for path in prune_dirs],
+            workers=self.config.scan_workers,
+        )
+
+    def _restore_from_journal(self, task: TaskItem, entry: Dict[str, Any]) -> bool:
+        if entry.get("file") != file_signature(task.filepath):
+            return False
+        status = entry.get("status")
+        if status == TASK_STATUS_SUCCESS:
+            output_path = entry.get("output_path")
+            if not output_path or not Path(output_path).exists():
+                return False
+            task.output_path = output_path
+        elif status not in (TASK_STATUS_FAILED, TASK_STATUS_SKIPPED):
+            return False
+        task.status = status
+        task.error_message = entry.get("error", "")
+        return True
+
+    def _journal_task(self, task: TaskItem, status: Optional[str] = None) -> None:
+        if self.journal:
+            self.journal.record(task, status)
+
+    def _deferred_by_budget(self, task: TaskItem) -> bool:
+        entry = self._journal_state.get(task.filepath)
+        return bool(entry) and entry.get("status") == TASK_STATUS_PENDING and entry.get("file") == file_signature(
+            task.filepath
+        )
+
+    def _index_result(self, task: TaskItem, result: TaskResult) -> None:
+        if self.results_index and self._index_run_id is not None:
+            self.results_index.record(self._index_run_id, task, result, self._prompt_hash, self.config.model)
+
+    def _build_results_index(self) -> Optional[ResultsIndex]:
+        if not self.config.results_index_enabled:
+            return None
+        path = self.config.results_index_path or str(self._cache_root() / "results_index.sqlite")
+        return ResultsIndex(path)
+
+    def _cache_root(self) -> Path:
+        return Path(self.config.cache_dir) if self.config.cache_dir else self.output_writer.cache_dir
+
+    def _build_response_cache(self) -> Optional[DiskCache]:
+        if not self.config.cache_enabled:
+            return None
+        return DiskCache(
+            str(self._cache_root() / "llm_responses.sqlite"),
+            max_bytes=int(self.config.cache_max_mb * 1024 * 1024),
+            max_age_sec=self.config.cache_max_age_days * 86400,
+        )
+
+    def _build_extract_cache(self) -> Optional[ExtractionCache]:
+        if not self.config.extract_cache_enabled:
+            return None
+        store = DiskCache(
+            str(self._cache_root() / "extracted_text.sqlite"),
+            max_entries=self.config.extract_cache_max_entries,
+        )
+        return ExtractionCache(store)
+
+    def _finish_run(self, summary: RunnerSummary) -> RunnerSummary:
+        end_time = time.time()
+        usage = self.usage_totals.report()
+        summary.prompt_tokens = usage["prompt_tokens"]
+        summary.completion_tokens = usage["completion_tokens"]
+        summary.reasoning_tokens = usage["reasoning_tokens"]
+        summary.total_tokens = usage["total_tokens"]
+        summary.cost_est = usage["cost_est"]
         payload = {
             **summary.to_dict(),
-            "end_time": time.time(),
-            "duration_sec": duration,
+            "end_time": end_time,
+            "duration_sec": end_time - summary.start_time if summary.total else 0.0,
             "config": self.config.sanitized_dict(),
         }
+        payload["concurrency"] = self.concurrency_limiter.snapshot()
+        if self.rate_limiter:
+            stats = self.rate_limiter.stats()
+            stats["waits"] -= self._rate_limit_baseline.get("waits", 0)
+            stats["wait_sec"] = round(stats["wait_sec"] - self._rate_limit_baseline.get("wait_sec", 0.0), 3)
+            payload["rate_limit"] = stats
+        if self.response_cache:
+            self.response_cache.evict()
+            payload["llm_cache"] = self.response_cache.stats()
+            self.response_cache.close()
+        if self.extract_cache:
+            self.extract_cache.store.evict()
+            payload["extract_cache"] = self.extract_cache.store.stats()
+            self.extract_cache.store.close()
+        timings = self.stage_stats.report()
+        payload["stage_timings"] = timings
+        if timings["stages"]:
+            safe_hook(self.hooks.on_log, self._format_stage_timings(timings["stages"]))
+        prompt_cache = self.prompt_cache_stats.report()
+        payload["prompt_cache"] = {"layout": self.config.prompt_layout, **prompt_cache}
+        if prompt_cache["cached_prompt_tokens"]:
+            safe_hook(
+                self.hooks.on_log,
+                f"前缀缓存命中 {prompt_cache['cached_prompt_tokens']}/{prompt_cache['prompt_tokens']} 输入 token"
+                f"（{prompt_cache['hit_ratio']:.0%}，{prompt_cache['requests_with_hits']} 次请求）",
+            )
+        calibration = self.token_calibration.report()
+        payload["token_calibration"] = calibration
+        if calibration["samples"]:
+            safe_hook(
+                self.hooks.on_log,
+                f"Token 估算校准: 实际/估算 = {calibration['actual_to_estimate']}，"
+                f"平均误差 {calibration['mean_abs_error_pct']}%（{calibration['samples']} 次请求）",
+            )
+        payload["requests"] = self.request_stats.snapshot()
+        payload["usage"] = usage
+        if usage["requests"]:
+            cost = f"${usage['cost_est']:.4f}" if usage["cost_est"] is not None else "未知（模型不在价格表中）"
+            safe_hook(
+                self.hooks.on_log,
+                f"Token 用量: 输入 {usage['prompt_tokens']}（缓存命中 {usage['cached_prompt_tokens']}），"
+                f"输出 {usage['completion_tokens']}（推理 {usage['reasoning_tokens']}），"
+                f"{usage['requests']} 次请求，估算费用 {cost}",
+            )
+        if self.budget:
+            budget = self.budget.stats()
+            payload["budget"] = budget
+            if budget["refused"] or budget["waits"]:
+                safe_hook(
+                    self.hooks.on_log,
+                    f"预算控制: {budget['waits']} 次等待在途文档完成（共 {budget['wait_sec']:.1f} 秒），"
+                    f"{budget['refused']} 篇因预算用尽跳过",
+                )
+        if self.hedging:
+            hedging = self.hedging.stats()
+            payload["hedging"] = hedging
+            if hedging["issued"]:
+                safe_hook(
+                    self.hooks.on_log,
+                    f"对冲请求: 超过 {hedging['delay_sec']} 秒（p{hedging['percentile']:g}）未返回时补发，"
+                    f"共 {hedging['issued']} 次，其中 {hedging['hedge_wins']} 次先于原请求返回，"
+                    f"{hedging['capped']} 次因上限未补发",
+                )
+        if self.backends:
+            backends = self.backends.report()
+            payload["backends"] = backends
+            safe_hook(
+                self.hooks.on_log,
+                "后端请求分布: "
+                + "，".join(
+                    f"{row['name']} {row['requests']} 次（失败 {row['failures']}，暂停 {row['ejections']} 次）"
+                    for row in backends
+                ),
+            )
+        if self.dedup:
+            duplicates = self.dedup.report()
+            payload["duplicates"] = {"policy": self.config.dedup_policy, **duplicates}
+            if duplicates["duplicates"]:
+                safe_hook(
+                    self.hooks.on_log,
+                    f"重复文档: {duplicates['duplicates']} 篇归入 {len(duplicates['clusters'])} 组，"
+                    f"节省 {duplicates['saved']} 次文档处理",
+                )
+        if self.journal:
+            self.journal.close()
+        if self.results_index and self._index_run_id is not None:
+            self.results_index.finish_run(self._index_run_id, summary)
+            self.results_index.close()
+        self.output_writer.close_summary()
         self.output_writer.write_run_metadata(payload)
+        if self._metrics_exporter is not None:
+            self._metrics_exporter.stop()
+            self._metrics_exporter = None
         safe_hook(self.hooks.on_finished, summary)
         return summary
 
-    def cancel(self) -> None:
-        self.cancel_event.set()
+    def _start_metrics(self, summary: RunnerSummary, tasks: List[TaskItem]) -> None:
+        if self.metrics is None:
+            return
+        self.metrics.begin_run(summary, tasks)
+        exporter = MetricsExporter(
+            self.metrics,
+            host=self.config.metrics_host,
+            port=self.config.metrics_port,
+            file_path=self.config.metrics_file,
+            interval_sec=self.config.metrics_interval_sec,
+        )
+        try:
+            exporter.start()
+        except OSError as exc:
+            safe_hook(self.hooks.on_log, f"无法启动指标导出: {exc}")
+            return
+        self._metrics_exporter = exporter
+        if exporter.url:
+            safe_hook(self.hooks.on_log, f"指标地址: {exporter.url}")
+        if self.config.metrics_file:
+            safe_hook(
+                self.hooks.on_log, f"指标文件: {self.config.metrics_file}（每 {exporter.interval_sec:g} 秒刷新）"
+            )
 
-    # Internal helpers -------------------------------------------------
+    def _on_backend_ejected(self, backend: Backend, seconds: float, status: str) -> None:
+        safe_hook(self.hooks.on_log, f"后端 {backend.name} 连续失败（{status}），暂停 {seconds:g} 秒")
 
-    def _process_task(self, task: TaskItem) -> TaskResult:
-        start = time.time()
-        task.status = TASK_STATUS_RUNNING
-        safe_hook(self.hooks.on_task_update, task)
+    def _collect_metrics(self) -> List[Family]:
+        limiter = self.concurrency_limiter.snapshot()
+        request_stats = self.request_stats.snapshot()
+        families = [
+            gauge("llm_in_flight", "LLM requests in flight", limiter["in_flight"]),
+            gauge("llm_concurrency_limit", "Current adaptive concurrency limit", limiter["current"]),
+            counter("llm_throttle_events", "Times the concurrency limit was cut", {"": limiter["throttle_events"]}),
+            counter("llm_requests", "LLM HTTP attempts by status code", request_stats["requests"], "status"),
+            counter("llm_retries", "LLM retries by the status that caused them", request_stats["retries"], "reason"),
+        ]
+        if self.rate_limiter:
+            stats = self.rate_limiter.stats()
+            waits = stats["waits"] - self._rate_limit_baseline.get("waits", 0)
+            wait_sec = stats["wait_sec"] - self._rate_limit_baseline.get("wait_sec", 0.0)
+            families.append(counter("rate_limit_waits", "Requests delayed by the rate limiter", {"": waits}))
+            families.append(counter("rate_limit_wait_seconds", "Time spent in rate limiter waits", {"": wait_sec}))
+        usage = self.usage_totals.report()
+        families.append(
+            counter(
+                "llm_billed_tokens",
+                "Billed tokens by kind",
+                {kind: usage[f"{kind}_tokens"] for kind in ("prompt", "cached_prompt", "completion", "reasoning")},
+                "kind",
+            )
+        )
+        if usage["cost_est"] is not None:
+            families.append(counter("llm_cost_usd", "Estimated spend from the price table", {"": usage["cost_est"]}))
+        if self.budget:
+            budget = self.budget.stats()
+            families.append(gauge("budget_exhausted", "1 once the run budget is spent", int(budget["exhausted"])))
+            families.append(counter("budget_refused", "Documents skipped for budget", {"": budget["refused"]}))
+        if self.hedging:
+            hedging = self.hedging.stats()
+            families.append(
+                counter(
+                    "llm_hedges",
+                    "Hedged requests by outcome",
+                    {
+                        "hedge_won": hedging["hedge_wins"],
+                        "primary_won": hedging["primary_wins"],
+                        "capped": hedging["capped"],
+                    },
+                    "result",
+                )
+            )
+            families.append(gauge("llm_hedges_in_flight", "Hedge requests in flight", hedging["in_flight"]))
+            if hedging["delay_sec"] is not None:
+                families.append(gauge("llm_hedge_delay_seconds", "Current hedge delay", hedging["delay_sec"]))
+        if self.backends:
+            backends = self.backends.report()
+            families.append(
+                counter(
+                    "backend_requests",
+                    "LLM HTTP attempts by backend",
+                    {row["name"]: row["requests"] for row in backends},
+                    "backend",
+                )
+            )
+            families.append(
+                counter(
+                    "backend_failures",
+                    "Throttled, failed or timed out attempts by backend",
+                    {row["name"]: row["failures"] for row in backends},
+                    "backend",
+                )
+            )
+            families.append(
+                (
+                    "backend_healthy",
+                    "gauge",
+                    "1 while the backend takes traffic, 0 while it is ejected",
+                    [("", {"backend": row["name"]}, 1 if row["healthy"] else 0) for row in backends],
+                )
+            )
+        hits: Dict[str, float] = {}
+        misses: Dict[str, float] = {}
+        if self.response_cache:
+            hits["llm"], misses["llm"] = self.response_cache.hits, self.response_cache.misses
+        if self.extract_cache:
+            hits["extract"], misses["extract"] = self.extract_cache.store.hits, self.extract_cache.store.misses
+        if hits:
+            families.append(counter("cache_hits", "Cache hits", hits, "cache"))
+            families.append(counter("cache_misses", "Cache misses", misses, "cache"))
+        ready = self._ready_queue
+        families.append(
+            gauge("queue_depth", "Extracted documents waiting for an LLM worker", ready.qsize() if ready else 0)
+        )
+        return families
+
+    @staticmethod
+    def _format_stage_timings(stages: Dict[str, Any]) -> str:
+        parts = [
+            f"{name} {stats['p50_sec']:.2f}/{stats['p95_sec']:.2f}"
+            for name, stats in stages.items()
+            if name in STAGES and stats["total_sec"] > 0
+        ]
+        return "阶段耗时 p50/p95 (秒): " + "，".join(parts)
+
+    # Pipeline: a feeder thread starts extraction (in a process pool when
+    # extract_workers > 0) and hands tasks to the LLM workers through a bounded
+    # queue, so documents are parsed while earlier requests are in flight and
+    # at most prefetch_limit extracted documents wait in memory.
+
+    def _run_pipeline(self, tasks: List[TaskItem], on_result) -> None:
+        if self.config.runner_engine == ENGINE_ASYNCIO:
+            asyncio.run(self._run_async_pipeline(tasks, on_result))
+            return
+        if self.config.runner_engine == ENGINE_BATCH:
+            self._run_batch_pipeline(tasks, on_result)
+            return
+        concurrency = max(1, self.config.concurrency)
+        ready: "queue.Queue[Optional[_Extraction]]" = queue.Queue(maxsize=self._prefetch_limit())
+        self._ready_queue = ready
+        extract_pool = self._create_extract_pool()
+
+        def feed() -> None:
+            for task in tasks:
+                ready.put(self._start_extraction(task, extract_pool))
+            for _ in range(concurrency):
+                ready.put(None)
+
+        def take() -> Any:
+            try:
+                return ready.get_nowait()
+            except queue.Empty:
+                return _NO_ITEM
+
+        def process(extraction: _Extraction) -> None:
+            if self._admit([extraction], on_result):
+                try:
+                    on_result(self._process_task(extraction))
+                finally:
+                    self._release_budget(1)
+
+        def process_requeued() -> None:
+            # Whoever requeues a copy is a worker that comes back here before
+            # taking another item or stopping, so none is left behind.
+            requeued = self._take_requeued()
+            while requeued:
+                for extraction in requeued:
+                    process(extraction)
+                requeued = self._take_requeued()
+
+        def work() -> None:
+            finished = False
+            try:
+                while not finished:
+                    process_requeued()
+                    extraction = ready.get()
+                    if extraction is None:
+                        finished = True
+                    elif self.config.pack_max_docs <= 1:
+                        process(extraction)
+                    else:
+                        group, finished = self._take_group(extraction, take)
+                        admitted = self._admit(group, on_result)
+                        try:
+                            self._process_group(admitted, on_result)
+                        finally:
+                            self._release_budget(len(admitted))
+                process_requeued()
+            except BaseException:
+                # Stop the run, then keep emptying the queue up to this
+                # worker's end marker so the feeder never blocks on a put.
+                self.cancel_event.set()
+                if not finished:
+                    while ready.get() is not None:
+                        pass
+                raise
+
+        feeder = threading.Thread(target=feed, name="extract-feeder", daemon=True)
+        feeder.start()
+        self._fanout_pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="llm-fanout")
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="llm") as executor:
+                workers = [executor.submit(work) for _ in range(concurrency)]
+                for worker in workers:
+                    worker.result()
+        finally:
+            feeder.join()
+            self._fanout_pool.shutdown(wait=True)
+            self._fanout_pool = None
+            self.llm_client.close()
+            if extract_pool is not None:
+                extract_pool.shutdown(wait=True, cancel_futures=True)
+
+    def _prefetch_limit(self) -> int:
+        # Packing can only group documents that are already waiting.
+        return max(1, self.config.prefetch_limit, self.config.pack_max_docs)
+
+    def _take_group(self, first: _Extraction, take) -> Tuple[List[_Extraction], bool]:
+        # Grab whatever else is ready without waiting. Each worker consumes
+        # exactly one end marker, so a worker that drains one stops afterwards.
+        group = [first]
+        while len(group) < self.config.pack_max_docs:
+            extraction = take()
+            if extraction is _NO_ITEM:
+                break
+            if extraction is None:
+                return group, True
+            group.append(extraction)
+        return group, False
+
+    def _create_extract_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.config.extract_workers <= 0:
+            return None
+        try:
+            return ProcessPoolExecutor(max_workers=self.config.extract_workers)
+        except (OSError, NotImplementedError, ValueError) as exc:
+            safe_hook(self.hooks.on_log, f"无法启动提取进程池，改为线程内提取: {exc}")
+            return None
+
+    def _start_extraction(self, task: TaskItem, pool: Optional[ProcessPoolExecutor]) -> _Extraction:
+        started = time.perf_counter()
+        extraction = _Extraction(task=task, queued_at=started)
+        if self.cancel_event.is_set():
+            return extraction
+        try:
+            if (self.extract_cache or self.results_index) and task.filepath.lower().endswith(".docx"):
+                try:
+                    task.content_hash = file_digest(task.filepath)
+                except OSError:
+                    task.content_hash = None
+            if self.extract_cache and task.content_hash:
+                try:
+                    extraction.cache_key = self.extract_cache.key(
+                        task.filepath, self.config.include_tables, self.config.extract_engine, task.content_hash
+                    )
+                except OSError:
+                    extraction.cache_key = None
+                if extraction.cache_key:
+                    extraction.result = self.extract_cache.get(extraction.cache_key)
+            if extraction.result is None and pool is not None:
+                extraction.future = pool.submit(
+                    extract_text, task.filepath, self.config.include_tables, self.config.extract_engine
+                )
+        except Exception as exc:  # noqa: BLE001
+            extraction.error = exc
+        extraction.queued_at = time.perf_counter()
+        extraction.extract_sec = extraction.queued_at - started
+        return extraction
+
+    async def _run_async_pipeline(self, tasks: List[TaskItem], on_result) -> None:
+        concurrency = max(1, self.config.concurrency)
+        loop = asyncio.get_running_loop()
+        ready: "asyncio.Queue[Optional[_Extraction]]" = asyncio.Queue(maxsize=self._prefetch_limit())
+        self._ready_queue = ready
+        extract_pool = self._create_extract_pool()
+        client = AsyncLLMClient(
+            self.config,
+            cache=self.response_cache,
+            limiter=self.concurrency_limiter,
+            rate_limiter=self.rate_limiter,
+            max_connections=concurrency,
+            request_stats=self.request_stats,
+            backends=self.backends,
+            hedging=self.hedging,
+            on_discarded=self._observe_usage,
+        )
+
+        async def feed() -> None:
+            for task in tasks:
+                extraction = await loop.run_in_executor(None, self._start_extraction, task, extract_pool)
+                await ready.put(extraction)
+            for _ in range(concurrency):
+                await ready.put(None)
+
+        def take() -> Any:
+            try:
+                return ready.get_nowait()
+            except asyncio.QueueEmpty:
+                return _NO_ITEM
+
+        async def process(extraction: _Extraction) -> None:
+            if await self._aadmit([extraction], on_result):
+                try:
+                    on_result(await self._aprocess_task(client, extraction))
+                finally:
+                    self._release_budget(1)
+
+        async def process_requeued() -> None:
+            requeued = self._take_requeued()
+            while requeued:
+                for extraction in requeued:
+                    await process(extraction)
+                requeued = self._take_requeued()
+
+        async def work() -> None:
+            finished = False
+            while not finished:
+                await process_requeued()
+                extraction = await ready.get()
+                if extraction is None:
+                    finished = True
+                elif self.config.pack_max_docs <= 1:
+                    await process(extraction)
+                else:
+                    group, finished = self._take_group(extraction, take)
+                    admitted = await self._aadmit(group, on_result)
+                    try:
+                        await self._aprocess_group(client, admitted, on_result)
+                    finally:
+                        self._release_budget(len(admitted))
+            await process_requeued()
+
+        try:
+            await asyncio.gather(feed(), *(work() for _ in range(concurrency)))
+        finally:
+            await client.aclose()
+            if extract_pool is not None:
+                extract_pool.shutdown(wait=True, cancel_futures=True)
+
+    # Batch engine: the plans of up to batch_max_requests tasks advance in
+    # lockstep. Each round sends the pending prompts of every plan as one
+    # provider batch job and feeds the answers back, so chunk mode simply
+    # takes more rounds (map, reduce levels, final answer).
+
+    def _run_batch_pipeline(self, tasks: List[TaskItem], on_result) -> None:
+        client = BatchLLMClient(
+            self.config,
+            self.output_writer.batch_dir,
+            cache=self.response_cache,
+            request_stats=self.request_stats,
+        )
+        safe_hook(self.hooks.on_log, f"批处理模式: 请求提交到 {client.base_url}/batches，完成后回填结果")
+        if self.config.stream:
+            safe_hook(self.hooks.on_log, "批处理模式不支持流式输出，结果在批次完成后一次写入")
+        wave_size = max(1, self.config.batch_max_requests)
+        extract_pool = self._create_extract_pool()
+        try:
+            for offset in range(0, len(tasks), wave_size):
+                wave = tasks[offset : offset + wave_size]
+                extractions = [self._start_extraction(task, extract_pool) for task in wave]
+                # Batch jobs only report usage when a round completes, so the
+                # budget can stop new waves but not pace a running one.
+                extractions = self._admit(extractions, on_result)
+                self._release_budget(len(extractions))
+                active = self._start_batch_plans(extractions, on_result)
+                round_no = 0
+                while True:
+                    requeued = self._admit(self._take_requeued(), on_result)
+                    self._release_budget(len(requeued))
+                    active += self._start_batch_plans(requeued, on_result)
+                    if not active:
+                        break
+                    round_no += 1
+                    active = self._run_batch_round(client, active, round_no, on_result)
+        finally:
+            client.session.close()
+            if extract_pool is not None:
+                extract_pool.shutdown(wait=True, cancel_futures=True)
+
+    def _start_batch_plans(self, extractions: List[_Extraction], on_result) -> List[_PlanState]:
+        states = [self._start_batch_plan(extraction, on_result) for extraction in extractions]
+        return [state for state in states if state is not None]
+
+    def _start_batch_plan(self, extraction: _Extraction, on_result) -> Optional[_PlanState]:
+        task = extraction.task
+        timer = self._start_timer(extraction)
+        start = self._begin_task(task)
         try:
             self._check_cancel()
-            safe_hook(self.hooks.on_log, f"处理中: {task.filename}")
-            text, meta = self._extract_task_text(task)
+            with timer.stage(STAGE_EXTRACT):
+                text, meta = self._extract_task_text(extraction)
+            if self._claim_duplicate(task, start, timer, text, meta):
+                return None
+            plan = self._task_plan(task, text, meta, timer)
+            return _PlanState(task, start, timer, meta, plan, next(plan))
+        except Exception as exc:  # noqa: BLE001
+            on_result(self._task_error_result(task, start, exc, timer=timer))
+            return None
+
+    def _run_batch_round(
+        self, client: BatchLLMClient, states: List[_PlanState], round_no: int, on_result
+    ) -> List[_PlanState]:
+        prompts: Dict[str, RenderedPrompt] = {}
+        for state in states:
+            for idx, prompt in enumerate(state.batch.prompts):
+                prompts[self._batch_custom_id(state.task, round_no, idx)] = prompt
+        outcomes: Dict[str, Union[LLMResponse, Exception]] = {}
+        failure: Optional[Exception] = None
+        started = time.perf_counter()
+        try:
+            self._check_cancel()
+            outcomes = client.run_round(
+                prompts,
+                self.cancel_event.is_set,
+                lambda message: safe_hook(self.hooks.on_log, message),
+                label=f" 第 {round_no} 轮",
+            )
+        except BatchCancelledError:
+            failure = CancelledError()
+        except Exception as exc:  # noqa: BLE001
+            failure = exc
+        wall_sec = time.perf_counter() - started
+
+        remaining: List[_PlanState] = []
+        for state in states:
+            state.timer.add(STAGE_LLM, wall_sec)
+            try:
+                if failure is not None:
+                    raise failure
+                responses: List[LLMResponse] = []
+                for idx in range(len(state.batch.prompts)):
+                    outcome = outcomes[self._batch_custom_id(state.task, round_no, idx)]
+                    if isinstance(outcome, Exception):
+                        raise outcome
+                    self._observe_usage(outcome)
+                    responses.append(outcome)
+                self._charge_task(state.timer, responses)
+                state.batch = state.plan.send(responses)
+                remaining.append(state)
+            except StopIteration as stop:
+                response, processed_input = stop.value
+                on_result(
+                    self._complete_task(
+                        state.task, state.start, response, processed_input, state.meta, timer=state.timer
+                    )
+                )
+            except Exception as exc:  # noqa: BLE001
+                on_result(self._task_error_result(state.task, state.start, exc, timer=state.timer))
+        return remaining
+
+    @staticmethod
+    def _batch_custom_id(task: TaskItem, round_no: int, index: int) -> str:
+        digest = hashlib.sha1(task.filepath.encode("utf-8")).hexdigest()[:16]
+        return f"{digest}-r{round_no}-{index}"
+
+    def _process_task(self, extraction: _Extraction) -> Optional[TaskResult]:
+        task = extraction.task
+        timer = self._start_timer(extraction)
+        start = self._begin_task(task)
+        try:
+            self._check_cancel()
+            with timer.stage(STAGE_EXTRACT):
+                text, meta = self._extract_task_text(extraction)
+        except Exception as exc:  # noqa: BLE001
+            return self._task_error_result(task, start, exc, None, timer)
+        if self._claim_duplicate(task, start, timer, text, meta):
+            return None
+        return self._process_text(task, start, timer, text, meta)
+
+    def _process_text(self, task: TaskItem, start: float, timer: StageTimer, text: str, meta: DocMeta) -> TaskResult:
+        stream: Optional[ResultStream] = None
+        try:
             self._check_cancel()
-            if self.config.long_doc_mode == "chunk":
-                response_text, usage = self._run_chunk_mode(task, text, meta)
-                processed_input = text
+            stream = self._open_result_stream(task)
+            plan = self._task_plan(task, text, meta, timer)
+            response, processed_input = self._drive_plan(plan, stream, timer)
+            return self._complete_task(task, start, response, processed_input, meta, stream, timer)
+        except Exception as exc:  # noqa: BLE001
+            return self._task_error_result(task, start, exc, stream, timer)
+
+    async def _aprocess_task(self, client: AsyncLLMClient, extraction: _Extraction) -> Optional[TaskResult]:
+        task = extraction.task
+        timer = self._start_timer(extraction)
+        start = self._begin_task(task)
+        try:
+            self._check_cancel()
+            loop = asyncio.get_running_loop()
+            with timer.stage(STAGE_EXTRACT):
+                text, meta = await loop.run_in_executor(None, self._extract_task_text, extraction)
+        except Exception as exc:  # noqa: BLE001
+            return self._task_error_result(task, start, exc, None, timer)
+        if self._claim_duplicate(task, start, timer, text, meta):
+            return None
+        return await self._aprocess_text(client, task, start, timer, text, meta)
+
+    async def _aprocess_text(
+        self, client: AsyncLLMClient, task: TaskItem, start: float, timer: StageTimer, text: str, meta: DocMeta
+    ) -> TaskResult:
+        stream: Optional[ResultStream] = None
+        try:
+            self._check_cancel()
+            stream = self._open_result_stream(task)
+            plan = self._task_plan(task, text, meta, timer)
+            response, processed_input = await self._adrive_plan(client, plan, stream, timer)
+            return self._complete_task(task, start, response, processed_input, meta, stream, timer)
+        except Exception as exc:  # noqa: BLE001
+            return self._task_error_result(task, start, exc, stream, timer)
+
+    # Packing: short documents taken from the ready queue together share one
+    # request. Their user parts are wrapped in numbered markers and the answer
+    # is split on the same markers; a document whose section is missing is
+    # sent again on its own, and long documents take the normal path.
+
+    def _process_group(self, group: List[_Extraction], on_result) -> None:
+        members: List[_PackMember] = []
+        for extraction in group:
+            task = extraction.task
+            timer = self._start_timer(extraction)
+            start = self._begin_task(task)
+            try:
+                self._check_cancel()
+                with timer.stage(STAGE_EXTRACT):
+                    text, meta = self._extract_task_text(extraction)
+            except Exception as exc:  # noqa: BLE001
+                on_result(self._task_error_result(task, start, exc, None, timer))
+                continue
+            if self._claim_duplicate(task, start, timer, text, meta):
+                continue
+            if self._packable(meta):
+                members.append(_PackMember(task, start, timer, text, meta))
             else:
-                processed_text, meta = self._apply_truncate_strategy(text, meta)
-                processed_input = processed_text
-                prompt = self._render_prompt(task, processed_text, meta)
+                on_result(self._process_text(task, start, timer, text, meta))
+        for pack in self._split_packs(members):
+            if len(pack) == 1:
+                member = pack[0]
+                on_result(self._process_text(member.task, member.start, member.timer, member.text, member.meta))
+                continue
+            shared = StageTimer()
+            try:
                 self._check_cancel()
-                response = self.llm_client.generate(prompt)
-                response_text = response.text
-                usage = response.usage
+                responses = self._drive_plan(self._pack_plan(pack), None, shared)
+            except Exception as exc:  # noqa: BLE001
+                for member in pack:
+                    self._merge_timer(member.timer, shared)
+                    on_result(self._task_error_result(member.task, member.start, exc, None, member.timer))
+                continue
+            for member, response in zip(pack, responses):
+                self._merge_timer(member.timer, shared)
+                if response is None:
+                    on_result(self._process_text(member.task, member.start, member.timer, member.text, member.meta))
+                else:
+                    on_result(self._complete_pack_member(member, response))
 
-            output_path = self.output_writer.write_result(task.filename, response_text)
-            task.output_path = output_path
-            task.status = TASK_STATUS_SUCCESS
-            result = TaskResult(
-                status=TASK_STATUS_SUCCESS,
-                elapsed_sec=time.time() - start,
-                output_path=output_path,
-                input_chars=len(processed_input),
-                input_tokens_est=meta.token_est,
-                mode=self.config.long_doc_mode,
-                usage=usage,
-            )
-            row = self._summary_row(task, result)
-            self.output_writer.append_summary(row)
-            safe_hook(self.hooks.on_task_update, task)
-            safe_hook(self.hooks.on_log, f"完成: {task.filename}")
-            return result
-        except CancelledError:
-            task.status = TASK_STATUS_CANCELLED
-            task.error_message = "Cancelled"
-            row = self._summary_row(
-                task,
-                TaskResult(
-                    status=TASK_STATUS_CANCELLED,
-                    elapsed_sec=time.time() - start,
-                    output_path=None,
-                    error_message="Cancelled",
-                    mode=self.config.long_doc_mode,
-                ),
+    async def _aprocess_group(self, client: AsyncLLMClient, group: List[_Extraction], on_result) -> None:
+        loop = asyncio.get_running_loop()
+        members: List[_PackMember] = []
+        for extraction in group:
+            task = extraction.task
+            timer = self._start_timer(extraction)
+            start = self._begin_task(task)
+            try:
+                self._check_cancel()
+                with timer.stage(STAGE_EXTRACT):
+                    text, meta = await loop.run_in_executor(None, self._extract_task_text, extraction)
+            except Exception as exc:  # noqa: BLE001
+                on_result(self._task_error_result(task, start, exc, None, timer))
+                continue
+            if self._claim_duplicate(task, start, timer, text, meta):
+                continue
+            if self._packable(meta):
+                members.append(_PackMember(task, start, timer, text, meta))
+            else:
+                on_result(await self._aprocess_text(client, task, start, timer, text, meta))
+        for pack in self._split_packs(members):
+            if len(pack) == 1:
+                member = pack[0]
+                on_result(
+                    await self._aprocess_text(client, member.task, member.start, member.timer, member.text, member.meta)
+                )
+                continue
+            shared = StageTimer()
+            try:
+                self._check_cancel()
+                responses = await self._adrive_plan(client, self._pack_plan(pack), None, shared)
+            except Exception as exc:  # noqa: BLE001
+                for member in pack:
+                    self._merge_timer(member.timer, shared)
+                    on_result(self._task_error_result(member.task, member.start, exc, None, member.timer))
+                continue
+            for member, response in zip(pack, responses):
+                self._merge_timer(member.timer, shared)
+                if response is None:
+                    on_result(
+                        await self._aprocess_text(
+                            client, member.task, member.start, member.timer, member.text, member.meta
+                        )
+                    )
+                else:
+                    on_result(self._complete_pack_member(member, response))
+
+    def _pack_budget(self) -> int:
+        return self.config.pack_max_tokens or self.config.max_input_tokens
+
+    def _packable(self, meta: DocMeta) -> bool:
+        # Only documents that need neither truncation nor chunking, and of
+        # which at least two fit the packed request.
+        token_est = meta.token_est or 0
+        if token_est > self.config.max_input_tokens > 0:
+            return False
+        if self.config.long_doc_mode == "chunk" and token_est > self.config.chunk_target_tokens:
+            return False
+        return token_est * 2 <= self._pack_budget()
+
+    def _split_packs(self, members: List[_PackMember]) -> List[List[_PackMember]]:
+        budget = self._pack_budget()
+        packs: List[List[_PackMember]] = []
+        current: List[_PackMember] = []
+        current_tokens = 0
+        for member in members:
+            tokens = member.meta.token_est or 0
+            if current and (len(current) >= self.config.pack_max_docs or current_tokens + tokens > budget):
+                packs.append(current)
+                current, current_tokens = [], 0
+            current.append(member)
+            current_tokens += tokens
+        if current:
+            packs.append(current)
+        return packs
+
+    def _pack_plan(self, pack: List[_PackMember]) -> Generator[_Batch, List[LLMResponse], List[Optional[LLMResponse]]]:
+        prompts: List[RenderedPrompt] = []
+        for member in pack:
+            with member.timer.stage(STAGE_RENDER):
+                if self.config.long_doc_mode == "chunk":
+                    member.meta.chunk_count = 1
+                prompts.append(self._render_prompt(member.task, member.text, member.meta))
+        [packed] = yield _Batch([pack_prompts(prompts)], final=True)
+        sections = split_packed_response(packed.text, len(pack))
+        # Every member is charged its share, including those sent again on
+        # their own; without a usage block the request's estimate is split.
+        usages = split_usage(
+            self._billed_usage(packed),
+            [len(prompt.user) for prompt in prompts],
+            [len(section or "") for section in sections],
+        )
+        for member, usage in zip(pack, usages):
+            self._charge_task(
+                member.timer, [LLMResponse(text="", usage=usage, cached=packed.cached, model=packed.model)]
             )
-            self.output_writer.append_summary(row)
-            safe_hook(self.hooks.on_task_update, task)
-            return TaskResult(
-                status=TASK_STATUS_CANCELLED,
-                elapsed_sec=time.time() - start,
-                output_path=None,
-                error_message="Cancelled",
-                mode=self.config.long_doc_mode,
+        missing = [member.task.filename for member, section in zip(pack, sections) if section is None]
+        if missing:
+            safe_hook(
+                self.hooks.on_log,
+                f"合并请求中 {len(missing)}/{len(pack)} 篇结果无法解析，改为单独请求: {', '.join(missing)}",
             )
-        except UnsupportedDocumentError as exc:
-            task.status = TASK_STATUS_SKIPPED
-            task.error_message = str(exc)
-            result = TaskResult(
-                status=TASK_STATUS_SKIPPED,
-                elapsed_sec=time.time() - start,
-                output_path=None,
-                error_message=str(exc),
-                mode=self.config.long_doc_mode,
+        return [
+            LLMResponse(text=section, usage=usage, cached=packed.cached, model=packed.model)
+            if section is not None
+            else None
+            for section, usage in zip(sections, usages)
+        ]
+
+    @staticmethod
+    def _merge_timer(timer: StageTimer, shared: StageTimer) -> None:
+        for stage, seconds in shared.durations.items():
+            timer.add(stage, seconds)
+        timer.attempt_sec.extend(shared.attempt_sec)
+
+    def _complete_pack_member(self, member: _PackMember, response: LLMResponse) -> TaskResult:
+        # The member's share was charged by _pack_plan; the request itself was
+        # charged to the run when it came back.
+        return self._complete_task(
+            member.task, member.start, response, member.text, member.meta, None, member.timer, mode="pack"
+        )
+
+    @staticmethod
+    def _start_timer(extraction: _Extraction) -> StageTimer:
+        timer = StageTimer()
+        timer.add(STAGE_QUEUE_WAIT, time.perf_counter() - extraction.queued_at)
+        timer.add(STAGE_EXTRACT, extraction.extract_sec)
+        return timer
+
+    # A task plan is a generator that yields batches of prompts and receives
+    # the matching responses, so the thread and asyncio engines share the
+    # truncate/chunk logic and only differ in how they issue requests. Only
+    # the batch marked final produces the result file, so only it streams.
+
+    def _task_plan(self, task: TaskItem, text: str, meta: DocMeta, timer: StageTimer) -> _Plan:
+        if self.config.long_doc_mode == "chunk":
+            response = yield from self._run_chunk_mode(task, text, meta, timer)
+            return response, text
+        with timer.stage(STAGE_PREPARE):
+            processed_text, meta = self._apply_truncate_strategy(text, meta)
+        with timer.stage(STAGE_RENDER):
+            prompt = self._render_prompt(task, processed_text, meta)
+        [response] = yield _Batch([prompt], final=True)
+        return response, processed_text
+
+    def _drive_plan(
+        self, plan: _Plan, stream: Optional[ResultStream], timer: StageTimer
+    ) -> Tuple[LLMResponse, str]:
+        try:
+            batch = next(plan)
+            while True:
+                self._check_cancel()
+                started = time.perf_counter()
+                try:
+                    responses = self._generate_batch(batch, stream)
+                except Exception:
+                    timer.add(STAGE_LLM, time.perf_counter() - started)
+                    raise
+                self._time_batch(timer, time.perf_counter() - started, responses)
+                batch = plan.send(responses)
+        except StopIteration as stop:
+            return stop.value
+
+    def _generate_batch(self, batch: _Batch, stream: Optional[ResultStream]) -> List[LLMResponse]:
+        sink = stream if batch.final else None
+        prompts = batch.prompts
+        if len(prompts) == 1 or self._fanout_pool is None:
+            return [self._generate_checked(prompt, sink) for prompt in prompts]
+        futures = [self._fanout_pool.submit(self._generate_checked, prompt) for prompt in prompts]
+        return [future.result() for future in futures]
+
+    def _generate_checked(self, prompt: RenderedPrompt, sink: Optional[ResultStream] = None) -> LLMResponse:
+        self._check_cancel()
+        response = self.llm_client.generate(prompt, sink)
+        self._observe_usage(response)
+        return response
+
+    async def _adrive_plan(
+        self, client: AsyncLLMClient, plan: _Plan, stream: Optional[ResultStream], timer: StageTimer
+    ) -> Tuple[LLMResponse, str]:
+        try:
+            batch = next(plan)
+            while True:
+                self._check_cancel()
+                sink = stream if batch.final else None
+                started = time.perf_counter()
+                try:
+                    responses = await asyncio.gather(*(client.agenerate(prompt, sink) for prompt in batch.prompts))
+                except Exception:
+                    timer.add(STAGE_LLM, time.perf_counter() - started)
+                    raise
+                self._time_batch(timer, time.perf_counter() - started, responses)
+                for response in responses:
+                    self._observe_usage(response)
+                batch = plan.send(list(responses))
+        except StopIteration as stop:
+            return stop.value
+
+    def _time_batch(self, timer: StageTimer, wall_sec: float, responses: List[LLMResponse]) -> None:
+        # Requests of a batch run side by side, so charge the slowest wait and
+        # backoff to the task and the rest of the wall time to the LLM.
+        wait_sec = max((response.wait_sec for response in responses), default=0.0)
+        backoff_sec = max((response.backoff_sec for response in responses), default=0.0)
+        timer.add(STAGE_LLM_WAIT, wait_sec)
+        timer.add(STAGE_LLM_BACKOFF, backoff_sec)
+        timer.add(STAGE_LLM, wall_sec - wait_sec - backoff_sec)
+        for response in responses:
+            timer.attempt_sec.extend(response.attempt_sec)
+        self._charge_task(timer, responses)
+
+    def _observe_usage(self, response: LLMResponse) -> None:
+        # Called once per request actually answered, however it was issued.
+        if response.cached:
+            return
+        if response.usage:
+            self.token_calibration.observe(response.prompt_tokens_est, response.usage.prompt_tokens)
+            self.prompt_cache_stats.observe(response.usage.prompt_tokens, response.usage.cached_prompt_tokens)
+        usage = self._billed_usage(response)
+        assert usage is not None
+        cost = self.usage_totals.add(response.model or self.config.model, usage, estimated=response.usage is None)
+        if self.budget:
+            self.budget.charge(usage_tokens(usage), cost)
+
+    def _billed_usage(self, response: LLMResponse) -> Optional[LLMUsage]:
+        # Cache hits cost nothing; answers without a usage block are estimated.
+        if response.cached:
+            return None
+        if response.usage:
+            return response.usage
+        return LLMUsage(
+            prompt_tokens=response.prompt_tokens_est,
+            completion_tokens=estimate_tokens(response.text, self.token_estimator),
+        )
+
+    def _charge_task(self, timer: StageTimer, responses: List[LLMResponse]) -> None:
+        for response in responses:
+            usage = self._billed_usage(response)
+            if usage is None:
+                continue
+            timer.usage = add_usage(timer.usage, usage)
+            cost = self.prices.cost(response.model or self.config.model, usage)
+            timer.cost = timer.cost + cost if timer.cost is not None and cost is not None else None
+
+    @staticmethod
+    def _task_cost(timer: StageTimer) -> Optional[float]:
+        return timer.cost if timer.usage else None
+
+    def _budget_task_done(self, timer: Optional[StageTimer]) -> None:
+        # Only tasks that spent tokens feed the budget's average spend per
+        # task; cache hits, duplicates and failures before any answer do not.
+        if self.budget is not None and timer is not None and timer.usage is not None:
+            self.budget.finish_task()
+
+    # Budget: workers ask before starting a document. Refused documents show
+    # as skipped in this run but are journaled as pending, so a rerun (or
+    # --retry_failed) processes them again.
+
+    def _admit(self, extractions: List[_Extraction], on_result) -> List[_Extraction]:
+        if self.budget is None:
+            return extractions
+        admitted = []
+        for extraction in extractions:
+            if self.budget.admit(self.cancel_event.is_set):
+                admitted.append(extraction)
+            else:
+                on_result(self._budget_skip(extraction))
+        return admitted
+
+    async def _aadmit(self, extractions: List[_Extraction], on_result) -> List[_Extraction]:
+        if self.budget is None:
+            return extractions
+        admitted = []
+        for extraction in extractions:
+            if await self.budget.aadmit(self.cancel_event.is_set):
+                admitted.append(extraction)
+            else:
+                on_result(self._budget_skip(extraction))
+        return admitted
+
+    def _release_budget(self, count: int) -> None:
+        if self.budget is not None and count:
+            self.budget.release(count)
+
+    def _budget_skip(self, extraction: _Extraction) -> TaskResult:
+        task = extraction.task
+        start = self._begin_task(task)
+        return self._task_error_result(task, start, BudgetExhaustedError(self._budget_message()))
+
+    def _budget_message(self) -> str:
+        assert self.budget is not None
+        stats = self.budget.stats()
+        parts = []
+        if stats["max_tokens"]:
+            parts.append(f"{stats['spent_tokens']}/{stats['max_tokens']} token")
+        if stats["max_cost"]:
+            parts.append(f"${stats['spent_cost']:.4f}/${stats['max_cost']:g}")
+        return "预算已用尽（" + "，".join(parts) + "）"
+
+    def _log_prompt_layout(self) -> None:
+        if self.prompt.system:
+            safe_hook(
+                self.hooks.on_log,
+                f"Prompt 指令作为 system 消息发送（约 {self.prompt_cache_stats.prefix_tokens_est} token），"
+                "各文档共享同一前缀，可命中服务端前缀缓存",
             )
-            self.output_writer.append_summary(self._summary_row(task, result))
-            safe_hook(self.hooks.on_task_update, task)
+        elif self.config.prompt_layout == PROMPT_LAYOUT_SYSTEM:
+            safe_hook(self.hooks.on_log, "Prompt 模板以变量开头，无法拆出固定前缀，按单条消息发送")
+
+    def _open_result_stream(self, task: TaskItem) -> Optional[ResultStream]:
+        if not self.config.stream:
+            return None
+
+        def on_delta(delta: str) -> None:
+            safe_hook(self.hooks.on_task_output, task, delta)
+
+        def on_reset() -> None:
+            safe_hook(self.hooks.on_task_output_reset, task)
+
+        return self.output_writer.open_result_stream(task.filename, on_delta, on_reset)
+
+    def _begin_task(self, task: TaskItem) -> float:
+        start = time.time()
+        task.status = TASK_STATUS_RUNNING
+        self._journal_task(task)
+        safe_hook(self.hooks.on_task_update, task)
+        if not self.cancel_event.is_set():
+            safe_hook(self.hooks.on_log, f"处理中: {task.filename}")
+        return start
+
+    def _complete_task(
+        self,
+        task: TaskItem,
+        start: float,
+        response: LLMResponse,
+        processed_input: str,
+        meta: DocMeta,
+        stream: Optional[ResultStream] = None,
+        timer: Optional[StageTimer] = None,
+        mode: Optional[str] = None,
+    ) -> TaskResult:
+        timer = timer or StageTimer()
+        with timer.stage(STAGE_WRITE):
+            if stream is not None:
+                output_path = stream.commit(response.text)
+            else:
+                output_path = self.output_writer.write_result(task.filename, response.text)
+        task.output_path = output_path
+        task.status = TASK_STATUS_SUCCESS
+        result = TaskResult(
+            status=TASK_STATUS_SUCCESS,
+            elapsed_sec=time.time() - start,
+            output_path=output_path,
+            input_chars=len(processed_input),
+            input_tokens_est=meta.token_est,
+            mode=mode or self.config.long_doc_mode,
+            usage=timer.usage,
+            cost_est=self._task_cost(timer),
+            ttft_sec=response.first_token_sec,
+            tokens_per_sec=self._tokens_per_sec(response),
+            stages=timer.as_dict(),
+            llm_attempt_sec=timer.attempt_sec,
+        )
+        self._budget_task_done(timer)
+        row = self._summary_row(task, result)
+        self.output_writer.record_summary(row)
+        self._journal_task(task)
+        self._index_result(task, result)
+        safe_hook(self.hooks.on_task_result, task, result)
+        safe_hook(self.hooks.on_task_update, task)
+        safe_hook(self.hooks.on_log, f"完成: {task.filename}")
+        self._finish_duplicates(task, TASK_STATUS_SUCCESS, output_path, response.text)
+        return result
+
+    def _tokens_per_sec(self, response: LLMResponse) -> Optional[float]:
+        if response.cached:
+            return None
+        generation_sec = response.elapsed_sec - (response.first_token_sec or 0.0)
+        if generation_sec <= 0:
+            return None
+        if response.usage and response.usage.completion_tokens:
+            tokens = response.usage.completion_tokens
+        else:
+            tokens = estimate_tokens(response.text, self.token_estimator)
+        return tokens / generation_sec
+
+    def _task_error_result(
+        self,
+        task: TaskItem,
+        start: float,
+        exc: Exception,
+        stream: Optional[ResultStream] = None,
+        timer: Optional[StageTimer] = None,
+    ) -> TaskResult:
+        if stream is not None:
+            stream.discard()
+        if isinstance(exc, CancelledError):
+            status = TASK_STATUS_CANCELLED
+            message = "Cancelled"
+        elif isinstance(exc, (UnsupportedDocumentError, BudgetExhaustedError)):
+            status = TASK_STATUS_SKIPPED
+            message = str(exc)
+        else:
+            status = TASK_STATUS_FAILED
+            message = str(exc)
+        task.status = status
+        task.error_message = message
+        result = TaskResult(
+            status=status,
+            elapsed_sec=time.time() - start,
+            output_path=None,
+            error_message=message,
+            mode=self.config.long_doc_mode,
+            usage=timer.usage if timer else None,
+            cost_est=self._task_cost(timer) if timer else None,
+            stages=timer.as_dict() if timer else {},
+            llm_attempt_sec=timer.attempt_sec if timer else [],
+        )
+        self._budget_task_done(timer)
+        self.output_writer.record_summary(self._summary_row(task, result))
+        self._journal_task(task, TASK_STATUS_PENDING if isinstance(exc, BudgetExhaustedError) else None)
+        self._index_result(task, result)
+        safe_hook(self.hooks.on_task_result, task, result)
+        safe_hook(self.hooks.on_task_update, task)
+        if status == TASK_STATUS_SKIPPED:
             safe_hook(self.hooks.on_log, f"跳过: {task.filename} -> {task.error_message}")
-            return result
-        except (PromptTemplateError, DocumentExtractionError, Exception) as exc:  # noqa: BLE001
-            task.status = TASK_STATUS_FAILED
-            task.error_message = str(exc)
-            result = TaskResult(
-                status=TASK_STATUS_FAILED,
-                elapsed_sec=time.time() - start,
-                output_path=None,
-                error_message=str(exc),
-                mode=self.config.long_doc_mode,
-            )
-            self.output_writer.append_summary(self._summary_row(task, result))
-            safe_hook(self.hooks.on_task_update, task)
+        elif status == TASK_STATUS_FAILED:
             safe_hook(self.hooks.on_log, f"失败: {task.filename} -> {task.error_message}")
-            return result
+        self._finish_duplicates(task, status, None, None, message)
+        return result
+
+    # Duplicates: after extraction every document is fingerprinted; one that
+    # matches an earlier document waits for that canonical document and then
+    # reuses its answer (a copy of the result file) or just points to it,
+    # depending on dedup_policy. It never blocks a worker.
+
+    def _claim_duplicate(self, task: TaskItem, start: float, timer: StageTimer, text: str, meta: DocMeta) -> bool:
+        if self.dedup is None:
+            return False
+        with timer.stage(STAGE_PREPARE):
+            cluster, member = self.dedup.claim(
+                task.filepath, task.filename, text, payload=(task, start, timer, meta, len(text))
+            )
+        if cluster is None or member is None:
+            return False
+        if cluster.done:
+            self._emit(self._duplicate_result(cluster, member))
+        return True
+
+    def _finish_duplicates(
+        self, task: TaskItem, status: str, output_path: Optional[str], text: Optional[str], message: str = ""
+    ) -> None:
+        if self.dedup is None:
+            return
+        cluster, waiting, successor = self.dedup.finish(task.filepath, status, output_path, text, message)
+        for member in waiting:
+            self._emit(self._duplicate_result(cluster, member))
+        if successor is not None:
+            # The copy is extracted again rather than holding every waiting
+            # document's text in memory.
+            successor_task = successor.payload[0]
+            successor.payload = None
+            safe_hook(self.hooks.on_log, f"{task.filename} 未成功，同组的 {successor_task.filename} 改为自行处理")
+            self._requeued.append(_Extraction(task=successor_task, queued_at=time.perf_counter()))
+
+    def _take_requeued(self) -> List[_Extraction]:
+        taken: List[_Extraction] = []
+        while True:
+            try:
+                taken.append(self._requeued.popleft())
+            except IndexError:
+                return taken
+
+    def _flush_duplicates(self) -> None:
+        if self.dedup is None:
+            return
+        for cluster, member in self.dedup.drain():
+            cluster.status = cluster.status or TASK_STATUS_FAILED
+            cluster.error_message = cluster.error_message or "未完成"
+            self._emit(self._duplicate_result(cluster, member))
+
+    def _emit(self, result: TaskResult) -> None:
+        if self._emit_result is not None:
+            self._emit_result(result)
 
-    def _extract_task_text(self, task: TaskItem) -> tuple[str, DocMeta]:
-        text, meta = extract_text(task.filepath, include_tables=self.config.include_tables)
+    def _duplicate_result(self, cluster: DuplicateCluster, member: DuplicateMember) -> TaskResult:
+        task, start, timer, meta, input_chars = member.payload
+        member.payload = None
+        output_path: Optional[str] = None
+        if cluster.status != TASK_STATUS_SUCCESS:
+            status = cluster.status
+            message = f"与 {cluster.filename} 重复，而该文档未成功: {cluster.error_message}"
+        elif self.config.dedup_policy == DEDUP_REUSE:
+            with timer.stage(STAGE_WRITE):
+                output_path = self.output_writer.write_result(task.filename, cluster.text or "")
+            status = TASK_STATUS_SUCCESS
+            message = ""
+        else:
+            output_path = cluster.output_path
+            status = TASK_STATUS_SKIPPED
+            message = f"与 {cluster.filename} 重复，结果见 {cluster.output_path}"
+        task.status = status
+        task.output_path = output_path
+        task.error_message = message
+        result = TaskResult(
+            status=status,
+            elapsed_sec=time.time() - start,
+            output_path=output_path,
+            error_message=message,
+            input_chars=input_chars,
+            input_tokens_est=meta.token_est,
+            mode="duplicate",
+            stages=timer.as_dict(),
+            duplicate_of=cluster.canonical,
+        )
+        self.output_writer.record_summary(self._summary_row(task, result))
+        self._journal_task(task)
+        self._index_result(task, result)
+        safe_hook(self.hooks.on_task_result, task, result)
+        safe_hook(self.hooks.on_task_update, task)
+        distance = "内容相同" if member.distance == 0 else f"SimHash 距离 {member.distance}"
+        safe_hook(self.hooks.on_log, f"重复: {task.filename} -> {cluster.filename}（{distance}）")
+        return result
+
+    def _extract_task_text(self, extraction: _Extraction) -> tuple[str, DocMeta]:
+        task = extraction.task
+        if extraction.error is not None:
+            raise extraction.error
+        if extraction.result is not None:
+            text, meta = extraction.result
+        else:
+            if extraction.future is not None:
+                text, meta = extraction.future.result()
+            else:
+                text, meta = extract_text(
+                    task.filepath,
+                    include_tables=self.config.include_tables,
+                    engine=self.config.extract_engine,
+                )
+            if extraction.cache_key and self.extract_cache:
+                self.extract_cache.put(extraction.cache_key, text, meta)
+        extraction.result = None
+        extraction.future = None
+        # Workers and the extraction cache use the default estimator; count
+        # again with the configured one.
+        meta.token_est = estimate_tokens(text, self.token_estimator)
         task.meta = meta
         return text, meta
 
     def _apply_truncate_strategy(self, text: str, meta: DocMeta) -> tuple[str, DocMeta]:
-        truncated_text, updated_meta = truncate_text(text, meta, self.config.max_input_tokens)
+        truncated_text, updated_meta = truncate_text(
+            text, meta, self.config.max_input_tokens, self.token_estimator
+        )
         return truncated_text, updated_meta
 
-    def _run_chunk_mode(self, task: TaskItem, text: str, meta: DocMeta) -> tuple[str, Optional[LLMUsage]]:
-        chunks = chunk_text(text, self.config.chunk_target_tokens)
+    # Chunk mode is a map-reduce: all chunk prompts go out as one batch, then
+    # partial results are merged level by level in groups that fit
+    # max_input_tokens until a single aggregated answer remains.
+
+    def _run_chunk_mode(
+        self, task: TaskItem, text: str, meta: DocMeta, timer: StageTimer
+    ) -> Generator[_Batch, List[LLMResponse], LLMResponse]:
+        with timer.stage(STAGE_PREPARE):
+            chunks = chunk_text(text, self.config.chunk_target_tokens, self.token_estimator)
         meta.chunk_count = len(chunks)
         if len(chunks) == 1:
             meta.was_truncated = False
-            prompt = self._render_prompt(task, chunks[0], meta)
-            response = self.llm_client.generate(prompt)
-            return response.text, response.usage
-
-        partial_results: List[str] = []
-        for idx, chunk in enumerate(chunks, start=1):
-            chunk_meta = meta.as_json_dict()
-            chunk_meta.update({"chunk_index": idx, "chunk_total": len(chunks)})
-            prompt = self._render_prompt(task, chunk, chunk_meta)
-            self._check_cancel()
-            response = self.llm_client.generate(prompt)
-            partial_results.append(response.text)
+            with timer.stage(STAGE_RENDER):
+                prompt = self._render_prompt(task, chunks[0], meta)
+            [response] = yield _Batch([prompt], final=True)
+            return response
+
+        prompts: List[RenderedPrompt] = []
+        with timer.stage(STAGE_RENDER):
+            for idx, chunk in enumerate(chunks, start=1):
+                chunk_meta = meta.as_json_dict()
+                chunk_meta.update({"chunk_index": idx, "chunk_total": len(chunks)})
+                prompts.append(self._render_prompt(task, chunk, chunk_meta))
+        responses = yield _Batch(prompts)
+        partial_results = [response.text for response in responses]
+
+        level = 0
+        budget = self._reduce_budget()
+        while True:
+            with timer.stage(STAGE_PREPARE):
+                groups = _group_for_reduce(partial_results, budget, self.token_estimator)
+            if len(groups) == 1:
+                break
+            level += 1
+            reduce_prompts: List[RenderedPrompt] = []
+            reduce_slots: List[int] = []
+            next_results: List[str] = []
+            for group_idx, group in enumerate(groups, start=1):
+                if len(group) == 1:
+                    next_results.append(group[0])
+                    continue
+                group_meta = meta.as_json_dict()
+                group_meta.update(
+                    {
+                        "chunk_total": len(chunks),
+                        "chunk_aggregated": True,
+                        "reduce_level": level,
+                        "reduce_group": group_idx,
+                        "reduce_groups": len(groups),
+                    }
+                )
+                reduce_slots.append(len(next_results))
+                next_results.append("")
+                with timer.stage(STAGE_RENDER):
+                    reduce_prompts.append(self._render_prompt(task, "\n\n".join(group), group_meta))
+            reduced = yield _Batch(reduce_prompts)
+            for slot, response in zip(reduce_slots, reduced):
+                next_results[slot] = response.text
+            partial_results = next_results
 
         combined = "\n\n".join(partial_results)
         final_meta = meta.as_json_dict()
         final_meta.update({"chunk_total": len(chunks), "chunk_aggregated": True})
-        final_prompt = self._render_prompt(task, combined, final_meta)
-        final_response = self.llm_client.generate(final_prompt)
+        if level:
+            final_meta["reduce_levels"] = level
+        with timer.stage(STAGE_RENDER):
+            final_prompt = self._render_prompt(task, combined, final_meta)
+        [final_response] = yield _Batch([final_prompt], final=True)
         meta.was_truncated = False
-        return final_response.text, final_response.usage
+        return final_response
+
+    def _reduce_budget(self) -> int:
+        if self.config.max_input_tokens <= 0:
+            return 0
+        return max(self.config.max_input_tokens - estimate_tokens(self.prompt_template, self.token_estimator), 1)
 
-    def _render_prompt(self, task: TaskItem, content: str, meta: Union[DocMeta, Dict]) -> str:
+    def _render_prompt(self, task: TaskItem, content: str, meta: Union[DocMeta, Dict]) -> RenderedPrompt:
         if isinstance(meta, DocMeta):
             meta_dict = meta.as_json_dict()
         else:
@@ -301,9 +1736,12 @@ class BatchRunner:
             "content": content,
             "meta": meta_dict,
         }
-        return render_prompt(self.prompt_template, variables)
+        return self.prompt.render(variables)
 
     def _record_result(self, result: TaskResult, summary: RunnerSummary) -> None:
+        if result.stages:
+            self.stage_stats.observe({**result.stages, "elapsed": result.elapsed_sec})
+            self.stage_stats.observe_series(SERIES_LLM_ATTEMPT, result.llm_attempt_sec)
         if result.status == TASK_STATUS_SUCCESS:
             summary.success += 1
         elif result.status == TASK_STATUS_FAILED:
@@ -317,6 +1755,11 @@ class BatchRunner:
         if self.cancel_event.is_set():
             raise CancelledError()
 
+    @staticmethod
+    def _usage_cell(usage: Optional[LLMUsage], name: str) -> Any:
+        value = getattr(usage, name) if usage else None
+        return "" if value is None else value
+
     def _summary_row(self, task: TaskItem, result: TaskResult):
         return {
             "filename": task.filename,
@@ -326,6 +1769,18 @@ class BatchRunner:
             "input_chars": result.input_chars,
             "input_tokens_est": result.input_tokens_est,
             "mode": result.mode,
+            "ttft_sec": f"{result.ttft_sec:.2f}" if result.ttft_sec is not None else "",
+            "tokens_per_sec": f"{result.tokens_per_sec:.1f}" if result.tokens_per_sec is not None else "",
+            "prompt_tokens": self._usage_cell(result.usage, "prompt_tokens"),
+            "completion_tokens": self._usage_cell(result.usage, "completion_tokens"),
+            "reasoning_tokens": self._usage_cell(result.usage, "reasoning_tokens"),
+            "cost_est": f"{result.cost_est:.6f}" if result.cost_est is not None else "",
+            **{
+                stage_column(stage): f"{result.stages[stage]:.3f}" if stage in result.stages else ""
+                for stage in STAGES
+            },
+            "llm_attempts": len(result.llm_attempt_sec) if result.stages else "",
+            "duplicate_of": result.duplicate_of,
             "output_path": result.output_path or "",
             "error_message": task.error_message or result.error_message,
         }
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Iterable, List, Sequence, Set, Tuple
+
+DEFAULT_INCLUDE = ["*.docx", "*.doc"]
+DEFAULT_EXCLUDE = ["~$*", ".*"]
+
+
+def _matches(name: str, rel_path: str, patterns: Sequence[str]) -> bool:
+    for pattern in patterns:
+        if "/" in pattern:
+            if fnmatch(rel_path, pattern):
+                return True
+        elif fnmatch(name, pattern):
+            return True
+    return False
+
+
+class DocumentScanner:
+    # Walks the tree with os.scandir so file/dir checks come from the directory
+    # listing itself instead of one stat per entry. Excluded and pruned
+    # directories are never opened; directories at the same depth are listed
+    # concurrently, which hides per-request latency on network shares.
+
+    def __init__(
+        self,
+        root: str,
+        include: Sequence[str] = DEFAULT_INCLUDE,
+        exclude: Sequence[str] = DEFAULT_EXCLUDE,
+        prune_dirs: Iterable[str] = (),
+        workers: int = 8,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.include = [pattern.lower() for pattern in include]
+        self.exclude = list(exclude)
+        self._path_patterns = any("/" in pattern for pattern in self.include + self.exclude)
+        self.prune_dirs: Set[str] = {os.path.normcase(os.path.abspath(path)) for path in prune_dirs}
+        self.workers = max(1, workers)
+        self.errors: List[Tuple[str, str]] = []
+
+    def scan(self) -> List[str]:
+        files: List[str] = []
+        level = [self.root]
+        if self.workers == 1:
+            while level:
+                level = self._walk_level(map(self._list_dir, level), files)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                while level:
+                    level = self._walk_level(pool.map(self._list_dir, level), files)
+        files.sort(key=lambda path: Path(path).parts)
+        return files
+
+    def filter_files(self, paths: Iterable[str]) -> List[str]:
+        selected = []
+        for path in paths:
+            absolute = os.path.abspath(path)
+            name = os.path.basename(absolute)
+            if self._is_candidate(name, self._relative(absolute)) and os.path.isfile(absolute):
+                selected.append(absolute)
+        return sorted(selected, key=lambda path: Path(path).parts)
+
+    def _walk_level(self, listings: Iterable[Tuple[List[str], List[str]]], files: List[str]) -> List[str]:
+        next_level: List[str] = []
+        for dir_files, subdirs in listings:
+            files.extend(dir_files)
+            next_level.extend(subdirs)
+        return next_level
+
+    def _list_dir(self, directory: str) -> Tuple[List[str], List[str]]:
+        dir_files: List[str] = []
+        subdirs: List[str] = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    rel_path = self._relative(entry.path) if self._path_patterns else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self._keep_dir(entry, rel_path):
+                                subdirs.append(entry.path)
+                        elif self._is_candidate(entry.name, rel_path) and entry.is_file():
+                            dir_files.append(entry.path)
+                    except OSError as exc:
+                        self.errors.append((entry.path, str(exc)))
+        except OSError as exc:
+            self.errors.append((directory, str(exc)))
+        return dir_files, subdirs
+
+    def _keep_dir(self, entry: os.DirEntry, rel_path: str) -> bool:
+        if os.path.normcase(entry.path) in self.prune_dirs:
+            return False
+        return not _matches(entry.name, rel_path, self.exclude)
+
+    def _is_candidate(self, name: str, rel_path: str) -> bool:
+        # Include patterns are lowercased, so match them case-insensitively.
+        if not _matches(name.lower(), rel_path.lower(), self.include):
+            return False
+        return not _matches(name, rel_path, self.exclude)
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+SUMMARY_CSV = "csv"
+SUMMARY_JSONL = "jsonl"
+SUMMARY_SQLITE = "sqlite"
+
+SUMMARY_KEY = "filepath"
+
+_Row = Dict[str, Any]
+
+
+def summary_filename(fmt: str) -> str:
+    if fmt not in (SUMMARY_CSV, SUMMARY_JSONL, SUMMARY_SQLITE):
+        raise ValueError(f"Unknown summary format: {fmt}")
+    return f"summary.{fmt}"
+
+
+class SummarySink:
+    # Rows are keyed by file path and buffered in memory; the thread that finds
+    # the buffer due swaps it out and writes it, so workers only hold the
+    # buffer lock long enough to update a dict.
+
+    def __init__(self, path: Path, fields: Sequence[str], flush_interval_sec: float = 2.0, flush_rows: int = 500):
+        self.path = path
+        self.fields = list(fields)
+        self.flush_interval_sec = flush_interval_sec
+        self.flush_rows = flush_rows
+        self._pending: Dict[str, Tuple[_Row, bool]] = {}
+        self._last_flush = time.monotonic()
+        self._buffer_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._opened = False
+
+    def upsert(self, row: _Row, overwrite: bool = True) -> None:
+        record = {field: row.get(field, "") for field in self.fields}
+        key = str(record[SUMMARY_KEY])
+        with self._buffer_lock:
+            previous = self._pending.get(key)
+            if overwrite or previous is None:
+                self._pending[key] = (record, overwrite)
+            due = (
+                len(self._pending) >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_interval_sec
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._io_lock:
+            with self._buffer_lock:
+                pending = self._pending
+                self._pending = {}
+                self._last_flush = time.monotonic()
+            if not self._opened:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._open()
+                self._opened = True
+            if pending:
+                self._write(pending)
+
+    def close(self) -> None:
+        self.flush()
+        with self._io_lock:
+            if self._opened:
+                self._close()
+                self._opened = False
+
+    def _open(self) -> None:
+        raise NotImplementedError
+
+    def _write(self, pending: Dict[str, Tuple[_Row, bool]]) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+
+class _FileSummarySink(SummarySink):
+    # Flushes append to the file; when a flush touches a document that already
+    # has a row, the file is rewritten once on close so it ends with exactly
+    # one row per document.
+
+    def _open(self) -> None:
+        self._rows: Dict[str, _Row] = {}
+        self._needs_rewrite = False
+        if self.path.exists():
+            rows, matches_layout = self._read_rows()
+            for row in rows:
+                key = str(row.get(SUMMARY_KEY, ""))
+                if key in self._rows:
+                    self._needs_rewrite = True
+                self._rows[key] = {field: row.get(field, "") for field in self.fields}
+            if not matches_layout:
+                self._rewrite()
+
+    def _write(self, pending: Dict[str, Tuple[_Row, bool]]) -> None:
+        fresh_file = not self.path.exists()
+        appended: List[_Row] = []
+        for key, (row, overwrite) in pending.items():
+            if key in self._rows:
+                if not overwrite:
+                    continue
+                self._needs_rewrite = True
+            self._rows[key] = row
+            appended.append(row)
+        if appended:
+            with self.path.open("a", encoding="utf-8", newline="") as f:
+                self._append_rows(f, appended, fresh_file)
+
+    def _close(self) -> None:
+        if self._needs_rewrite:
+            self._rewrite()
+
+    def _rewrite(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8", newline="") as f:
+            self._append_rows(f, list(self._rows.values()), True)
+        os.replace(tmp_path, self.path)
+        self._needs_rewrite = False
+
+    def _read_rows(self) -> Tuple[List[_Row], bool]:
+        raise NotImplementedError
+
+    def _append_rows(self, f, rows: List[_Row], with_header: bool) -> None:
+        raise NotImplementedError
+
+
+class CSVSummarySink(_FileSummarySink):
+    def _read_rows(self) -> Tuple[List[_Row], bool]:
+        with self.path.open("r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            rows = [row for row in reader if row.get(SUMMARY_KEY) and row.get(SUMMARY_KEY) != SUMMARY_KEY]
+            return rows, reader.fieldnames == self.fields
+
+    def _append_rows(self, f, rows: List[_Row], with_header: bool) -> None:
+        writer = csv.DictWriter(f, fieldnames=self.fields)
+        if with_header:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+class JSONLSummarySink(_FileSummarySink):
+    def _read_rows(self) -> Tuple[List[_Row], bool]:
+        rows = []
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue
+        return rows, True
+
+    def _append_rows(self, f, rows: List[_Row], with_header: bool) -> None:
+        f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+
+class SQLiteSummarySink(SummarySink):
+    def _open(self) -> None:
+        conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(
+            f'"{field}" TEXT PRIMARY KEY' if field == SUMMARY_KEY else f'"{field}" TEXT' for field in self.fields
+        )
+        conn.execute(f"CREATE TABLE IF NOT EXISTS summary ({columns})")
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(summary)")}
+        for field in self.fields:
+            if field not in existing:
+                conn.execute(f'ALTER TABLE summary ADD COLUMN "{field}" TEXT')
+        conn.commit()
+        self._conn = conn
+        quoted = ", ".join(f'"{field}"' for field in self.fields)
+        placeholders = ", ".join("?" for _ in self.fields)
+        self._replace_sql = f"INSERT OR REPLACE INTO summary ({quoted}) VALUES ({placeholders})"
+        self._insert_sql = f"INSERT OR IGNORE INTO summary ({quoted}) VALUES ({placeholders})"
+
+    def _write(self, pending: Dict[str, Tuple[_Row, bool]]) -> None:
+        replace = [self._values(row) for row, overwrite in pending.values() if overwrite]
+        insert = [self._values(row) for row, overwrite in pending.values() if not overwrite]
+        with self._conn:
+            if replace:
+                self._conn.executemany(self._replace_sql, replace)
+            if insert:
+                self._conn.executemany(self._insert_sql, insert)
+
+    def _close(self) -> None:
+        self._conn.close()
+
+    def _values(self, row: _Row) -> List[Optional[str]]:
+        return [None if row.get(field) is None else str(row.get(field)) for field in self.fields]
+
+
+_BACKENDS = {
+    SUMMARY_CSV: CSVSummarySink,
+    SUMMARY_JSONL: JSONLSummarySink,
+    SUMMARY_SQLITE: SQLiteSummarySink,
+}
+
+
+def create_summary_sink(fmt: str, base_dir: Path, fields: Sequence[str], flush_interval_sec: float = 2.0) -> SummarySink:
+    path = base_dir / summary_filename(fmt)
+    return _BACKENDS[fmt](path, fields, flush_interval_sec=flush_interval_sec)
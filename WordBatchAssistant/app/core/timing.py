@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from .types import LLMUsage
+
+STAGE_QUEUE_WAIT = "queue_wait"
+STAGE_EXTRACT = "extract"
+STAGE_PREPARE = "prepare"
+STAGE_RENDER = "render"
+STAGE_LLM_WAIT = "llm_wait"
+STAGE_LLM = "llm"
+STAGE_LLM_BACKOFF = "llm_backoff"
+STAGE_WRITE = "write"
+
+# Order used for summary columns and run.json. queue_wait happens before the
+# task starts; the other stages add up to (roughly) elapsed_sec.
+STAGES = [
+    STAGE_QUEUE_WAIT,
+    STAGE_EXTRACT,
+    STAGE_PREPARE,
+    STAGE_RENDER,
+    STAGE_LLM_WAIT,
+    STAGE_LLM,
+    STAGE_LLM_BACKOFF,
+    STAGE_WRITE,
+]
+SERIES_LLM_ATTEMPT = "llm_attempt"
+
+# Upper bounds in seconds, Prometheus style; the last bucket is +Inf.
+HISTOGRAM_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+
+def stage_column(stage: str) -> str:
+    return f"t_{stage}_sec"
+
+
+class StageTimer:
+    def __init__(self) -> None:
+        self.durations: Dict[str, float] = {}
+        self.attempt_sec: List[float] = []
+        # Billed usage of the task's own requests and its price, each request
+        # priced for the model that served it (None once one was unpriced).
+        self.usage: Optional[LLMUsage] = None
+        self.cost: Optional[float] = 0.0
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.durations[stage] = self.durations.get(stage, 0.0) + max(seconds, 0.0)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {stage: round(seconds, 4) for stage, seconds in self.durations.items()}
+
+
+def percentile(ordered: Sequence[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(math.floor(rank))
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def histogram(values: Sequence[float], buckets: Sequence[float] = HISTOGRAM_BUCKETS) -> List[int]:
+    counts = [0] * (len(buckets) + 1)
+    for value in values:
+        for idx, bound in enumerate(buckets):
+            if value <= bound:
+                counts[idx] += 1
+                break
+        else:
+            counts[-1] += 1
+    return counts
+
+
+class StageStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._series: Dict[str, List[float]] = {}
+
+    def observe(self, durations: Dict[str, float]) -> None:
+        with self._lock:
+            for stage, seconds in durations.items():
+                self._series.setdefault(stage, []).append(seconds)
+
+    def observe_series(self, name: str, values: Sequence[float]) -> None:
+        if not values:
+            return
+        with self._lock:
+            self._series.setdefault(name, []).extend(values)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            series = {name: sorted(values) for name, values in self._series.items()}
+        order = STAGES + ["elapsed", SERIES_LLM_ATTEMPT]
+        names = [name for name in order if name in series] + sorted(set(series) - set(order))
+        stages: Dict[str, Any] = {}
+        for name in names:
+            values = series[name]
+            total = sum(values)
+            stages[name] = {
+                "count": len(values),
+                "total_sec": round(total, 3),
+                "mean_sec": round(total / len(values), 4),
+                "p50_sec": round(percentile(values, 50), 4),
+                "p90_sec": round(percentile(values, 90), 4),
+                "p95_sec": round(percentile(values, 95), 4),
+                "p99_sec": round(percentile(values, 99), 4),
+                "max_sec": round(values[-1], 4),
+                "histogram": histogram(values),
+            }
+        return {"buckets_sec": HISTOGRAM_BUCKETS + ["+Inf"], "stages": stages}
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import base64
+import math
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+
+ESTIMATOR_CHARS = "chars"
+ESTIMATOR_SCRIPT = "script"
+ESTIMATOR_BPE = "bpe"
+
+# Chat APIs add a few framing tokens per message on top of the content.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Only short strings (paragraphs, templates, partial results) are memoised;
+# whole documents are counted once or twice and would bloat the cache.
+COUNT_CACHE_SIZE = 4096
+COUNT_CACHE_MAX_CHARS = 4096
+
+
+class TokenEstimator:
+    name = ""
+
+    def __init__(self, scale: float = 1.0):
+        self.scale = scale if scale > 0 else 1.0
+        self._cached_count = lru_cache(maxsize=COUNT_CACHE_SIZE)(self._count)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        raw = self._cached_count(text) if len(text) <= COUNT_CACHE_MAX_CHARS else self._count(text)
+        if self.scale == 1.0:
+            return raw
+        return int(math.ceil(raw * self.scale))
+
+    def _count(self, text: str) -> int:
+        raise NotImplementedError
+
+
+class CharRatioEstimator(TokenEstimator):
+    name = ESTIMATOR_CHARS
+
+    def __init__(self, scale: float = 1.0, chars_per_token: float = 4.0):
+        super().__init__(scale)
+        self.chars_per_token = chars_per_token
+
+    def _count(self, text: str) -> int:
+        return int(math.ceil(len(text) / self.chars_per_token))
+
+
+_CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_SCRIPT_PATTERN = re.compile(
+    f"(?P<cjk>[{_CJK_RANGES}]+)"
+    r"|(?P<latin>[A-Za-z]+)"
+    r"|(?P<digits>[0-9]+)"
+    r"|(?P<space>\s+)"
+    f"|(?P<other>[^\\sA-Za-z0-9{_CJK_RANGES}]+)"
+)
+
+
+class ScriptAwareEstimator(TokenEstimator):
+    # Common BPE vocabularies encode a CJK character as roughly one token,
+    # English words as about one token per four letters and numbers in groups
+    # of up to three digits; punctuation and other symbols mostly stand alone.
+    name = ESTIMATOR_SCRIPT
+
+    def __init__(
+        self,
+        scale: float = 1.0,
+        cjk_per_token: float = 1.0,
+        latin_per_token: float = 4.0,
+        digits_per_token: float = 3.0,
+    ):
+        super().__init__(scale)
+        self.cjk_per_token = cjk_per_token
+        self.latin_per_token = latin_per_token
+        self.digits_per_token = digits_per_token
+
+    def _count(self, text: str) -> int:
+        cjk = latin = digits = other = 0.0
+        for match in _SCRIPT_PATTERN.finditer(text):
+            kind = match.lastgroup
+            length = match.end() - match.start()
+            if kind == "cjk":
+                cjk += length
+            elif kind == "latin":
+                latin += math.ceil(length / self.latin_per_token)
+            elif kind == "digits":
+                digits += math.ceil(length / self.digits_per_token)
+            elif kind == "other":
+                other += length
+        return int(math.ceil(cjk / self.cjk_per_token + latin + digits + other))
+
+
+# Approximation of the cl100k/o200k pre-tokenizer using the stdlib re module.
+_BPE_SPLIT = re.compile(
+    r"'(?i:[sdmt]|ll|ve|re)|[^\r\n\w]?[^\W\d_]+|\d{1,3}| ?[^\s\w]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"
+)
+_BPE_SPLIT_PATTERN = _BPE_SPLIT.pattern
+
+
+def load_bpe_ranks(path: str) -> Dict[bytes, int]:
+    ranks: Dict[bytes, int] = {}
+    with open(path, "rb") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 2:
+                continue
+            ranks[base64.b64decode(parts[0])] = int(parts[1])
+    if not ranks:
+        raise ValueError(f"No BPE ranks found in {path}")
+    return ranks
+
+
+class BPEEstimator(TokenEstimator):
+    # Counts tokens with an offline tiktoken-format vocabulary ("<base64 token>
+    # <rank>" per line). The file is only read on first use; tiktoken is used
+    # when installed, otherwise a pure-Python rank merge per pre-token piece.
+    name = ESTIMATOR_BPE
+
+    def __init__(self, vocab_path: str, scale: float = 1.0):
+        super().__init__(scale)
+        self.vocab_path = vocab_path
+        self._ranks: Optional[Dict[bytes, int]] = None
+        self._encoding: Any = None
+        self._load_lock = threading.Lock()
+        self._piece_count = lru_cache(maxsize=65536)(self._count_piece)
+
+    def _ensure_loaded(self) -> None:
+        if self._ranks is not None:
+            return
+        with self._load_lock:
+            if self._ranks is not None:
+                return
+            ranks = load_bpe_ranks(self.vocab_path)
+            if tiktoken is not None:
+                self._encoding = tiktoken.Encoding(
+                    name=Path(self.vocab_path).stem,
+                    pat_str=_BPE_SPLIT_PATTERN,
+                    mergeable_ranks=ranks,
+                    special_tokens={},
+                )
+            self._ranks = ranks
+
+    def _count(self, text: str) -> int:
+        self._ensure_loaded()
+        if self._encoding is not None:
+            return len(self._encoding.encode_ordinary(text))
+        return sum(self._piece_count(piece) for piece in _BPE_SPLIT.findall(text))
+
+    def _count_piece(self, piece: str) -> int:
+        ranks = self._ranks
+        assert ranks is not None
+        data = piece.encode("utf-8")
+        if data in ranks:
+            return 1
+        parts: List[bytes] = [data[i : i + 1] for i in range(len(data))]
+        while len(parts) > 1:
+            best_rank: Optional[int] = None
+            best_index = -1
+            for index in range(len(parts) - 1):
+                rank = ranks.get(parts[index] + parts[index + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank = rank
+                    best_index = index
+            if best_index < 0:
+                break
+            parts[best_index : best_index + 2] = [parts[best_index] + parts[best_index + 1]]
+        return len(parts)
+
+
+EstimatorFactory = Callable[[str, float], TokenEstimator]
+
+_FACTORIES: Dict[str, EstimatorFactory] = {
+    ESTIMATOR_CHARS: lambda vocab_path, scale: CharRatioEstimator(scale),
+    ESTIMATOR_SCRIPT: lambda vocab_path, scale: ScriptAwareEstimator(scale),
+    ESTIMATOR_BPE: lambda vocab_path, scale: BPEEstimator(vocab_path, scale),
+}
+_INSTANCES: Dict[Tuple[str, str, float], TokenEstimator] = {}
+_INSTANCES_LOCK = threading.Lock()
+
+
+def register_estimator(name: str, factory: EstimatorFactory) -> None:
+    _FACTORIES[name] = factory
+
+
+def get_estimator(name: str = ESTIMATOR_SCRIPT, vocab_path: str = "", scale: float = 1.0) -> TokenEstimator:
+    if name == ESTIMATOR_BPE and not vocab_path:
+        raise ValueError("token_estimator=bpe 需要配置 token_vocab_path")
+    factory = _FACTORIES.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown token estimator: {name}")
+    key = (name, vocab_path, scale)
+    with _INSTANCES_LOCK:
+        estimator = _INSTANCES.get(key)
+        if estimator is None:
+            estimator = factory(vocab_path, scale)
+            _INSTANCES[key] = estimator
+        return estimator
+
+
+def default_estimator() -> TokenEstimator:
+    return get_estimator(ESTIMATOR_SCRIPT)
+
+
+class TokenCalibration:
+    # Compares local prompt estimates with usage.prompt_tokens reported by the
+    # API so the estimator (or token_estimate_scale) can be tuned per model.
+
+    def __init__(self, estimator: TokenEstimator):
+        self.estimator = estimator
+        self.samples = 0
+        self.estimated = 0
+        self.actual = 0
+        self._abs_error_pct = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, estimated: int, actual: Optional[int]) -> None:
+        if not actual or estimated <= 0:
+            return
+        with self._lock:
+            self.samples += 1
+            self.estimated += estimated
+            self.actual += actual
+            self._abs_error_pct += abs(estimated - actual) / actual * 100
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            report: Dict[str, Any] = {
+                "estimator": self.estimator.name,
+                "scale": self.estimator.scale,
+                "samples": self.samples,
+                "estimated_prompt_tokens": self.estimated,
+                "actual_prompt_tokens": self.actual,
+            }
+            if self.samples:
+                ratio = self.actual / self.estimated
+                report["actual_to_estimate"] = round(ratio, 3)
+                report["mean_abs_error_pct"] = round(self._abs_error_pct / self.samples, 1)
+                report["suggested_scale"] = round(self.estimator.scale * ratio, 3)
+            return report
+
+
+class PromptCacheStats:
+    # Provider-side prefix cache hits (usage.cached_prompt_tokens) against the
+    # prompt tokens billed, for responses that actually reached the API.
+
+    def __init__(self, prefix_tokens_est: int = 0):
+        self.prefix_tokens_est = prefix_tokens_est
+        self.requests = 0
+        self.requests_with_hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def observe(self, prompt_tokens: Optional[int], cached_tokens: Optional[int]) -> None:
+        if not prompt_tokens:
+            return
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            if cached_tokens:
+                self.requests_with_hits += 1
+                self.cached_tokens += cached_tokens
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "prefix_tokens_est": self.prefix_tokens_est,
+                "requests": self.requests,
+                "requests_with_hits": self.requests_with_hits,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_prompt_tokens": self.cached_tokens,
+                "hit_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            }
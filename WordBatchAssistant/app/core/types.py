@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 
 @dataclass
@@ -13,14 +13,64 @@ class AppConfig:
     max_output_tokens: int = 512
     timeout_sec: int = 60
     concurrency: int = 2
+    runner_engine: str = "thread"
+    adaptive_concurrency: bool = True
+    rate_limit_rpm: int = 0
+    rate_limit_tpm: int = 0
+    hedge_percentile: float = 0.0
+    hedge_max_in_flight: int = 2
+    backends: List[Dict[str, Any]] = field(default_factory=list)
+    budget_tokens: int = 0
+    budget_cost: float = 0.0
+    model_prices: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    stream: bool = False
+    stream_idle_timeout_sec: int = 60
+    extract_workers: int = 2
+    prefetch_limit: int = 8
     include_tables: bool = True
+    extract_engine: str = "python-docx"
     long_doc_mode: str = "truncate"
+    prompt_layout: str = "system"
     max_input_tokens: int = 3000
     chunk_target_tokens: int = 1200
+    pack_max_docs: int = 1
+    pack_max_tokens: int = 0
+    dedup_policy: str = "off"
+    dedup_max_distance: int = 3
+    cache_enabled: bool = True
+    cache_dir: str = ""
+    cache_max_mb: int = 512
+    cache_max_age_days: float = 30.0
+    extract_cache_enabled: bool = True
+    extract_cache_max_entries: int = 5000
+    journal_enabled: bool = True
+    journal_fsync_every: int = 64
+    scan_include: List[str] = field(default_factory=lambda: ["*.docx", "*.doc"])
+    scan_exclude: List[str] = field(default_factory=lambda: ["~$*", ".*"])
+    scan_workers: int = 8
+    token_estimator: str = "script"
+    token_vocab_path: str = ""
+    token_estimate_scale: float = 1.0
+    summary_format: str = "csv"
+    summary_flush_sec: float = 2.0
+    results_index_enabled: bool = True
+    results_index_path: str = ""
+    metrics_port: int = 0
+    metrics_host: str = "127.0.0.1"
+    metrics_file: str = ""
+    metrics_interval_sec: float = 5.0
+    batch_api_base: str = ""
+    batch_completion_window: str = "24h"
+    batch_poll_interval_sec: float = 30.0
+    batch_max_requests: int = 10000
 
     def sanitized_dict(self) -> Dict[str, Any]:
         data = self.__dict__.copy()
         data.pop("api_key", None)
+        data["backends"] = [
+            {key: value for key, value in spec.items() if key != "api_key"} if isinstance(spec, dict) else spec
+            for spec in self.backends
+        ]
         return data
 
 
@@ -60,6 +110,7 @@ class TaskItem:
     status: str = TASK_STATUS_PENDING
     error_message: str = ""
     meta: Optional[DocMeta] = None
+    content_hash: Optional[str] = None
 
 
 @dataclass
@@ -68,6 +119,17 @@ class LLMUsage:
     completion_tokens: Optional[int] = None
     reasoning_tokens: Optional[int] = None
     total_tokens: Optional[int] = None
+    cached_prompt_tokens: Optional[int] = None
+
+
+@dataclass
+class RenderedPrompt:
+    user: str
+    system: str = ""
+
+    @property
+    def text(self) -> str:
+        return f"{self.system}\n\n{self.user}" if self.system else self.user
 
 
 @dataclass
@@ -75,6 +137,22 @@ class LLMResponse:
     text: str
     usage: Optional[LLMUsage] = None
     raw: Optional[Dict[str, Any]] = None
+    cached: bool = False
+    first_token_sec: Optional[float] = None
+    elapsed_sec: float = 0.0
+    prompt_tokens_est: int = 0
+    attempt_sec: List[float] = field(default_factory=list)
+    wait_sec: float = 0.0
+    backoff_sec: float = 0.0
+    model: str = ""
+
+
+class StreamSink:
+    def reset(self) -> None:
+        pass
+
+    def write(self, delta: str) -> None:
+        pass
 
 
 @dataclass
@@ -87,6 +165,12 @@ class TaskResult:
     input_tokens_est: int = 0
     mode: str = "truncate"
     usage: Optional[LLMUsage] = None
+    cost_est: Optional[float] = None
+    ttft_sec: Optional[float] = None
+    tokens_per_sec: Optional[float] = None
+    stages: Dict[str, float] = field(default_factory=dict)
+    llm_attempt_sec: List[float] = field(default_factory=list)
+    duplicate_of: str = ""
 
 
 @dataclass
@@ -97,6 +181,11 @@ class RunnerSummary:
     failed: int = 0
     skipped: int = 0
     cancelled: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    reasoning_tokens: int = 0
+    total_tokens: int = 0
+    cost_est: Optional[float] = None
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -106,6 +195,11 @@ class RunnerSummary:
             "failed": self.failed,
             "skipped": self.skipped,
             "cancelled": self.cancelled,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "reasoning_tokens": self.reasoning_tokens,
+            "total_tokens": self.total_tokens,
+            "cost_est": self.cost_est,
         }
 
 
@@ -115,6 +209,9 @@ class RunnerHooks:
     on_progress: Optional[Callable[[int, int], None]] = None
     on_log: Optional[Callable[[str], None]] = None
     on_finished: Optional[Callable[[RunnerSummary], None]] = None
+    on_task_output: Optional[Callable[[TaskItem, str], None]] = None
+    on_task_output_reset: Optional[Callable[[TaskItem], None]] = None
+    on_task_result: Optional[Callable[[TaskItem, TaskResult], None]] = None
 
 
 def safe_hook(hook: Optional[Callable[..., None]], *args: Any) -> None:
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .types import LLMUsage
+
+
+# USD per 1M tokens (list prices; override or extend with model_prices).
+# Models are matched by full name first, then by the part after the provider
+# prefix ("openai/gpt-4o-mini" -> "gpt-4o-mini"); OpenRouter ":free" variants
+# cost nothing.
+DEFAULT_PRICES: Dict[str, Dict[str, float]] = {
+    "gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10.0},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.6},
+    "gpt-4.1": {"input": 2.0, "cached_input": 0.5, "output": 8.0},
+    "gpt-4.1-mini": {"input": 0.4, "cached_input": 0.1, "output": 1.6},
+    "gpt-4.1-nano": {"input": 0.1, "cached_input": 0.025, "output": 0.4},
+}
+FREE_SUFFIX = ":free"
+
+
+class BudgetExhaustedError(RuntimeError):
+    pass
+
+
+def add_usage(total: Optional[LLMUsage], usage: Optional[LLMUsage]) -> Optional[LLMUsage]:
+    if usage is None:
+        return total
+    if total is None:
+        total = LLMUsage()
+    for name in ("prompt_tokens", "completion_tokens", "reasoning_tokens", "total_tokens", "cached_prompt_tokens"):
+        value = getattr(usage, name)
+        if value is not None:
+            setattr(total, name, (getattr(total, name) or 0) + value)
+    return total
+
+
+def sum_usage(usages: Iterable[Optional[LLMUsage]]) -> Optional[LLMUsage]:
+    total: Optional[LLMUsage] = None
+    for usage in usages:
+        total = add_usage(total, usage)
+    return total
+
+
+def usage_tokens(usage: LLMUsage) -> int:
+    if usage.total_tokens is not None:
+        return usage.total_tokens
+    return (usage.prompt_tokens or 0) + (usage.completion_tokens or 0)
+
+
+class PriceTable:
+    def __init__(self, overrides: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+        self.prices = {**DEFAULT_PRICES, **(overrides or {})}
+
+    def lookup(self, model: str) -> Optional[Dict[str, float]]:
+        if model in self.prices:
+            return self.prices[model]
+        if model.endswith(FREE_SUFFIX):
+            return {"input": 0.0, "output": 0.0}
+        return self.prices.get(model.rsplit("/", 1)[-1])
+
+    def cost(self, model: str, usage: LLMUsage) -> Optional[float]:
+        # Reasoning tokens are part of completion_tokens and billed as output.
+        price = self.lookup(model)
+        if price is None:
+            return None
+        prompt = usage.prompt_tokens or 0
+        cached = min(usage.cached_prompt_tokens or 0, prompt)
+        cached_price = price.get("cached_input", price.get("input", 0.0))
+        return (
+            (prompt - cached) * price.get("input", 0.0)
+            + cached * cached_price
+            + (usage.completion_tokens or 0) * price.get("output", 0.0)
+        ) / 1_000_000
+
+
+class UsageTotals:
+    # Billed usage of a run per model: every request that was actually sent,
+    # chunk and pack requests included; cache hits are free.
+
+    def __init__(self, prices: PriceTable) -> None:
+        self.prices = prices
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, model: str, usage: LLMUsage, estimated: bool = False) -> Optional[float]:
+        cost = self.prices.cost(model, usage)
+        with self._lock:
+            row = self._models.setdefault(
+                model,
+                {
+                    "requests": 0,
+                    "estimated_requests": 0,
+                    "prompt_tokens": 0,
+                    "cached_prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "reasoning_tokens": 0,
+                    "total_tokens": 0,
+                    "cost_est": 0.0 if cost is not None else None,
+                },
+            )
+            row["requests"] += 1
+            row["estimated_requests"] += int(estimated)
+            row["prompt_tokens"] += usage.prompt_tokens or 0
+            row["cached_prompt_tokens"] += usage.cached_prompt_tokens or 0
+            row["completion_tokens"] += usage.completion_tokens or 0
+            row["reasoning_tokens"] += usage.reasoning_tokens or 0
+            row["total_tokens"] += usage_tokens(usage)
+            if cost is not None and row["cost_est"] is not None:
+                row["cost_est"] += cost
+        return cost
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {model: dict(row) for model, row in self._models.items()}
+        totals: Dict[str, Any] = {
+            key: sum(row[key] for row in models.values())
+            for key in (
+                "requests",
+                "estimated_requests",
+                "prompt_tokens",
+                "cached_prompt_tokens",
+                "completion_tokens",
+                "reasoning_tokens",
+                "total_tokens",
+            )
+        }
+        costs = [row["cost_est"] for row in models.values()]
+        totals["cost_est"] = round(sum(costs), 6) if None not in costs else None
+        for row in models.values():
+            if row["cost_est"] is not None:
+                row["cost_est"] = round(row["cost_est"], 6)
+        totals["unpriced_models"] = [model for model, row in models.items() if row["cost_est"] is None]
+        totals["by_model"] = models
+        return totals
+
+
+ADMIT = "admit"
+WAIT = "wait"
+REFUSE = "refuse"
+
+
+def _resolve(waiter: "asyncio.Future[None]") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class BudgetGovernor:
+    # Gates new tasks on a token and/or cost budget. Spend is charged as
+    # responses arrive; a task is admitted while the spend so far plus the
+    # average spend per finished task for each running task and the new one
+    # fits. Otherwise it waits for running tasks to finish (the run slows
+    # down), and once the budget is spent every further task is refused.
+    # Only tasks that spent tokens count as finished, so free ones (cache
+    # hits, duplicates, early failures) do not dilute the average.
+
+    def __init__(self, max_tokens: int = 0, max_cost: float = 0.0) -> None:
+        self.max_tokens = max(0, max_tokens)
+        self.max_cost = max(0.0, max_cost)
+        self.spent_tokens = 0
+        self.spent_cost = 0.0
+        self.active = 0
+        self.finished = 0
+        self.refused = 0
+        self.waits = 0
+        self.wait_sec = 0.0
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = []
+
+    def charge(self, tokens: int, cost: Optional[float]) -> None:
+        with self._cond:
+            self.spent_tokens += tokens
+            self.spent_cost += cost or 0.0
+            self._wake()
+
+    def exhausted(self) -> bool:
+        with self._cond:
+            return self._exhausted()
+
+    def _exhausted(self) -> bool:
+        if self.max_tokens and self.spent_tokens >= self.max_tokens:
+            return True
+        return bool(self.max_cost) and self.spent_cost >= self.max_cost
+
+    def _decide(self) -> str:
+        if self._exhausted():
+            self.refused += 1
+            return REFUSE
+        if self.active == 0 or self.finished == 0:
+            return ADMIT
+        slots = self.active + 1
+        if self.max_tokens and self.spent_tokens + slots * self.spent_tokens / self.finished > self.max_tokens:
+            return WAIT
+        if self.max_cost and self.spent_cost + slots * self.spent_cost / self.finished > self.max_cost:
+            return WAIT
+        return ADMIT
+
+    def admit(self, should_stop: Callable[[], bool]) -> bool:
+        started: Optional[float] = None
+        with self._cond:
+            while True:
+                decision = self._decide()
+                if decision != WAIT or should_stop():
+                    break
+                if started is None:
+                    started = time.monotonic()
+                    self.waits += 1
+                self._cond.wait(timeout=0.5)
+            if started is not None:
+                self.wait_sec += time.monotonic() - started
+            if decision == REFUSE:
+                return False
+            self.active += 1
+            return True
+
+    async def aadmit(self, should_stop: Callable[[], bool]) -> bool:
+        loop = asyncio.get_running_loop()
+        started: Optional[float] = None
+        while True:
+            with self._cond:
+                decision = self._decide()
+                if decision != WAIT or should_stop():
+                    if started is not None:
+                        self.wait_sec += time.monotonic() - started
+                    if decision == REFUSE:
+                        return False
+                    self.active += 1
+                    return True
+                if started is None:
+                    started = time.monotonic()
+                    self.waits += 1
+                waiter: "asyncio.Future[None]" = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            # charge() and release() wake the waiter; the timeout only
+            # rechecks should_stop, like admit().
+            try:
+                await asyncio.wait({waiter}, timeout=0.5)
+            finally:
+                with self._cond:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def release(self, count: int = 1) -> None:
+        with self._cond:
+            self.active = max(0, self.active - count)
+            self._wake()
+
+    def finish_task(self) -> None:
+        with self._cond:
+            self.finished += 1
+            self._wake()
+
+    def _wake(self) -> None:
+        # Called with the lock held.
+        self._cond.notify_all()
+        for loop, waiter in self._async_waiters:
+            loop.call_soon_threadsafe(_resolve, waiter)
+        self._async_waiters.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_tokens": self.max_tokens,
+                "max_cost": self.max_cost,
+                "spent_tokens": self.spent_tokens,
+                "spent_cost": round(self.spent_cost, 6),
+                "exhausted": self._exhausted(),
+                "refused": self.refused,
+                "waits": self.waits,
+                "wait_sec": round(self.wait_sec, 3),
+            }
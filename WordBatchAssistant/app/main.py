@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import multiprocessing
 import sys
 
 from PySide6 import QtWidgets
@@ -8,6 +9,7 @@ from .ui.main_window import MainWindow
 
 
 def main() -> int:
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -8,15 +8,19 @@ from PySide6 import QtCore, QtGui, QtWidgets
 from ..core import config as config_module
 from ..core.logging_utils import setup_logging
 from ..core.runner import BatchRunner
-from ..core.types import AppConfig, RunnerHooks, RunnerSummary, TaskItem
-from .models import TaskTableModel
-from .widgets import LogTextEdit, PathSelector
+from ..core.types import AppConfig, RunnerHooks, RunnerSummary, TaskItem, TaskResult
+from .models import TaskFilterProxyModel, TaskTableModel
+from .widgets import LogTextEdit, PathSelector, StreamOutputView
 
 
 class RunnerWorker(QtCore.QObject):
+    tasks_ready = QtCore.Signal(object)
     task_updated = QtCore.Signal(object)
+    task_result = QtCore.Signal(object, object)
     progress = QtCore.Signal(int, int)
     log = QtCore.Signal(str)
+    task_output = QtCore.Signal(object, str)
+    task_output_reset = QtCore.Signal(object)
     finished = QtCore.Signal(object, object)
     failed = QtCore.Signal(str)
 
@@ -50,6 +54,9 @@ class RunnerWorker(QtCore.QObject):
                 on_task_update=self.task_updated.emit,
                 on_progress=self.progress.emit,
                 on_log=self.log.emit,
+                on_task_output=self.task_output.emit if self.config.stream else None,
+                on_task_output_reset=self.task_output_reset.emit if self.config.stream else None,
+                on_task_result=self.task_result.emit,
             )
             self._runner = BatchRunner(
                 config=self.config,
@@ -60,7 +67,7 @@ class RunnerWorker(QtCore.QObject):
                 logger=self._logger,
                 only_files=self.only_files,
             )
-            self._runner.scan(self.previous_status)
+            self.tasks_ready.emit(list(self._runner.scan(self.previous_status)))
             summary = self._runner.run(retry_failed_only=self.retry_failed_only)
             self.finished.emit(summary, self._runner.tasks)
         except Exception as exc:  # noqa: BLE001
@@ -202,6 +209,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.concurrency_spin = QtWidgets.QSpinBox()
         self.concurrency_spin.setRange(1, 8)
         self.include_tables_check = QtWidgets.QCheckBox("包含表格")
+        self.extract_engine_combo = QtWidgets.QComboBox()
+        self.extract_engine_combo.addItems(["python-docx", "xml"])
+        self.stream_check = QtWidgets.QCheckBox("流式输出")
         self.long_mode_combo = QtWidgets.QComboBox()
         self.long_mode_combo.addItems(["truncate", "chunk"])
         self.max_input_spin = QtWidgets.QSpinBox()
@@ -226,6 +236,9 @@ class MainWindow(QtWidgets.QMainWindow):
         config_layout.addWidget(self.max_input_spin, 4, 1)
         config_layout.addWidget(QtWidgets.QLabel("分块目标 tokens"), 4, 2)
         config_layout.addWidget(self.chunk_target_spin, 4, 3)
+        config_layout.addWidget(QtWidgets.QLabel("提取引擎"), 5, 0)
+        config_layout.addWidget(self.extract_engine_combo, 5, 1)
+        config_layout.addWidget(self.stream_check, 5, 2)
 
         layout.addWidget(self.advanced_group)
 
@@ -252,19 +265,39 @@ class MainWindow(QtWidgets.QMainWindow):
         layout.addWidget(self.summary_label)
         layout.addLayout(button_row)
 
+        filter_row = QtWidgets.QHBoxLayout()
+        self.status_filter_combo = QtWidgets.QComboBox()
+        self.status_filter_combo.addItem("全部", "")
+        for status in ("pending", "running", "success", "failed", "skipped", "cancelled"):
+            self.status_filter_combo.addItem(status, status)
+        filter_row.addWidget(QtWidgets.QLabel("状态筛选"))
+        filter_row.addWidget(self.status_filter_combo)
+        filter_row.addStretch(1)
+        layout.addLayout(filter_row)
+
+        self.task_proxy = TaskFilterProxyModel(self)
+        self.task_proxy.setSourceModel(self.task_model)
         self.table_view = QtWidgets.QTableView()
-        self.table_view.setModel(self.task_model)
+        self.table_view.setModel(self.task_proxy)
+        self.table_view.setSortingEnabled(True)
         self.table_view.horizontalHeader().setStretchLastSection(True)
+        self.table_view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.table_view.selectionModel().currentRowChanged.connect(self._on_current_row_changed)
         layout.addWidget(self.table_view)
 
+        self.stream_view = StreamOutputView()
         self.log_view = LogTextEdit()
-        layout.addWidget(self.log_view)
+        output_tabs = QtWidgets.QTabWidget()
+        output_tabs.addTab(self.log_view, "日志")
+        output_tabs.addTab(self.stream_view, "实时输出")
+        layout.addWidget(output_tabs)
 
         self.start_btn.clicked.connect(self._on_start_clicked)
         self.retry_btn.clicked.connect(lambda: self._on_start_clicked(retry_failed_only=True))
         self.cancel_btn.clicked.connect(self._cancel_worker)
         self.open_output_btn.clicked.connect(self._open_output_dir)
         self.open_summary_btn.clicked.connect(self._open_summary_file)
+        self.status_filter_combo.currentIndexChanged.connect(self._on_status_filter_changed)
 
     def _load_defaults(self) -> None:
         defaults = config_module.DEFAULT_CONFIG
@@ -275,6 +308,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.timeout_spin.setValue(defaults["timeout_sec"])
         self.concurrency_spin.setValue(defaults["concurrency"])
         self.include_tables_check.setChecked(defaults["include_tables"])
+        self.extract_engine_combo.setCurrentText(defaults["extract_engine"])
+        self.stream_check.setChecked(defaults["stream"])
         self.long_mode_combo.setCurrentText(defaults["long_doc_mode"])
         self.max_input_spin.setValue(defaults["max_input_tokens"])
         self.chunk_target_spin.setValue(defaults["chunk_target_tokens"])
@@ -329,6 +364,8 @@ class MainWindow(QtWidgets.QMainWindow):
             timeout_sec=self.timeout_spin.value(),
             concurrency=self.concurrency_spin.value(),
             include_tables=self.include_tables_check.isChecked(),
+            extract_engine=self.extract_engine_combo.currentText(),
+            stream=self.stream_check.isChecked(),
             long_doc_mode=self.long_mode_combo.currentText(),
             max_input_tokens=self.max_input_spin.value(),
             chunk_target_tokens=self.chunk_target_spin.value(),
@@ -347,11 +384,16 @@ class MainWindow(QtWidgets.QMainWindow):
         self._worker_thread = QtCore.QThread(self)
         self._worker.moveToThread(self._worker_thread)
         self._worker_thread.started.connect(self._worker.run)
+        self._worker.tasks_ready.connect(self.task_model.set_tasks)
         self._worker.task_updated.connect(self._on_task_update)
+        self._worker.task_result.connect(self._on_task_result)
         self._worker.progress.connect(self._on_progress)
         self._worker.log.connect(self.log_view.append_message)
+        self._worker.task_output.connect(self._on_task_output)
+        self._worker.task_output_reset.connect(self._on_task_output_reset)
         self._worker.finished.connect(self._on_runner_finished)
         self._worker.failed.connect(self._on_runner_failed)
+        self.stream_view.clear_tasks()
         self._worker_thread.start()
         self._set_running_state(True)
 
@@ -369,6 +411,23 @@ class MainWindow(QtWidgets.QMainWindow):
     def _on_task_update(self, task: TaskItem) -> None:
         self.task_model.update_task(task)
 
+    def _on_task_result(self, task: TaskItem, result: TaskResult) -> None:
+        self.task_model.set_result(task, result)
+        self.stream_view.finish_task(task.filepath)
+
+    def _on_status_filter_changed(self, _index: int) -> None:
+        self.task_proxy.set_status_filter(self.status_filter_combo.currentData())
+
+    def _on_task_output(self, task: TaskItem, delta: str) -> None:
+        self.stream_view.append_delta(task.filepath, task.filename, delta)
+
+    def _on_task_output_reset(self, task: TaskItem) -> None:
+        self.stream_view.reset_task(task.filepath)
+
+    def _on_current_row_changed(self, current: QtCore.QModelIndex, _previous: QtCore.QModelIndex) -> None:
+        source = self.task_proxy.mapToSource(current)
+        self.stream_view.select_task(self.task_model.task_at(source.row()).filepath if source.isValid() else None)
+
     def _on_progress(self, completed: int, total: int) -> None:
         self.progress_bar.setMaximum(max(total, 1))
         self.progress_bar.setValue(completed)
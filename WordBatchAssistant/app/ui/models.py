@@ -1,37 +1,80 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from PySide6 import QtCore
 
-from ..core.types import TaskItem
+from ..core.types import (
+    TaskItem,
+    TaskResult,
+    TASK_STATUS_CANCELLED,
+    TASK_STATUS_FAILED,
+    TASK_STATUS_PENDING,
+    TASK_STATUS_RUNNING,
+    TASK_STATUS_SKIPPED,
+    TASK_STATUS_SUCCESS,
+)
+
+
+FLUSH_INTERVAL_MS = 100
+STATUS_ORDER = {
+    TASK_STATUS_RUNNING: 0,
+    TASK_STATUS_FAILED: 1,
+    TASK_STATUS_CANCELLED: 2,
+    TASK_STATUS_SKIPPED: 3,
+    TASK_STATUS_PENDING: 4,
+    TASK_STATUS_SUCCESS: 5,
+}
 
 
 class TaskTableModel(QtCore.QAbstractTableModel):
-    headers = ["File", "Status", "Output", "Error"]
+    # Rows are found through a path -> row index. Updates only mark the path
+    # dirty; a short timer turns the dirty rows into one dataChanged per run of
+    # adjacent rows and appends unseen tasks in one insert, so the GUI thread
+    # does O(1) work per runner signal however large the table is.
+
+    headers = ["File", "Status", "Elapsed (s)", "Output", "Error"]
+    COLUMN_FILE = 0
+    COLUMN_STATUS = 1
+    COLUMN_ELAPSED = 2
+    COLUMN_OUTPUT = 3
+    COLUMN_ERROR = 4
 
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(self, parent: Optional[QtCore.QObject] = None) -> None:
+        super().__init__(parent)
         self._tasks: List[TaskItem] = []
+        self._rows: Dict[str, int] = {}
+        self._order: Dict[str, int] = {}
+        self._elapsed: Dict[str, float] = {}
+        self._dirty: Set[str] = set()
+        self._pending: Dict[str, TaskItem] = {}
+        self._sort: Tuple[int, QtCore.Qt.SortOrder] = (-1, QtCore.Qt.AscendingOrder)
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self.flush)
 
     def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:  # noqa: N802
-        return len(self._tasks)
+        return 0 if parent.isValid() else len(self._tasks)
 
     def columnCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:  # noqa: N802
-        return len(self.headers)
+        return 0 if parent.isValid() else len(self.headers)
 
     def data(self, index: QtCore.QModelIndex, role: int = QtCore.Qt.DisplayRole):  # noqa: N802
         if not index.isValid() or role not in {QtCore.Qt.DisplayRole, QtCore.Qt.ToolTipRole}:
             return None
         task = self._tasks[index.row()]
         column = index.column()
-        if column == 0:
+        if column == self.COLUMN_FILE:
             return task.filename
-        if column == 1:
+        if column == self.COLUMN_STATUS:
             return task.status
-        if column == 2:
+        if column == self.COLUMN_ELAPSED:
+            elapsed = self._elapsed.get(task.filepath)
+            return f"{elapsed:.1f}" if elapsed is not None else ""
+        if column == self.COLUMN_OUTPUT:
             return task.output_path or ""
-        if column == 3:
+        if column == self.COLUMN_ERROR:
             return task.error_message
         return None
 
@@ -43,18 +86,123 @@ class TaskTableModel(QtCore.QAbstractTableModel):
         return str(section + 1)
 
     def set_tasks(self, tasks: List[TaskItem]) -> None:
+        self._flush_timer.stop()
         self.beginResetModel()
-        self._tasks = tasks
+        self._tasks = list(tasks)
+        self._order = {task.filepath: idx for idx, task in enumerate(self._tasks)}
+        # Tasks queued again by a new scan lose the time of their previous run.
+        kept = {task.filepath for task in self._tasks if task.status != TASK_STATUS_PENDING}
+        self._elapsed = {path: value for path, value in self._elapsed.items() if path in kept}
+        self._dirty.clear()
+        self._pending.clear()
+        self._sort_tasks()
         self.endResetModel()
 
     def update_task(self, task: TaskItem) -> None:
-        for row, existing in enumerate(self._tasks):
-            if existing.filepath == task.filepath:
-                self._tasks[row] = task
-                top_left = self.index(row, 0)
-                bottom_right = self.index(row, self.columnCount() - 1)
-                self.dataChanged.emit(top_left, bottom_right)
-                return
+        row = self._rows.get(task.filepath)
+        if row is None:
+            self._pending[task.filepath] = task
+        else:
+            self._tasks[row] = task
+            self._dirty.add(task.filepath)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def set_result(self, task: TaskItem, result: TaskResult) -> None:
+        self._elapsed[task.filepath] = result.elapsed_sec
+        self.update_task(task)
+
+    def flush(self) -> None:
+        self._flush_timer.stop()
+        if self._pending:
+            first = len(self._tasks)
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + len(self._pending) - 1)
+            for path, task in self._pending.items():
+                self._rows[path] = len(self._tasks)
+                self._order.setdefault(path, len(self._order))
+                self._tasks.append(task)
+            self._pending.clear()
+            self.endInsertRows()
+        if not self._dirty:
+            return
+        rows = sorted(self._rows[path] for path in self._dirty if path in self._rows)
+        self._dirty.clear()
+        last_column = self.columnCount() - 1
+        for start, end in _row_ranges(rows):
+            self.dataChanged.emit(self.index(start, 0), self.index(end, last_column))
+
+    def sort(self, column: int, order: QtCore.Qt.SortOrder = QtCore.Qt.AscendingOrder) -> None:
+        # One Python sort of the task list instead of a proxy comparing rows
+        # through data(); column -1 restores scan order.
+        self.flush()
+        self._sort = (column, order)
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        paths = [self._tasks[index.row()].filepath for index in persistent]
+        self._sort_tasks()
+        self.changePersistentIndexList(
+            persistent, [self.index(self._rows[path], index.column()) for path, index in zip(paths, persistent)]
+        )
+        self.layoutChanged.emit()
+
+    def _sort_tasks(self) -> None:
+        column, order = self._sort
+        self._tasks.sort(key=self._sort_key(column), reverse=order == QtCore.Qt.DescendingOrder)
+        self._rows = {task.filepath: row for row, task in enumerate(self._tasks)}
+
+    def _sort_key(self, column: int) -> Callable[[TaskItem], Any]:
+        if column == self.COLUMN_FILE:
+            return lambda task: task.filename.lower()
+        if column == self.COLUMN_STATUS:
+            return lambda task: STATUS_ORDER.get(task.status, len(STATUS_ORDER))
+        if column == self.COLUMN_ELAPSED:
+            # Unfinished tasks go after the timed ones.
+            return lambda task: (task.filepath not in self._elapsed, self._elapsed.get(task.filepath, 0.0))
+        if column == self.COLUMN_OUTPUT:
+            return lambda task: task.output_path or ""
+        if column == self.COLUMN_ERROR:
+            return lambda task: task.error_message
+        return lambda task: self._order.get(task.filepath, len(self._order))
+
+    def task_at(self, row: int) -> TaskItem:
+        return self._tasks[row]
 
     def tasks(self) -> List[TaskItem]:
         return list(self._tasks)
+
+
+class TaskFilterProxyModel(QtCore.QSortFilterProxyModel):
+    # Filters on the task status straight from the source list (going through
+    # data() costs a QModelIndex per row); sorting is handed to the source.
+
+    def __init__(self, parent: Optional[QtCore.QObject] = None) -> None:
+        super().__init__(parent)
+        self.setDynamicSortFilter(True)
+        self._status = ""
+
+    def set_status_filter(self, status: str) -> None:
+        self._status = status
+        # A full invalidate rebuilds the mapping in one pass; invalidateFilter
+        # merges rows back one range at a time, which crawls at 100k rows.
+        self.invalidate()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QtCore.QModelIndex) -> bool:  # noqa: N802
+        if not self._status:
+            return True
+        source = self.sourceModel()
+        return isinstance(source, TaskTableModel) and source.task_at(source_row).status == self._status
+
+    def sort(self, column: int, order: QtCore.Qt.SortOrder = QtCore.Qt.AscendingOrder) -> None:
+        source = self.sourceModel()
+        if source is not None:
+            source.sort(column, order)
+
+
+def _row_ranges(rows: List[int]) -> List[Tuple[int, int]]:
+    ranges: List[Tuple[int, int]] = []
+    for row in rows:
+        if ranges and row == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], row)
+        else:
+            ranges.append((row, row))
+    return ranges
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Set
 
-from PySide6 import QtWidgets
+from PySide6 import QtGui, QtWidgets
 
 
 class PathSelector(QtWidgets.QWidget):
@@ -45,3 +45,73 @@ class LogTextEdit(QtWidgets.QPlainTextEdit):
     def append_message(self, message: str) -> None:
         self.appendPlainText(message)
         self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+
+
+class StreamOutputView(QtWidgets.QPlainTextEdit):
+    # Deltas of concurrent documents interleave, so each running task keeps
+    # its own buffer. The view follows the task that started streaming last
+    # unless a task is pinned (selected in the table); finished tasks drop
+    # their buffer once off screen, since the result file has the full text.
+
+    def __init__(self, parent: Optional[QtWidgets.QWidget] = None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setPlaceholderText("开启流式输出后，这里显示当前文档的实时结果")
+        self._buffers: Dict[str, List[str]] = {}
+        self._titles: Dict[str, str] = {}
+        self._finished: Set[str] = set()
+        self._shown: Optional[str] = None
+        self._pinned: Optional[str] = None
+
+    def append_delta(self, key: str, title: str, delta: str) -> None:
+        started = key not in self._buffers
+        self._buffers.setdefault(key, []).append(delta)
+        self._titles[key] = title
+        if key == self._shown:
+            self.moveCursor(QtGui.QTextCursor.End)
+            self.insertPlainText(delta)
+            self._scroll_to_end()
+        elif started and self._pinned is None:
+            self._show(key)
+
+    def reset_task(self, key: str) -> None:
+        if key in self._buffers:
+            self._buffers[key] = []
+        if key == self._shown:
+            self._show(key)
+
+    def finish_task(self, key: str) -> None:
+        self._finished.add(key)
+        if key != self._shown:
+            self._drop(key)
+
+    def select_task(self, key: Optional[str]) -> None:
+        # Selecting a task that is not streaming goes back to following.
+        self._pinned = key if key in self._buffers else None
+        if self._pinned is not None and self._pinned != self._shown:
+            self._show(self._pinned)
+
+    def clear_tasks(self) -> None:
+        self._buffers.clear()
+        self._titles.clear()
+        self._finished.clear()
+        self._shown = None
+        self._pinned = None
+        self.clear()
+
+    def _show(self, key: str) -> None:
+        previous = self._shown
+        self._shown = key
+        if previous is not None and previous != key and previous in self._finished:
+            self._drop(previous)
+        self.setPlainText(f"[{self._titles.get(key, key)}]\n" + "".join(self._buffers.get(key, [])))
+        self._scroll_to_end()
+
+    def _drop(self, key: str) -> None:
+        self._buffers.pop(key, None)
+        self._titles.pop(key, None)
+        self._finished.discard(key)
+
+    def _scroll_to_end(self) -> None:
+        self.moveCursor(QtGui.QTextCursor.End)
+        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import argparse
+import email.parser
+import email.policy
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+_WORD = re.compile(r"[一-鿿]|[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+_PACKED_SECTION = re.compile(r"<<<DOC (\d+)>>>\n(.*?)\n<<<END \1>>>", re.S)
+_BATCH_PATH = re.compile(r"/batches/([^/]+)(/cancel)?$")
+_FILE_CONTENT_PATH = re.compile(r"/files/([^/]+)/content$")
+
+
+def count_tokens(text: str) -> int:
+    return len(_WORD.findall(text))
+
+
+class FakeLLMState:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.counters: Dict[str, int] = {"requests": 0, "ok": 0, "429": 0, "5xx": 0, "streamed": 0, "cut": 0}
+        self.counters["cached_prompt_tokens"] = 0
+        self.counters["batches"] = 0
+        self.counters["batch_requests"] = 0
+        self._seen_prefixes: set = set()
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+
+    def sample_latency(self) -> float:
+        mean = self.args.latency_ms / 1000.0
+        dist = self.args.latency_dist
+        with self.lock:
+            if dist == "uniform":
+                return self.rng.uniform(0.5 * mean, 1.5 * mean)
+            if dist == "exp":
+                return self.rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+            if dist == "lognormal" and mean > 0:
+                sigma = self.args.latency_sigma
+                return self.rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+            return mean
+
+    def admit(self) -> Tuple[int, str]:
+        with self.lock:
+            self.counters["requests"] += 1
+            if self.args.max_in_flight and self.in_flight >= self.args.max_in_flight:
+                self.counters["429"] += 1
+                return 429, "too many requests in flight"
+            roll = self.rng.random()
+            if roll < self.args.error_429:
+                self.counters["429"] += 1
+                return 429, "rate limited"
+            if roll < self.args.error_429 + self.args.error_5xx:
+                self.counters["5xx"] += 1
+                return self.rng.choice((500, 502, 503)), "injected server error"
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return 200, ""
+
+    def cut_stream(self) -> bool:
+        with self.lock:
+            if self.rng.random() >= self.args.stream_cut:
+                return False
+            self.counters["cut"] += 1
+            return True
+
+    def done(self, streamed: bool) -> None:
+        with self.lock:
+            self.in_flight -= 1
+            self.counters["ok"] += 1
+            if streamed:
+                self.counters["streamed"] += 1
+
+    def cached_tokens(self, messages: list) -> int:
+        # Mimics automatic prefix caching: a system message seen before is
+        # reported as cached_tokens on later requests.
+        if not messages or messages[0].get("role") != "system":
+            return 0
+        prefix = str(messages[0].get("content", ""))
+        with self.lock:
+            if prefix not in self._seen_prefixes:
+                self._seen_prefixes.add(prefix)
+                return 0
+            tokens = count_tokens(prefix)
+            self.counters["cached_prompt_tokens"] += tokens
+            return tokens
+
+    def reply(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        max_tokens = int(body.get("max_tokens") or self.args.reply_tokens)
+        text = _reply_text(prompt, min(self.args.reply_tokens, max_tokens))
+        sections = _PACKED_SECTION.findall(str(messages[-1].get("content", ""))) if messages else []
+        if sections:
+            # Packed documents: answer each in its own marked section, and
+            # drop some with --pack_drop to exercise the client's fallback.
+            with self.lock:
+                kept = [(index, part) for index, part in sections if self.rng.random() >= self.args.pack_drop]
+            text = "\n\n".join(
+                f"<<<DOC {index}>>>\n{_reply_text(part, self.args.reply_tokens)}\n<<<END {index}>>>"
+                for index, part in kept
+            )
+        usage = {"prompt_tokens": count_tokens(prompt), "completion_tokens": count_tokens(text)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        usage["prompt_tokens_details"] = {"cached_tokens": self.cached_tokens(messages)}
+        return {"choices": [{"message": {"content": text}}], "usage": usage}
+
+    # Batch API stand-in: /files stores uploads in memory, /batches runs the
+    # requests in a background thread after --batch_delay_ms and publishes
+    # output/error files the way the OpenAI Batch API does.
+
+    def add_file(self, data: bytes) -> Dict[str, Any]:
+        with self.lock:
+            file_id = f"file-{len(self.files) + 1}"
+            self.files[file_id] = data
+        return {"id": file_id, "object": "file", "bytes": len(data), "purpose": "batch"}
+
+    def create_batch(self, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            if body.get("input_file_id") not in self.files:
+                return None
+            self.counters["batches"] += 1
+            batch = {
+                "id": f"batch_{self.counters['batches']}",
+                "object": "batch",
+                "endpoint": body.get("endpoint"),
+                "input_file_id": body["input_file_id"],
+                "completion_window": body.get("completion_window", "24h"),
+                "status": "validating",
+                "output_file_id": None,
+                "error_file_id": None,
+                "created_at": int(time.time()),
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            }
+            self.batches[batch["id"]] = batch
+        threading.Thread(target=self._run_batch, args=(batch["id"],), daemon=True).start()
+        return dict(batch)
+
+    def get_batch(self, batch_id: str, cancel: bool = False) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None
+            if cancel and batch["status"] in ("validating", "in_progress"):
+                batch["status"] = "cancelling"
+            return json.loads(json.dumps(batch))
+
+    def _run_batch(self, batch_id: str) -> None:
+        batch = self.batches[batch_id]
+        lines = [json.loads(line) for line in self.files[batch["input_file_id"]].splitlines() if line.strip()]
+        with self.lock:
+            batch["request_counts"]["total"] = len(lines)
+            batch["status"] = "in_progress"
+        time.sleep(self.args.batch_delay_ms / 1000.0)
+        outputs: List[bytes] = []
+        errors: List[bytes] = []
+        for index, item in enumerate(lines):
+            if batch["status"] == "cancelling":
+                break
+            with self.lock:
+                self.counters["batch_requests"] += 1
+                failed = self.rng.random() < self.args.error_5xx
+            if failed:
+                response = {"status_code": 500, "body": {"error": {"message": "injected server error"}}}
+            else:
+                response = {"status_code": 200, "body": self.reply(item.get("body") or {})}
+            record = {"id": f"{batch_id}_req_{index}", "custom_id": item["custom_id"], "response": response}
+            (errors if failed else outputs).append(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+            with self.lock:
+                batch["request_counts"]["failed" if failed else "completed"] += 1
+        with self.lock:
+            for key, records in (("output_file_id", outputs), ("error_file_id", errors)):
+                if records:
+                    file_id = f"file-{len(self.files) + 1}"
+                    self.files[file_id] = b"\n".join(records) + b"\n"
+                    batch[key] = file_id
+            batch["status"] = "cancelled" if batch["status"] == "cancelling" else "completed"
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {**self.counters, "in_flight": self.in_flight, "peak_in_flight": self.peak_in_flight}
+
+
+def _reply_text(prompt: str, reply_tokens: int) -> str:
+    head = "FAKE_RESPONSE: " + prompt[:200]
+    filler = max(reply_tokens - count_tokens(head), 0)
+    return head + "".join("测试"[i % 2] for i in range(filler))
+
+
+def make_handler(state: FakeLLMState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            path = self.path.split("?")[0].rstrip("/")
+            batch_match = _BATCH_PATH.search(path)
+            file_match = _FILE_CONTENT_PATH.search(path)
+            if path == "/stats":
+                self._send_json(200, state.stats())
+            elif batch_match and not batch_match.group(2):
+                self._send_found(state.get_batch(batch_match.group(1)))
+            elif file_match and file_match.group(1) in state.files:
+                self._send_bytes(200, state.files[file_match.group(1)], "application/jsonl")
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length)
+            path = self.path.split("?")[0].rstrip("/")
+            batch_match = _BATCH_PATH.search(path)
+            if path.endswith("/files"):
+                self._upload(raw)
+            elif path.endswith("/batches"):
+                self._send_found(state.create_batch(json.loads(raw or b"{}")))
+            elif batch_match and batch_match.group(2):
+                self._send_found(state.get_batch(batch_match.group(1), cancel=True))
+            else:
+                self._chat(json.loads(raw or b"{}"))
+
+        def _upload(self, raw: bytes) -> None:
+            header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode("latin-1")
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + raw)
+            for part in message.iter_parts():
+                if part.get_param("name", header="content-disposition") == "file":
+                    self._send_json(200, state.add_file(part.get_payload(decode=True)))
+                    return
+            self._send_json(400, {"error": {"message": "missing file"}})
+
+        def _send_found(self, payload: Optional[Dict[str, Any]]) -> None:
+            if payload is None:
+                self._send_json(404, {"error": {"message": "not found"}})
+            else:
+                self._send_json(200, payload)
+
+        def _chat(self, body: Dict[str, Any]) -> None:
+            status, message = state.admit()
+            if status != 200:
+                time.sleep(state.args.error_latency_ms / 1000.0)
+                headers = {"Retry-After": str(state.args.retry_after)} if status == 429 else {}
+                self._send_json(status, {"error": {"message": message}}, headers)
+                return
+            streamed = bool(body.get("stream"))
+            try:
+                reply = state.reply(body)
+                time.sleep(state.sample_latency())
+                if streamed:
+                    self._stream(reply["choices"][0]["message"]["content"], reply["usage"])
+                else:
+                    self._send_json(200, reply)
+            finally:
+                state.done(streamed)
+
+        def _stream(self, text: str, usage: Dict[str, int]) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            step = 8
+            delay = step / state.args.stream_chars_per_sec if state.args.stream_chars_per_sec > 0 else 0.0
+            # A cut stream closes the connection halfway, without finish_reason or [DONE].
+            end = len(text) // 2 if state.cut_stream() else len(text)
+            for start in range(0, end, step):
+                delta = {"content": text[start : min(start + step, end)]}
+                last = end == len(text) and start + step >= len(text)
+                chunk = {"choices": [{"delta": delta, "finish_reason": "stop" if last else None}]}
+                self.wfile.write(b"data: " + json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+                if delay:
+                    time.sleep(delay)
+            if end < len(text):
+                self.close_connection = True
+                return
+            self.wfile.write(b"data: " + json.dumps({"choices": [], "usage": usage}).encode("utf-8") + b"\n\n")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] | None = None) -> None:
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self._send_bytes(status, data, "application/json", headers)
+
+        def _send_bytes(
+            self, status: int, data: bytes, content_type: str, headers: Dict[str, str] | None = None
+        ) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Local fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency_ms", type=float, default=200.0, help="Mean latency before the first byte")
+    parser.add_argument("--latency_dist", choices=["fixed", "uniform", "exp", "lognormal"], default="lognormal")
+    parser.add_argument("--latency_sigma", type=float, default=0.5, help="Sigma for the lognormal distribution")
+    parser.add_argument("--error_429", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--error_5xx", type=float, default=0.0, help="Share of requests answered with 5xx")
+    parser.add_argument("--error_latency_ms", type=float, default=20.0)
+    parser.add_argument("--retry_after", type=int, default=1, help="Retry-After seconds sent with 429")
+    parser.add_argument("--max_in_flight", type=int, default=0, help="Answer 429 above this many concurrent requests")
+    parser.add_argument("--reply_tokens", type=int, default=200, help="Approximate tokens per reply")
+    parser.add_argument("--pack_drop", type=float, default=0.0, help="Share of packed sections left unanswered")
+    parser.add_argument("--batch_delay_ms", type=float, default=500.0, help="Queue time of a batch job")
+    parser.add_argument("--stream_chars_per_sec", type=float, default=400.0, help="Pace of streamed replies")
+    parser.add_argument("--stream_cut", type=float, default=0.0, help="Share of streamed replies cut off halfway")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+class _QuietServer(ThreadingHTTPServer):
+    # Clients drop connections on purpose (cancelled hedges, timeouts).
+
+    def handle_error(self, request, client_address) -> None:
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(args: argparse.Namespace) -> Tuple[ThreadingHTTPServer, FakeLLMState]:
+    state = FakeLLMState(args)
+    server = _QuietServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    server, _ = start_server(args)
+    host, port = server.server_address[:2]
+    print(f"fake LLM server on http://{host}:{port}/v1/chat/completions (batch API under /v1, GET /stats for counters)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import argparse
+import random
+from pathlib import Path
+
+from docx import Document
+
+HANZI = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所"
+    "民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那"
+    "社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并"
+)
+WORDS = (
+    "report analysis budget review quarterly summary market growth revenue customer project timeline risk "
+    "delivery quality metric target team update policy contract schedule inventory supplier forecast"
+).split()
+PUNCTUATION_CJK = "，。；、"
+
+
+def _sentence(rng: random.Random, cjk_ratio: float, length: int) -> str:
+    if rng.random() < cjk_ratio:
+        body = "".join(rng.choice(HANZI) for _ in range(length))
+        cut = rng.randint(1, max(length - 1, 1))
+        return body[:cut] + rng.choice(PUNCTUATION_CJK) + body[cut:] + "。"
+    words = [rng.choice(WORDS) for _ in range(max(length // 5, 2))]
+    words[0] = words[0].capitalize()
+    if rng.random() < 0.3:
+        words.insert(rng.randint(1, len(words)), str(rng.randint(1, 99999)))
+    return " ".join(words) + "."
+
+
+def _paragraph(rng: random.Random, cjk_ratio: float, chars: int) -> str:
+    parts = []
+    total = 0
+    while total < chars:
+        sentence = _sentence(rng, cjk_ratio, rng.randint(12, 40))
+        parts.append(sentence)
+        total += len(sentence)
+    return "".join(parts) if rng.random() < cjk_ratio else " ".join(parts)
+
+
+def make_document(
+    path: Path, rng: random.Random, paragraphs: int, paragraph_chars: int, table_density: float, cjk_ratio: float
+) -> None:
+    document = Document()
+    document.add_heading(_sentence(rng, cjk_ratio, 10), level=1)
+    for _ in range(paragraphs):
+        document.add_paragraph(_paragraph(rng, cjk_ratio, paragraph_chars))
+        if rng.random() < table_density:
+            rows = rng.randint(2, 8)
+            cols = rng.randint(2, 5)
+            table = document.add_table(rows=rows, cols=cols)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = _sentence(rng, cjk_ratio, rng.randint(4, 12))
+    document.save(str(path))
+
+
+def generate_corpus(
+    output_dir: str,
+    docs: int,
+    paragraphs: int = 20,
+    paragraph_chars: int = 200,
+    table_density: float = 0.1,
+    cjk_ratio: float = 0.8,
+    size_jitter: float = 0.5,
+    seed: int = 0,
+) -> list[Path]:
+    rng = random.Random(seed)
+    target = Path(output_dir)
+    target.mkdir(parents=True, exist_ok=True)
+    width = len(str(max(docs - 1, 0)))
+    paths = []
+    for index in range(docs):
+        scale = 1.0 + rng.uniform(-size_jitter, size_jitter)
+        path = target / f"doc_{index:0{width}d}.docx"
+        make_document(
+            path,
+            rng,
+            paragraphs=max(1, int(paragraphs * scale)),
+            paragraph_chars=paragraph_chars,
+            table_density=table_density,
+            cjk_ratio=cjk_ratio,
+        )
+        paths.append(path)
+    return paths
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Generate a synthetic .docx corpus")
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--docs", type=int, default=100, help="Number of documents")
+    parser.add_argument("--paragraphs", type=int, default=20, help="Average paragraphs per document")
+    parser.add_argument("--paragraph_chars", type=int, default=200, help="Approximate characters per paragraph")
+    parser.add_argument("--table_density", type=float, default=0.1, help="Chance of a table after each paragraph")
+    parser.add_argument("--cjk_ratio", type=float, default=0.8, help="Share of Chinese sentences (0-1)")
+    parser.add_argument("--size_jitter", type=float, default=0.5, help="Relative spread of document length")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    paths = generate_corpus(
+        args.output_dir,
+        args.docs,
+        paragraphs=args.paragraphs,
+        paragraph_chars=args.paragraph_chars,
+        table_density=args.table_density,
+        cjk_ratio=args.cjk_ratio,
+        size_jitter=args.size_jitter,
+        seed=args.seed,
+    )
+    print(f"generated {len(paths)} documents in {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
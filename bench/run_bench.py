@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from WordBatchAssistant.app.core import config as config_module
+from WordBatchAssistant.app.core.runner import BatchRunner
+from WordBatchAssistant.app.core.types import RunnerHooks, TaskItem, TASK_STATUS_RUNNING
+
+from . import fake_llm_server
+from .make_corpus import generate_corpus
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - optional dependency
+    psutil = None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class RSSSampler:
+    # ru_maxrss covers the whole life of the process; sampling with psutil
+    # gives the peak of this run only and includes extraction workers.
+
+    def __init__(self, interval_sec: float = 0.1):
+        self.interval_sec = interval_sec
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if psutil is None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Optional[int]:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            return self.peak_bytes
+        if resource is None:
+            return None
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        scale = 1 if sys.platform == "darwin" else 1024
+        return (own + children) * scale
+
+    def _run(self) -> None:
+        process = psutil.Process()
+        while not self._stop.is_set():
+            try:
+                total = process.memory_info().rss
+                total += sum(child.memory_info().rss for child in process.children(recursive=True))
+            except psutil.Error:
+                total = 0
+            self.peak_bytes = max(self.peak_bytes, total)
+            self._stop.wait(self.interval_sec)
+
+
+def _parse_overrides(pairs: List[str]) -> Dict[str, Any]:
+    overrides: Dict[str, Any] = {}
+    for pair in pairs:
+        key, _, raw = pair.partition("=")
+        try:
+            overrides[key] = json.loads(raw)
+        except ValueError:
+            overrides[key] = raw
+    return overrides
+
+
+def run_once(
+    input_dir: str,
+    output_dir: str,
+    prompt: str,
+    overrides: Dict[str, Any],
+    config_file: Optional[str],
+    resume: bool = False,
+) -> Dict[str, Any]:
+    app_config = config_module.load_config(config_file)
+    for key, value in overrides.items():
+        if not hasattr(app_config, key):
+            raise SystemExit(f"unknown config key: {key}")
+        setattr(app_config, key, value)
+
+    started: Dict[str, float] = {}
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def on_task_update(task: TaskItem) -> None:
+        now = time.perf_counter()
+        with lock:
+            if task.status == TASK_STATUS_RUNNING:
+                started[task.filepath] = now
+            elif task.filepath in started:
+                latencies.append(now - started.pop(task.filepath))
+
+    runner = BatchRunner(
+        config=app_config,
+        prompt_template=prompt,
+        input_dir=input_dir,
+        output_dir=output_dir,
+        hooks=RunnerHooks(on_task_update=on_task_update),
+    )
+    sampler = RSSSampler()
+    sampler.start()
+    begin = time.perf_counter()
+    runner.scan(resume=resume)
+    summary = runner.run()
+    elapsed = time.perf_counter() - begin
+    peak_rss = sampler.stop()
+
+    processed = summary.success + summary.failed
+    run_meta = json.loads(Path(runner.output_writer.run_json_path).read_text(encoding="utf-8"))
+    return {
+        "docs": summary.total,
+        "success": summary.success,
+        "failed": summary.failed,
+        "skipped": summary.skipped,
+        "wall_sec": round(elapsed, 3),
+        "docs_per_sec": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_p50_sec": round(percentile(latencies, 50), 3),
+        "latency_p95_sec": round(percentile(latencies, 95), 3),
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1) if peak_rss else None,
+        "concurrency_peak": run_meta.get("concurrency", {}).get("peak_in_flight"),
+        "throttle_events": run_meta.get("concurrency", {}).get("throttle_events"),
+        "llm_cache": run_meta.get("llm_cache"),
+        "hedging": run_meta.get("hedging"),
+        "backends": {
+            row["name"]: {key: row[key] for key in ("requests", "failures", "ejections", "latency_p50_sec")}
+            for row in run_meta.get("backends", [])
+        },
+        "stage_p50_sec": {
+            name: stats["p50_sec"] for name, stats in run_meta.get("stage_timings", {}).get("stages", {}).items()
+        },
+    }
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="End-to-end BatchRunner throughput benchmark")
+    parser.add_argument("--input_dir", help="Existing corpus; omit to generate one")
+    parser.add_argument("--docs", type=int, default=200, help="Documents to generate when --input_dir is omitted")
+    parser.add_argument("--cjk_ratio", type=float, default=0.8)
+    parser.add_argument("--table_density", type=float, default=0.1)
+    parser.add_argument("--config_file", help="Base JSON config (defaults to built-in settings)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="Config override, JSON value")
+    parser.add_argument("--runs", type=int, default=1, help="Repeat the run; later runs see a warm cache")
+    parser.add_argument("--resume", action="store_true", help="Later runs resume in the first run's output directory")
+    parser.add_argument(
+        "--rerun_set", action="append", default=[], metavar="KEY=VALUE", help="Config override for runs after the first"
+    )
+    parser.add_argument("--endpoint", help="Use an already running server instead of the built-in fake")
+    parser.add_argument("--keep_output", action="store_true", help="Keep the output directories")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per run")
+    fake = parser.add_argument_group("built-in fake server")
+    fake.add_argument("--latency_ms", type=float, default=200.0)
+    fake.add_argument("--latency_dist", choices=["fixed", "uniform", "exp", "lognormal"], default="lognormal")
+    fake.add_argument("--latency_sigma", type=float, default=0.5)
+    fake.add_argument("--error_429", type=float, default=0.0)
+    fake.add_argument("--error_5xx", type=float, default=0.0)
+    fake.add_argument("--max_in_flight", type=int, default=0)
+    fake.add_argument("--reply_tokens", type=int, default=200)
+    fake.add_argument("--batch_delay_ms", type=float, default=500.0)
+    fake.add_argument("--pack_drop", type=float, default=0.0)
+    fake.add_argument("--backends", type=int, default=1, help="Start this many fake servers as a backend pool")
+    fake.add_argument("--outage_5xx", type=float, help="5xx share of the first backend (overrides --error_5xx)")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    workdir = Path(tempfile.mkdtemp(prefix="wordbatch_bench_"))
+    servers: List[Any] = []
+    states: List[Any] = []
+    try:
+        input_dir = args.input_dir
+        if not input_dir:
+            input_dir = str(workdir / "corpus")
+            generate_corpus(input_dir, args.docs, table_density=args.table_density, cjk_ratio=args.cjk_ratio)
+
+        endpoint = args.endpoint
+        endpoints: List[str] = []
+        if not endpoint:
+            for index in range(max(1, args.backends)):
+                error_5xx = args.outage_5xx if index == 0 and args.outage_5xx is not None else args.error_5xx
+                server_args = fake_llm_server.build_arg_parser().parse_args(
+                    [
+                        "--port", "0",
+                        "--latency_ms", str(args.latency_ms),
+                        "--latency_dist", args.latency_dist,
+                        "--latency_sigma", str(args.latency_sigma),
+                        "--error_429", str(args.error_429),
+                        "--error_5xx", str(error_5xx),
+                        "--max_in_flight", str(args.max_in_flight),
+                        "--reply_tokens", str(args.reply_tokens),
+                        "--batch_delay_ms", str(args.batch_delay_ms),
+                        "--pack_drop", str(args.pack_drop),
+                        "--seed", str(index),
+                    ]
+                )  # fmt: skip
+                server, state = fake_llm_server.start_server(server_args)
+                servers.append(server)
+                states.append(state)
+                host, port = server.server_address[:2]
+                endpoints.append(f"http://{host}:{port}/v1/chat/completions")
+            endpoint = endpoints[0]
+
+        overrides = {"endpoint": endpoint, "model": "bench", "rate_limit_rpm": 0, "rate_limit_tpm": 0}
+        if len(endpoints) > 1:
+            overrides["backends"] = [
+                {"name": f"fake{index}", "endpoint": url} for index, url in enumerate(endpoints, start=1)
+            ]
+        overrides.update(_parse_overrides(args.set))
+        overrides.setdefault("cache_dir", str(workdir / "cache"))
+        prompt = config_module.load_default_prompt()
+
+        for run_index in range(1, args.runs + 1):
+            output_dir = workdir / ("run" if args.resume else f"run_{run_index}")
+            if run_index == 2:
+                overrides.update(_parse_overrides(args.rerun_set))
+            report = run_once(input_dir, str(output_dir), prompt, overrides, args.config_file, resume=args.resume)
+            report["run"] = run_index
+            if len(states) == 1:
+                report["server"] = states[0].stats()
+            elif states:
+                report["server"] = [state.stats() for state in states]
+            if args.json:
+                print(json.dumps(report, ensure_ascii=False))
+            else:
+                print(
+                    f"run {run_index}: {report['docs']} docs in {report['wall_sec']}s | "
+                    f"{report['docs_per_sec']} docs/s | p50 {report['latency_p50_sec']}s "
+                    f"p95 {report['latency_p95_sec']}s | peak RSS {report['peak_rss_mb']} MB | "
+                    f"success {report['success']} failed {report['failed']} skipped {report['skipped']} | "
+                    f"peak concurrency {report['concurrency_peak']} throttles {report['throttle_events']}"
+                )
+    finally:
+        for server in servers:
+            server.shutdown()
+        if args.keep_output:
+            print(f"outputs kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
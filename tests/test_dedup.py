@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+from WordBatchAssistant.app.core import dedup
+from WordBatchAssistant.app.core.dedup import DuplicateIndex, hamming, normalize_text, simhash
+from WordBatchAssistant.app.core.types import TASK_STATUS_CANCELLED, TASK_STATUS_FAILED, TASK_STATUS_SUCCESS
+
+
+def _text(seed: int, length: int = 600) -> str:
+    rng = random.Random(seed)
+    return "".join(chr(0x4E00 + rng.randrange(2000)) for _ in range(length))
+
+
+BASE = _text(7)
+EDITED = BASE[:300] + "改" + BASE[301:]
+
+
+def test_normalize_text_ignores_whitespace_and_case():
+    assert normalize_text(" A b\n\tC ") == "abc"
+
+
+def test_simhash_distance_tracks_edits():
+    assert hamming(simhash(BASE), simhash(EDITED)) <= 3
+    assert hamming(simhash(BASE), simhash(_text(8))) > 10
+
+
+def test_simhash_numpy_matches_pure_python():
+    np = pytest.importorskip("numpy")
+    normalized = normalize_text(BASE)
+    codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        vectorized = dedup._simhash_numpy(codes)
+    assert vectorized == dedup._simhash_python([ord(char) for char in normalized])
+
+
+def test_exact_and_near_copies_wait_for_the_canonical_document():
+    index = DuplicateIndex(max_distance=3)
+    assert index.claim("a", "a.docx", BASE) == (None, None)
+    cluster, exact = index.claim("b", "b.docx", BASE.replace("一", " 一 "))
+    _, near = index.claim("c", "c.docx", EDITED)
+    assert cluster is not None and cluster.canonical == "a"
+    assert exact.distance == 0 and 0 < near.distance <= 3
+    assert index.claim("d", "d.docx", _text(8)) == (None, None)
+
+    finished, waiting, successor = index.finish("a", TASK_STATUS_SUCCESS, "a.md", "answer")
+    assert finished is cluster and successor is None
+    assert [member.filepath for member in waiting] == ["b", "c"]
+    # Later copies resolve straight away from the finished cluster.
+    late_cluster, late = index.claim("e", "e.docx", BASE)
+    assert late_cluster.done and late.filepath == "e"
+
+    report = index.report()
+    assert report["documents"] == 5
+    assert report["duplicates"] == 3
+    assert report["saved"] == 3
+
+
+def test_short_texts_only_match_exactly():
+    index = DuplicateIndex(max_distance=3)
+    short = BASE[:100]
+    index.claim("a", "a.docx", short)
+    assert index.claim("b", "b.docx", short[:-1] + "改") == (None, None)
+    assert index.claim("c", "c.docx", short)[0] is not None
+
+
+def test_failed_canonical_hands_the_cluster_to_the_first_waiting_copy():
+    index = DuplicateIndex()
+    index.claim("a", "a.docx", BASE)
+    index.claim("b", "b.docx", BASE)
+    index.claim("c", "c.docx", BASE)
+
+    cluster, waiting, successor = index.finish("a", TASK_STATUS_FAILED, None, None, "boom")
+    assert waiting == [] and successor.filepath == "b"
+    assert cluster.canonical == "b" and not cluster.done
+    # The successor comes back through claim() for its own run.
+    assert index.claim("b", "b.docx", BASE) == (None, None)
+
+    cluster, waiting, successor = index.finish("b", TASK_STATUS_SUCCESS, "b.md", "answer")
+    assert successor is None and [member.filepath for member in waiting] == ["c"]
+
+    report = index.report()
+    assert report["documents"] == 3
+    assert report["duplicates"] == 1
+    assert report["saved"] == 1
+    assert report["clusters"][0]["failed"] == ["a"]
+
+
+def test_failed_canonical_without_waiting_copies_is_taken_over_by_the_next_claim():
+    index = DuplicateIndex()
+    index.claim("a", "a.docx", BASE)
+    assert index.finish("a", TASK_STATUS_FAILED, None, None, "boom")[1:] == ([], None)
+    assert index.claim("b", "b.docx", BASE) == (None, None)
+    index.finish("b", TASK_STATUS_FAILED, None, None, "boom")
+    report = index.report()
+    assert report["documents"] == 2
+    assert report["duplicates"] == 0
+
+
+def test_cancelled_canonical_resolves_its_copies_instead_of_handing_over():
+    index = DuplicateIndex()
+    index.claim("a", "a.docx", BASE)
+    index.claim("b", "b.docx", BASE)
+    cluster, waiting, successor = index.finish("a", TASK_STATUS_CANCELLED, None, None, "Cancelled")
+    assert successor is None and [member.filepath for member in waiting] == ["b"]
+    assert cluster.done and cluster.status == TASK_STATUS_CANCELLED
+    assert index.report()["saved"] == 0
+
+
+def test_drain_returns_copies_still_waiting():
+    index = DuplicateIndex()
+    index.claim("a", "a.docx", BASE)
+    index.claim("b", "b.docx", BASE)
+    assert [member.filepath for _, member in index.drain()] == ["b"]
+    assert index.drain() == []
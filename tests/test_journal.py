@@ -0,0 +1,37 @@
+import dataclasses
+
+import pytest
+
+from WordBatchAssistant.app.core.journal import FINGERPRINT_FIELDS, run_fingerprint
+from WordBatchAssistant.app.core.types import AppConfig
+
+
+def _changed(value):
+    if isinstance(value, bool):
+        return not value
+    if isinstance(value, (int, float)):
+        return value + 1
+    return f"{value}-changed"
+
+
+def test_fingerprint_is_stable():
+    config = AppConfig(endpoint="http://x", model="m")
+    assert run_fingerprint(config, "prompt") == run_fingerprint(AppConfig(endpoint="http://x", model="m"), "prompt")
+    assert run_fingerprint(config, "prompt") != run_fingerprint(config, "other prompt")
+
+
+@pytest.mark.parametrize("field", FINGERPRINT_FIELDS)
+def test_fingerprint_covers_result_settings(field):
+    config = AppConfig(endpoint="http://x", model="m")
+    changed = dataclasses.replace(config, **{field: _changed(getattr(config, field))})
+    assert run_fingerprint(changed, "prompt") != run_fingerprint(config, "prompt")
+
+
+def test_fingerprint_ignores_throughput_settings():
+    config = AppConfig(endpoint="http://x", model="m")
+    changed = dataclasses.replace(config, concurrency=16, endpoint="http://y", rate_limit_rpm=5)
+    assert run_fingerprint(changed, "prompt") == run_fingerprint(config, "prompt")
+
+
+def test_fingerprint_includes_packing_and_dedup():
+    assert {"pack_max_docs", "pack_max_tokens", "dedup_policy", "dedup_max_distance"} <= set(FINGERPRINT_FIELDS)
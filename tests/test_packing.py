@@ -0,0 +1,53 @@
+from WordBatchAssistant.app.core.packing import pack_prompts, split_packed_response, split_usage
+from WordBatchAssistant.app.core.types import LLMUsage, RenderedPrompt
+
+
+def _sums(shares):
+    return {
+        name: sum(getattr(share, name) for share in shares)
+        for name in ("prompt_tokens", "completion_tokens", "reasoning_tokens", "total_tokens", "cached_prompt_tokens")
+    }
+
+
+def test_split_usage_shares_add_up_to_the_request():
+    usage = LLMUsage(
+        prompt_tokens=1001, completion_tokens=337, reasoning_tokens=5, total_tokens=1400, cached_prompt_tokens=64
+    )
+    shares = split_usage(usage, [3, 3, 3], [10, 0, 30])
+    assert _sums(shares) == {
+        "prompt_tokens": 1001,
+        "completion_tokens": 337,
+        "reasoning_tokens": 5,
+        "total_tokens": 1400,
+        "cached_prompt_tokens": 64,
+    }
+    assert [share.prompt_tokens for share in shares] == [334, 334, 333]
+    # A member without an answer gets no output tokens but keeps its input share.
+    assert shares[1].completion_tokens == 0
+    assert shares[2].completion_tokens > shares[0].completion_tokens
+
+
+def test_split_usage_without_any_answer_splits_output_by_prompt_size():
+    shares = split_usage(LLMUsage(prompt_tokens=90, completion_tokens=30), [1, 2], [0, 0])
+    assert [share.prompt_tokens for share in shares] == [30, 60]
+    assert [share.completion_tokens for share in shares] == [10, 20]
+
+
+def test_split_usage_keeps_missing_fields_missing():
+    shares = split_usage(LLMUsage(prompt_tokens=10), [1, 1], [1, 1])
+    assert [share.prompt_tokens for share in shares] == [5, 5]
+    assert all(share.completion_tokens is None and share.total_tokens is None for share in shares)
+    assert split_usage(None, [1, 1], [1, 1]) == [None, None]
+
+
+def test_split_packed_response_round_trip():
+    packed = pack_prompts([RenderedPrompt(user="甲", system="sys"), RenderedPrompt(user="乙", system="sys")])
+    assert packed.system == "sys"
+    assert "<<<DOC 1>>>\n甲\n<<<END 1>>>" in packed.user
+    answer = "<<<DOC 2>>>\n第二篇\n<<<END 2>>>\n<<<DOC 1>>> 第一篇 <<<END 1>>>"
+    assert split_packed_response(answer, 2) == ["第一篇", "第二篇"]
+
+
+def test_split_packed_response_marks_missing_and_empty_sections():
+    answer = "<<<DOC 1>>>\n\n<<<END 1>>>\n<<<DOC 3>>>\n三\n<<<END 3>>>\n<<<DOC 9>>>\n多余\n<<<END 9>>>"
+    assert split_packed_response(answer, 3) == [None, None, "三"]
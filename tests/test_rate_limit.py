@@ -0,0 +1,50 @@
+import pytest
+
+from WordBatchAssistant.app.core.rate_limit import RateLimiter, TokenBucket, shared_rate_limiter
+
+
+def test_token_bucket_starts_full_then_charges_the_deficit():
+    bucket = TokenBucket(60)
+    start = bucket.updated
+    assert bucket.reserve(60, start) == 0.0
+    assert bucket.reserve(1, start) == pytest.approx(1.0)
+    # Reservations queue up behind each other.
+    assert bucket.reserve(1, start) == pytest.approx(2.0)
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(60)
+    start = bucket.updated
+    bucket.reserve(60, start)
+    assert bucket.reserve(30, start + 30) == 0.0
+    assert bucket.reserve(1, start + 1000) == 0.0
+    assert bucket.tokens == pytest.approx(59)
+
+
+def test_token_bucket_clamps_requests_larger_than_capacity():
+    bucket = TokenBucket(60)
+    start = bucket.updated
+    assert bucket.reserve(500, start) == 0.0
+    assert bucket.reserve(60, start) == pytest.approx(60.0)
+
+
+def test_rate_limiter_takes_the_longer_wait_and_counts_it():
+    by_tokens = RateLimiter(rpm=60, tpm=600)
+    assert by_tokens.enabled
+    by_tokens.acquire(600)
+    assert by_tokens._reserve(60) == pytest.approx(6.0, abs=0.05)
+    by_requests = RateLimiter(rpm=1, tpm=600)
+    by_requests.acquire(1)
+    assert by_requests._reserve(1) == pytest.approx(60.0, abs=0.05)
+    stats = by_tokens.stats()
+    assert (stats["rpm"], stats["tpm"], stats["waits"]) == (60, 600, 1)
+    assert stats["wait_sec"] == pytest.approx(6.0, abs=0.05)
+    assert not RateLimiter().enabled
+
+
+def test_shared_rate_limiter_is_per_key_and_scope():
+    first = shared_rate_limiter("http://test-shared", "m", 10, 0)
+    assert shared_rate_limiter("http://test-shared", "m", 10, 0) is first
+    assert shared_rate_limiter("http://test-shared", "m", 10, 0, scope="key-2") is not first
+    assert shared_rate_limiter("http://test-shared", "other", 10, 0) is not first
+    assert shared_rate_limiter("http://test-shared", "m", 0, 0) is None
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+
+from WordBatchAssistant.app.core.scanner import DocumentScanner
+
+
+@pytest.fixture
+def tree(tmp_path: Path) -> Path:
+    for relative in (
+        "top.docx",
+        "old.doc",
+        "notes.txt",
+        "UPPER.DOCX",
+        "~$top.docx",
+        ".hidden.docx",
+        "归档/a.docx",
+        "归档/sub/b.docx",
+        "other/c.docx",
+        ".git/d.docx",
+        "out/results/e.docx",
+    ):
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    return tmp_path
+
+
+def _names(root: Path, paths):
+    return [Path(path).relative_to(root).as_posix() for path in paths]
+
+
+def test_default_patterns(tree: Path):
+    found = _names(tree, DocumentScanner(str(tree)).scan())
+    assert found == [
+        "UPPER.DOCX",
+        "old.doc",
+        "other/c.docx",
+        "out/results/e.docx",
+        "top.docx",
+        "归档/a.docx",
+        "归档/sub/b.docx",
+    ]
+
+
+def test_include_path_pattern(tree: Path):
+    for workers in (1, 4):
+        found = DocumentScanner(str(tree), include=["归档/*"], workers=workers).scan()
+        assert _names(tree, found) == ["归档/a.docx", "归档/sub/b.docx"]
+    found = DocumentScanner(str(tree), include=["归档/*.DOCX", "top.docx"]).scan()
+    assert _names(tree, found) == ["top.docx", "归档/a.docx", "归档/sub/b.docx"]
+
+
+def test_exclude_path_pattern_and_pruned_dirs(tree: Path):
+    scanner = DocumentScanner(
+        str(tree), exclude=["~$*", ".*", "归档/sub"], prune_dirs=[str(tree / "out")], workers=1
+    )
+    assert _names(tree, scanner.scan()) == ["UPPER.DOCX", "old.doc", "other/c.docx", "top.docx", "归档/a.docx"]
+
+
+def test_filter_files_applies_the_same_rules(tree: Path):
+    scanner = DocumentScanner(str(tree), include=["归档/*"])
+    candidates = [tree / "top.docx", tree / "归档" / "a.docx", tree / "归档" / "missing.docx"]
+    assert _names(tree, scanner.filter_files(str(path) for path in candidates)) == ["归档/a.docx"]
+
+
+def test_unreadable_root_is_reported(tmp_path: Path):
+    scanner = DocumentScanner(str(tmp_path / "missing"))
+    assert scanner.scan() == []
+    assert len(scanner.errors) == 1
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+import pytest
+
+from WordBatchAssistant.app.core.types import LLMUsage
+from WordBatchAssistant.app.core.usage import BudgetGovernor, PriceTable, UsageTotals, add_usage, usage_tokens
+
+
+def _never() -> bool:
+    return False
+
+
+def _spend(governor: BudgetGovernor, tokens: int) -> None:
+    assert governor.admit(_never)
+    governor.charge(tokens, None)
+    governor.finish_task()
+    governor.release()
+
+
+def _admit_in_thread(governor: BudgetGovernor):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("admitted", governor.admit(_never)), daemon=True)
+    thread.start()
+    return thread, result
+
+
+def test_price_table_lookup_and_cost():
+    prices = PriceTable({"deepseek/deepseek-chat": {"input": 1.0, "output": 2.0}})
+    usage = LLMUsage(prompt_tokens=1_000_000, completion_tokens=500_000, cached_prompt_tokens=200_000)
+    expected = (800_000 * 0.15 + 200_000 * 0.075 + 500_000 * 0.6) / 1e6
+    assert prices.cost("openai/gpt-4o-mini", usage) == pytest.approx(expected)
+    assert prices.cost("deepseek/deepseek-chat", usage) == pytest.approx(2.0)
+    assert prices.cost("meta/llama:free", usage) == 0.0
+    assert prices.cost("unknown-model", usage) is None
+
+
+def test_usage_helpers():
+    total = add_usage(None, LLMUsage(prompt_tokens=3, completion_tokens=4))
+    total = add_usage(total, LLMUsage(prompt_tokens=1, reasoning_tokens=2))
+    assert (total.prompt_tokens, total.completion_tokens, total.reasoning_tokens) == (4, 4, 2)
+    assert usage_tokens(total) == 8
+    assert usage_tokens(LLMUsage(prompt_tokens=1, total_tokens=10)) == 10
+
+
+def test_usage_totals_by_model_and_unpriced():
+    totals = UsageTotals(PriceTable())
+    totals.add("gpt-4o-mini", LLMUsage(prompt_tokens=1000, completion_tokens=100))
+    totals.add("mystery", LLMUsage(prompt_tokens=10, completion_tokens=1), estimated=True)
+    report = totals.report()
+    assert report["requests"] == 2 and report["estimated_requests"] == 1
+    assert report["total_tokens"] == 1111
+    assert report["cost_est"] is None
+    assert report["unpriced_models"] == ["mystery"]
+    assert report["by_model"]["gpt-4o-mini"]["cost_est"] == pytest.approx(0.00021)
+
+
+def test_budget_refuses_once_spent():
+    governor = BudgetGovernor(max_tokens=100)
+    _spend(governor, 100)
+    assert governor.exhausted()
+    assert not governor.admit(_never)
+    assert governor.stats()["refused"] == 1
+
+
+def test_budget_waits_while_projection_exceeds_and_wakes_on_release():
+    governor = BudgetGovernor(max_tokens=100)
+    _spend(governor, 40)
+    assert governor.admit(_never)
+    # 40 spent + 2 tasks x 40 on average > 100, so the next task waits.
+    thread, result = _admit_in_thread(governor)
+    thread.join(0.2)
+    assert thread.is_alive()
+    governor.release()
+    thread.join(2)
+    assert result == {"admitted": True}
+    assert governor.stats()["waits"] == 1
+
+
+def test_budget_average_ignores_tasks_that_spent_nothing():
+    governor = BudgetGovernor(max_tokens=100)
+    _spend(governor, 40)
+    # Cache hits and early failures are released without finish_task().
+    for _ in range(10):
+        assert governor.admit(_never)
+        governor.release()
+    assert governor.admit(_never)
+    thread, result = _admit_in_thread(governor)
+    thread.join(0.2)
+    assert thread.is_alive()
+    governor.release()
+    thread.join(2)
+    assert result == {"admitted": True}
+
+
+def test_budget_async_waiter_wakes_on_charge():
+    async def scenario():
+        governor = BudgetGovernor(max_tokens=100)
+        _spend(governor, 40)
+        assert governor.admit(_never)
+        waiter = asyncio.ensure_future(governor.aadmit(_never))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        governor.charge(60, None)
+        return await asyncio.wait_for(waiter, 0.3)
+
+    assert asyncio.run(scenario()) is False